@@ -0,0 +1,99 @@
+"""
+Опрос списка заметок против потока изменений (GET /api/notes/events).
+
+Сравнивается процессорное время note_service на поддержание свежести данных у
+--clients клиентов:
+  * опрос: каждый клиент раз в --poll-interval секунд запрашивает GET /api/notes/
+    (страница из --notes заметок); стоимость одного запроса измеряется через ASGI;
+  * поток: каждая запись (--writes-per-second на всех) публикуется в NoteChangeFeed
+    и доставляется подписчикам пользователя; измеряется публикация и чтение кадров.
+Хранилище — InMemoryNoteRepository, поэтому стоимость опроса занижена: в MongoDB
+каждый запрос ещё и читает --notes документов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_change_feed --clients 5000 --poll-interval 5
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+import httpx
+from jose import jwt
+
+from note_service.app.application.note_manager import NoteManager
+from note_service.app.core.config import settings
+from note_service.app.domain.models.note import Note
+from note_service.app.infrastructure.change_feed import UPDATED, NoteChangeFeed, note_event
+from note_service.app.infrastructure.memory import InMemoryNoteRepository
+from note_service.app.infrastructure.memory_broker import InMemoryBroker
+from note_service.app.main import app
+
+
+async def poll_cost(args: argparse.Namespace) -> float:
+    """
+    Секунды на один запрос GET /api/notes/.
+    """
+    repository = InMemoryNoteRepository()
+    for number in range(args.notes):
+        await repository.create_note(Note(title=f"Note {number}", content="x" * args.content_size, user_id="bench-user"))
+    app.state.note_manager = NoteManager(repository, InMemoryBroker())
+    token = jwt.encode({"sub": "bench-user", "username": "bench"}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/api/notes/", params={"limit": args.notes}, headers=headers)
+        start = perf_counter()
+        for _ in range(args.requests):
+            await client.get("/api/notes/", params={"limit": args.notes}, headers=headers)
+        return (perf_counter() - start) / args.requests
+
+
+async def push_cost(args: argparse.Namespace) -> float:
+    """
+    Секунды на публикацию одного события и доставку его всем подписчикам пользователя.
+    """
+    feed = NoteChangeFeed(queue_size=args.events + 1)
+    subscriptions = [feed.subscribe("bench-user") for _ in range(args.subscribers_per_user)]
+    note = Note(_id="0" * 24, title="Note", content="x" * args.content_size, user_id="bench-user")
+    start = perf_counter()
+    for _ in range(args.events):
+        feed.publish("bench-user", UPDATED, note_event(note))
+    for subscription in subscriptions:
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+    return (perf_counter() - start) / args.events
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    per_poll = await poll_cost(args)
+    per_event = await push_cost(args)
+    polls_per_second = args.clients / args.poll_interval
+    print(f"GET /api/notes/ ({args.notes} notes): {per_poll * 1e6:8.1f} µs/request")
+    print(f"publish to {args.subscribers_per_user} subscriber(s): {per_event * 1e6:8.2f} µs/event")
+    print(
+        f"polling:  {polls_per_second:8.0f} req/s -> {polls_per_second * per_poll:6.3f} CPU-s/s, "
+        f"staleness up to {args.poll_interval:g} s"
+    )
+    print(
+        f"feed:     {args.writes_per_second:8.0f} events/s -> {args.writes_per_second * per_event:6.3f} CPU-s/s, "
+        f"delivered on write"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--writes-per-second", type=float, default=50.0)
+    parser.add_argument("--subscribers-per-user", type=int, default=2)
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--content-size", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
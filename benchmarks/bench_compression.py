@@ -0,0 +1,113 @@
+"""
+Стоимость сериализации и сжатия ответов со списками заметок.
+
+Для страниц из --pages заметок измеряются:
+  * рендеринг JSON: JSONResponse (json.dumps) против ORJSONResponse (orjson.dumps)
+    после общего для обоих jsonable_encoder;
+  * сжатие тела каждым доступным кодированием и уровнем (gzip всегда, br и zstd —
+    если установлены пакеты brotli и zstandard): процессорное время, степень сжатия
+    и пропускная способность.
+Тексты заметок генерируются из словаря с частотами по закону Ципфа, ближе к живому
+тексту, чем повтор нескольких слов, поэтому степень сжатия не завышена.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_compression --pages 10,100,1000
+"""
+
+import argparse
+import random
+import string
+from datetime import datetime, timedelta
+from itertools import accumulate
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from note_service.app.presentation.compression import Codec
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 9), "zstd": (1, 3, 9)}
+
+
+def vocabulary(rnd: random.Random, size: int) -> Tuple[List[str], List[float]]:
+    words = ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(2, 10))) for _ in range(size)]
+    weights = list(accumulate(1 / rank for rank in range(1, size + 1)))
+    return words, weights
+
+
+def note_page(rnd: random.Random, count: int, words_per_note: int) -> List[dict]:
+    words, weights = vocabulary(rnd, 5000)
+    user_id = str(ObjectId())
+    now = datetime.utcnow()
+    page = []
+    for _ in range(count):
+        created_at = now - timedelta(seconds=rnd.randint(0, 10 ** 7))
+        page.append({
+            "id": str(ObjectId()),
+            "title": " ".join(rnd.choices(words, cum_weights=weights, k=rnd.randint(2, 6))).capitalize(),
+            "content": " ".join(rnd.choices(words, cum_weights=weights, k=rnd.randint(words_per_note // 2, words_per_note * 2))),
+            "user_id": user_id,
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(seconds=rnd.randint(0, 10 ** 5)),
+        })
+    return page
+
+
+def best_of(repeat: int, run: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def available_codecs() -> List[Codec]:
+    codecs = []
+    for encoding, levels in LEVELS.items():
+        for level in levels:
+            try:
+                codecs.append(Codec(encoding, level))
+            except RuntimeError as e:
+                print(f"skip {encoding}: {e}")
+                break
+    return codecs
+
+
+def run_benchmark(args: argparse.Namespace) -> None:
+    rnd = random.Random(args.seed)
+    codecs = available_codecs()
+    for count in (int(value) for value in args.pages.split(",")):
+        page = note_page(rnd, count, args.words)
+        content = jsonable_encoder(page)
+        encoder = best_of(args.repeat, lambda: jsonable_encoder(page))
+        stdlib = best_of(args.repeat, lambda: JSONResponse(content))
+        fast = best_of(args.repeat, lambda: ORJSONResponse(content))
+        body = ORJSONResponse(content).body
+        print(f"\n{count} notes, {len(body) / 1024:.1f} KiB JSON")
+        print(f"  jsonable_encoder      {encoder * 1e3:8.3f} ms")
+        print(f"  JSONResponse render   {stdlib * 1e3:8.3f} ms")
+        print(f"  ORJSONResponse render {fast * 1e3:8.3f} ms  ({stdlib / fast:.1f}x)")
+        for codec in codecs:
+            elapsed = best_of(args.repeat, lambda: codec.compress(body))
+            size = len(codec.compress(body))
+            print(
+                f"  {codec.encoding:>4} {codec.level:<2} {elapsed * 1e3:8.3f} ms  "
+                f"{size / 1024:8.1f} KiB  ratio {len(body) / size:5.2f}  {len(body) / elapsed / 2 ** 20:7.1f} MiB/s"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100,1000", help="Размеры страниц через запятую")
+    parser.add_argument("--words", type=int, default=80, help="Среднее число слов в заметке")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
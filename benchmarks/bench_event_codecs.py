@@ -0,0 +1,71 @@
+"""
+Микробенчмарк кодеков событий user.events.
+
+Для каждого доступного кодека (json, orjson, msgpack) измеряет пропускную способность
+кодирования и разбора (через decode_message, как это делает потребитель) и средний
+размер сообщения. Кодеки, для которых не установлен пакет, пропускаются.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_event_codecs --events 100000
+"""
+
+import argparse
+from time import perf_counter
+from typing import List
+
+from bson import ObjectId
+
+from note_service.app.infrastructure.codecs import get_codec, decode_message, SCHEMA_VERSION, SCHEMA_VERSION_HEADER
+
+
+def generate_events(count: int) -> List[dict]:
+    events = []
+    for i in range(count):
+        user_id = str(ObjectId())
+        if i % 10 == 9:
+            events.append({"event_type": "user.deleted", "user_id": user_id})
+        else:
+            events.append({
+                "event_type": "user.created",
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "user_id": user_id,
+            })
+    return events
+
+
+def best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    events = generate_events(args.events)
+    headers = {SCHEMA_VERSION_HEADER: SCHEMA_VERSION}
+    print(f"{args.events} events, best of {args.repeat} runs")
+    print(f"{'codec':<10} {'encode/s':>12} {'decode/s':>12} {'avg bytes':>10}")
+    for name in ("json", "orjson", "msgpack"):
+        try:
+            codec = get_codec(name)
+        except RuntimeError as e:
+            print(f"{name:<10} skipped: {e}")
+            continue
+        bodies = [codec.encode(event) for event in events]
+        assert decode_message(bodies[0], codec.content_type, headers) == events[0]
+        encode = best_of(args.repeat, lambda: [codec.encode(event) for event in events])
+        decode = best_of(args.repeat, lambda: [decode_message(body, codec.content_type, headers) for body in bodies])
+        size = sum(len(body) for body in bodies) / len(bodies)
+        print(f"{name:<10} {args.events / encode:12.0f} {args.events / decode:12.0f} {size:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Нагрузочный бенчмарк: задержка /api/users/me во время потока логинов.
+
+Приложение user_service запускается в процессе через ASGI (httpx.ASGITransport),
+хранилище и брокер заменены реализациями в памяти, поэтому на результат
+влияет только работа bcrypt и event loop.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_login_contention --executor inline
+    python -m benchmarks.bench_login_contention --executor thread --workers 4
+"""
+
+import argparse
+import asyncio
+from statistics import quantiles
+from time import perf_counter
+from typing import Dict, List
+
+import httpx
+
+from user_service.app.application.user_manager import UserManager
+from user_service.app.core.auth import PasswordHasher
+from user_service.app.core.principal_cache import PrincipalCache
+from user_service.app.infrastructure.memory import InMemoryOutboxRepository, InMemoryUserRepository
+from user_service.app.infrastructure.memory_broker import InMemoryBroker
+from user_service.app.main import app
+
+
+def percentile(samples: List[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def login_loop(client: httpx.AsyncClient, stop: asyncio.Event, stats: Dict[str, int]) -> None:
+    while not stop.is_set():
+        response = await client.post("/api/auth/login", data={"username": "bench", "password": "bench-password"})
+        stats[str(response.status_code)] = stats.get(str(response.status_code), 0) + 1
+
+
+async def me_loop(client: httpx.AsyncClient, token: str, stop: asyncio.Event, latencies: List[float]) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        start = perf_counter()
+        response = await client.get("/api/users/me", headers=headers)
+        latencies.append(perf_counter() - start)
+        assert response.status_code == 200, response.text
+        await asyncio.sleep(0.005)
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    hasher = PasswordHasher(
+        workers=0 if args.executor == "inline" else args.workers,
+        queue_limit=args.queue_limit,
+        executor=args.executor,
+    )
+    repository = InMemoryUserRepository(InMemoryOutboxRepository())
+    app.state.user_manager = UserManager(repository, InMemoryBroker(), PrincipalCache(1000, 60, 1800), hasher)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/api/auth/register", json={"username": "bench", "email": "bench@example.com", "password": "bench-password"}
+        )
+        assert response.status_code == 200, response.text
+        response = await client.post("/api/auth/login", data={"username": "bench", "password": "bench-password"})
+        token = response.json()["access_token"]
+
+        stop = asyncio.Event()
+        stats: Dict[str, int] = {}
+        latencies: List[float] = []
+        tasks = [asyncio.create_task(login_loop(client, stop, stats)) for _ in range(args.concurrency)]
+        tasks.append(asyncio.create_task(me_loop(client, token, stop, latencies)))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+    hasher.shutdown()
+
+    print(f"executor={args.executor} workers={args.workers} concurrent logins={args.concurrency} duration={args.duration}s")
+    print(f"logins: {stats} ({sum(stats.values()) / args.duration:.1f}/s)")
+    print(
+        f"/me: {len(latencies)} requests, p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--executor", choices=["inline", "thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-limit", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных клиентов, выполняющих логин")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
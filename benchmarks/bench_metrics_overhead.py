@@ -0,0 +1,153 @@
+"""
+Накладные расходы MetricsMiddleware.
+
+Приложение note_service вызывается напрямую через ASGI (без HTTP-клиента, чтобы его
+стоимость не размывала разницу) в трёх вариантах: без MetricsMiddleware, с ним
+(по умолчанию, без разбивки по стадиям) и с разбивкой по стадиям
+(REQUEST_STAGES_ENABLED=true: StageTimings на запрос и репозиторий, обёрнутый timed()).
+Хранилище — InMemoryNoteRepository, поэтому это худший случай: без I/O запрос
+дешевле всего, и доля middleware максимальна. Прогоны идут чередующимися
+порциями по --chunk запросов, сравниваются медианы порций — так меньше влияет шум.
+Отдельно измеряется стоимость самого middleware вокруг пустого приложения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_metrics_overhead --requests 20000
+"""
+
+import argparse
+import asyncio
+from statistics import median
+from time import perf_counter
+
+from jose import jwt
+
+from note_service.app.application.note_manager import NoteManager
+from note_service.app.core.config import settings
+from note_service.app.core.timing import configure_timing, timed
+from note_service.app.domain.models.note import Note
+from note_service.app.infrastructure.memory import InMemoryNoteRepository
+from note_service.app.infrastructure.memory_broker import InMemoryBroker
+from note_service.app.main import app
+from note_service.app.presentation.middleware import MetricsMiddleware
+from starlette.middleware import Middleware
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message: dict) -> None:
+    pass
+
+
+def make_scope(path: str, token: str) -> dict:
+    return {
+        "type": "http",
+        "app": app,
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+        "state": {},
+    }
+
+
+async def run(variant, scope: dict, count: int) -> float:
+    stack, manager = variant
+    app.state.note_manager = manager
+    start = perf_counter()
+    for _ in range(count):
+        # Маршрутизатор дописывает в scope совпавший маршрут, поэтому на каждый запрос — копия
+        await stack(dict(scope), receive, send)
+    return perf_counter() - start
+
+
+class _Route:
+    path = "/bench"
+
+
+async def empty_app(scope: dict, receive, send) -> None:
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def compare(variants: list, scope: dict, args: argparse.Namespace) -> list:
+    """
+    Медианы времени на запрос (в секундах) для каждого варианта (стек, менеджер заметок).
+    Варианты чередуются порциями, чтобы дрейф частоты процессора делился между ними.
+    """
+    for variant in variants:
+        await run(variant, scope, args.chunk)
+    samples: list = [[] for _ in variants]
+    for _ in range(args.requests // args.chunk):
+        for variant, timings in zip(variants, samples):
+            timings.append(await run(variant, scope, args.chunk))
+    return [median(timings) / args.chunk for timings in samples]
+
+
+def build_stack(metrics_options) -> object:
+    """
+    Стек middleware приложения; metrics_options=None — без MetricsMiddleware.
+    """
+    middleware = list(app.user_middleware)
+    app.user_middleware = [
+        Middleware(MetricsMiddleware, **metrics_options) if entry.cls is MetricsMiddleware else entry
+        for entry in middleware
+        if metrics_options is not None or entry.cls is not MetricsMiddleware
+    ]
+    stack = app.build_middleware_stack()
+    app.user_middleware = middleware
+    return stack
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    repository = InMemoryNoteRepository()
+    note = await repository.create_note(Note(title="Bench", content="x" * args.content_size, user_id="bench-user"))
+    manager = NoteManager(repository, InMemoryBroker())
+    configure_timing(True, False, settings.service_name)
+    staged_manager = NoteManager(timed(repository, "db"), InMemoryBroker())
+    configure_timing(False, False, settings.service_name)
+    token = jwt.encode({"sub": "bench-user", "username": "bench"}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    scope = make_scope(f"/api/notes/{note.id}", token)
+
+    bench_scope = make_scope("/bench", token)
+    bare, wrapped, staged_wrapped = await compare(
+        [(empty_app, None), (MetricsMiddleware(empty_app), None), (MetricsMiddleware(empty_app, stages=True), None)],
+        bench_scope,
+        args,
+    )
+    without, with_metrics, with_stages = await compare(
+        [(build_stack(None), manager), (build_stack({}), manager), (build_stack({"stages": True}), staged_manager)],
+        scope,
+        args,
+    )
+    print(f"{args.requests} requests per variant, median of {args.chunk}-request chunks")
+    print(f"MetricsMiddleware alone:               {(wrapped - bare) * 1e6:8.2f} µs/request")
+    print(f"MetricsMiddleware(stages=True) alone:  {(staged_wrapped - bare) * 1e6:8.2f} µs/request")
+    print(f"GET /api/notes/{{note_id}} without metrics:  {without * 1e6:8.1f} µs/request")
+    for label, elapsed in (("with metrics:    ", with_metrics), ("metrics + stages:", with_stages)):
+        print(
+            f"GET /api/notes/{{note_id}} {label} {elapsed * 1e6:8.1f} µs/request, "
+            f"overhead {(elapsed - without) * 1e6:.1f} µs ({(elapsed / without - 1) * 100:+.2f}%)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--chunk", type=int, default=50)
+    parser.add_argument("--content-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Бенчмарк пути чтения списка заметок.
+
+Сравнивает прежний путь (Note.parse_obj для каждого документа + валидация и
+сериализация через response_model FastAPI) с быстрым путём (проекция полей,
+словари NoteView без валидации, сериализация orjson сразу в байты).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_note_read_path --notes 10000 --content-size 2000
+"""
+
+import argparse
+import asyncio
+import copy
+import gc
+import random
+import string
+from datetime import datetime, timedelta
+from statistics import median
+from time import perf_counter
+from typing import Callable, List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from note_service.app.domain.models.note import Note, NoteView, NOTE_VIEW_FIELDS, NOTE_SUMMARY_FIELDS
+from note_service.app.infrastructure.db import to_view_document
+
+
+def generate_documents(count: int, content_size: int) -> List[dict]:
+    """Генерирует документы в том виде, в каком их возвращает motor."""
+    rnd = random.Random(42)
+    base = datetime(2024, 1, 1)
+    alphabet = string.ascii_letters + " "
+    documents = []
+    for i in range(count):
+        created = base + timedelta(seconds=i, milliseconds=rnd.randint(0, 999))
+        documents.append({
+            "_id": ObjectId(),
+            "title": f"Note {i}",
+            "content": "".join(rnd.choices(alphabet, k=content_size)),
+            "user_id": "bench-user",
+            "created_at": created,
+            "updated_at": created,
+        })
+    return documents
+
+
+def project(documents: List[dict], fields) -> List[dict]:
+    """Имитирует проекцию, которую выполняет MongoDB на стороне сервера."""
+    keep = {"_id", *(field for field in fields if field != "id")}
+    return [{key: value for key, value in document.items() if key in keep} for document in documents]
+
+
+async def legacy_path(documents: List[dict]) -> bytes:
+    notes = []
+    for document in documents:
+        document["_id"] = str(document["_id"])
+        notes.append(Note.parse_obj(document))
+    field = create_response_field(name="Response_list_notes", type_=List[NoteView])
+    content = await serialize_response(field=field, response_content=notes)
+    return JSONResponse(content).body
+
+
+async def fast_path(documents: List[dict]) -> bytes:
+    return ORJSONResponse([to_view_document(document) for document in documents]).body
+
+
+async def measure(label: str, run: Callable, documents: List[dict], repeat: int) -> float:
+    timings = []
+    body = b""
+    for _ in range(repeat):
+        batch = copy.deepcopy(documents)
+        gc.collect()
+        start = perf_counter()
+        body = await run(batch)
+        timings.append(perf_counter() - start)
+    best = median(timings)
+    print(f"{label:<32} {best * 1000:10.2f} ms {len(documents) / best:12.0f} notes/s {len(body) / 1024:10.1f} KiB")
+    return best
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    documents = generate_documents(args.notes, args.content_size)
+    full = project(documents, NOTE_VIEW_FIELDS)
+    summary = project(documents, NOTE_SUMMARY_FIELDS)
+
+    print(f"{args.notes} notes, content {args.content_size} chars, median of {args.repeat} runs")
+    legacy = await measure("parse_obj + response_model", legacy_path, documents, args.repeat)
+    fast = await measure("projection + orjson (full)", fast_path, full, args.repeat)
+    fast_summary = await measure("projection + orjson (summary)", fast_path, summary, args.repeat)
+    print(f"speedup: full x{legacy / fast:.1f}, summary x{legacy / fast_summary:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--content-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
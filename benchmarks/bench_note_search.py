@@ -0,0 +1,132 @@
+"""
+Бенчмарк полнотекстового поиска заметок на сгенерированном корпусе.
+
+Сравнивает прежний сценарий клиента (скачать все заметки пользователя и
+отфильтровать их у себя) с серверным поиском: первая страница результатов
+с подсветкой фрагментов. Для каждого варианта печатается медианная задержка
+и размер ответа.
+
+По умолчанию используется InMemoryNoteRepository: он ищет линейным перебором,
+поэтому в этом режиме показателен размер ответа, а не задержка. С --mongo-url
+корпус загружается в MongoDB и поиск идёт по текстовому индексу (коллекция
+пересоздаётся в базе --database).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_note_search --notes 1000000 --users 1000
+    python -m benchmarks.bench_note_search --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import random
+from statistics import median
+from time import perf_counter
+from typing import List, Tuple
+
+import orjson
+
+from note_service.app.application.note_manager import NoteManager
+from note_service.app.domain.interfaces import NoteRepository
+from note_service.app.domain.models.note import Note
+from note_service.app.infrastructure.memory import InMemoryNoteRepository
+
+VOCABULARY_SIZE = 20000
+
+
+def make_vocabulary(rnd: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rnd.choices(letters, k=rnd.randint(3, 10))) for _ in range(VOCABULARY_SIZE)]
+
+
+def zipf_words(rnd: random.Random, vocabulary: List[str], count: int) -> List[str]:
+    # Частоты слов в тексте близки к закону Ципфа: редкие слова встречаются редко
+    return [vocabulary[min(int(rnd.paretovariate(1.1)) - 1, len(vocabulary) - 1)] for _ in range(count)]
+
+
+async def load_corpus(repository: NoteRepository, args: argparse.Namespace, vocabulary: List[str]) -> None:
+    rnd = random.Random(42)
+    batch_size = 10000
+    for start in range(0, args.notes, batch_size):
+        notes = [
+            Note(
+                title=" ".join(zipf_words(rnd, vocabulary, 4)),
+                content=" ".join(zipf_words(rnd, vocabulary, args.content_words)),
+                user_id=f"user-{(start + i) % args.users}",
+            )
+            for i in range(min(batch_size, args.notes - start))
+        ]
+        await repository.create_notes(notes)
+
+
+async def client_side_filter(repository: NoteRepository, user_id: str, term: str) -> Tuple[int, int]:
+    views = await repository.get_note_views_page(user_id, 10 ** 9)
+    body = orjson.dumps(views)
+    found = [view for view in orjson.loads(body) if term in view["title"] or term in view["content"]]
+    return len(found), len(body)
+
+
+async def server_search(manager: NoteManager, user_id: str, term: str, limit: int) -> Tuple[int, int]:
+    hits, _ = await manager.search_notes(user_id, term, limit)
+    return len(hits), len(orjson.dumps(hits))
+
+
+async def make_repository(args: argparse.Namespace):
+    if not args.mongo_url:
+        return InMemoryNoteRepository(), None
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from note_service.app.infrastructure.db import MongoNoteRepository
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client[args.database].drop_collection("notes")
+    repository = MongoNoteRepository(client[args.database])
+    await repository.init_indexes()
+    return repository, client
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    rnd = random.Random(7)
+    vocabulary = make_vocabulary(random.Random(1))
+    repository, client = await make_repository(args)
+    start = perf_counter()
+    await load_corpus(repository, args, vocabulary)
+    print(f"loaded {args.notes} notes for {args.users} users in {perf_counter() - start:.1f}s")
+
+    manager = NoteManager(repository, None)
+    queries = [(f"user-{rnd.randrange(args.users)}", vocabulary[rnd.randrange(50)]) for _ in range(args.queries)]
+    results = {}
+    payloads = {}
+    for label, run in (
+        ("download all + client filter", lambda user_id, term: client_side_filter(repository, user_id, term)),
+        ("server search (first page)", lambda user_id, term: server_search(manager, user_id, term, args.limit)),
+    ):
+        timings, sizes = [], []
+        for user_id, term in queries:
+            started = perf_counter()
+            _, size = await run(user_id, term)
+            timings.append(perf_counter() - started)
+            sizes.append(size)
+        results[label] = median(timings)
+        payloads[label] = median(sizes)
+        print(f"{label:<32} {median(timings) * 1000:10.2f} ms {median(sizes) / 1024:10.1f} KiB")
+    baseline, search = results.values()
+    baseline_size, search_size = payloads.values()
+    print(f"latency x{baseline / search:.1f}, payload x{baseline_size / max(search_size, 1):.0f} smaller")
+    if client:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--content-words", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--database", default="note_search_bench")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
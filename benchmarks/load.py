@@ -0,0 +1,336 @@
+"""
+Нагрузочный бенчмарк сервисов через ASGI.
+
+Приложение (note_service или user_service) запускается в процессе через httpx.ASGITransport,
+хранилища и брокер заменены реализациями в памяти (как при STORAGE_BACKEND=memory), поэтому результат отражает стоимость
+FastAPI, валидации, сериализации и прикладного слоя без сети и I/O.
+Параллельные клиенты выбирают эндпоинты по весам сценария в течение --duration секунд;
+для каждого эндпоинта (по шаблону маршрута) считаются пропускная способность,
+ошибки и перцентили задержки. Результат сохраняется в JSON вместе с хешем коммита,
+а --baseline печатает изменение относительно предыдущего прогона.
+
+Запуск из корня репозитория:
+    python -m benchmarks.load --service notes --concurrency 32 --duration 10 --output notes.json
+    python -m benchmarks.load --service users --baseline users-before.json --output users-after.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+from datetime import datetime, timezone
+from statistics import quantiles
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+SEARCH_WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet")
+PASSWORD = "bench-password"
+
+Request = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+Scenario = List[Tuple[str, int, Request]]
+
+
+def percentile(samples: List[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def note_text(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(SEARCH_WORDS) for _ in range(words))
+
+
+async def setup_notes(args: argparse.Namespace):
+    """
+    Заполняет InMemoryNoteRepository и возвращает приложение и сценарий note_service.
+    """
+    from note_service.app.application.note_manager import NoteManager
+    from note_service.app.domain.models.note import Note
+    from note_service.app.infrastructure.memory import InMemoryNoteRepository
+    from note_service.app.infrastructure.memory_broker import InMemoryBroker
+    from note_service.app.core.config import settings
+    from note_service.app.core.timing import timed
+    from note_service.app.main import app
+    from jose import jwt
+
+    rnd = random.Random(args.seed)
+    repository = InMemoryNoteRepository()
+    users: List[Tuple[Dict[str, str], List[str]]] = []
+    for index in range(args.users):
+        user_id = f"bench-user-{index}"
+        token = jwt.encode(
+            {"sub": user_id, "username": f"bench{index}"}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm
+        )
+        note_ids = []
+        for number in range(args.notes_per_user):
+            note = Note(title=f"Note {number} {note_text(rnd, 2)}", content=note_text(rnd, 60), user_id=user_id)
+            note_ids.append((await repository.create_note(note)).id)
+        users.append(({"Authorization": f"Bearer {token}"}, note_ids))
+    # Репозиторий оборачивается timed, как в Container, чтобы стадия db попадала в метрики
+    app.state.note_manager = NoteManager(timed(repository, "db"), InMemoryBroker())
+
+    async def list_notes(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        headers, _ = rnd.choice(users)
+        return await client.get("/api/notes/", params={"limit": 20}, headers=headers)
+
+    async def get_note(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        headers, note_ids = rnd.choice(users)
+        return await client.get(f"/api/notes/{rnd.choice(note_ids)}", headers=headers)
+
+    async def search_notes(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        headers, _ = rnd.choice(users)
+        return await client.get("/api/notes/search", params={"q": rnd.choice(SEARCH_WORDS), "limit": 10}, headers=headers)
+
+    async def create_note(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        headers, _ = rnd.choice(users)
+        return await client.post(
+            "/api/notes/", json={"title": note_text(rnd, 3), "content": note_text(rnd, 60)}, headers=headers
+        )
+
+    async def update_note(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        headers, note_ids = rnd.choice(users)
+        return await client.put(f"/api/notes/{rnd.choice(note_ids)}", json={"title": note_text(rnd, 3)}, headers=headers)
+
+    scenario: Scenario = [
+        ("GET /api/notes/", 30, list_notes),
+        ("GET /api/notes/{note_id}", 35, get_note),
+        ("GET /api/notes/search", 10, search_notes),
+        ("POST /api/notes/", 10, create_note),
+        ("PUT /api/notes/{note_id}", 15, update_note),
+    ]
+    return app, scenario, lambda: None
+
+
+async def setup_users(args: argparse.Namespace):
+    """
+    Заполняет InMemoryUserRepository и возвращает приложение и сценарий user_service.
+    Все пользователи получают один заранее посчитанный bcrypt-хеш, чтобы не ждать
+    хеширования при заполнении; логин и регистрация по-прежнему платят за bcrypt.
+    """
+    from user_service.app.application.user_manager import UserManager
+    from user_service.app.core.auth import PasswordHasher, create_access_token, get_password_hash, principal_claims
+    from user_service.app.core.principal_cache import PrincipalCache
+    from user_service.app.core.timing import timed
+    from user_service.app.domain.models.user import User, UserRole
+    from user_service.app.infrastructure.memory import InMemoryOutboxRepository, InMemoryUserRepository
+    from user_service.app.infrastructure.memory_broker import InMemoryBroker
+    from user_service.app.main import app
+
+    repository = InMemoryUserRepository(InMemoryOutboxRepository())
+    password_hash = get_password_hash(PASSWORD)
+    users: List[Tuple[str, str, Dict[str, str]]] = []
+    for index in range(args.users):
+        role = UserRole.ADMIN if index == 0 else UserRole.USER
+        user = await repository.create_user(
+            User(username=f"bench{index}", email=f"bench{index}@example.com", password_hash=password_hash, role=role)
+        )
+        token = create_access_token(principal_claims(user))
+        users.append((user.id, user.username, {"Authorization": f"Bearer {token}"}))
+    admin_headers = users[0][2]
+    hasher = PasswordHasher(workers=args.hash_workers, executor="thread" if args.hash_workers else "inline")
+    app.state.user_manager = UserManager(timed(repository, "db"), InMemoryBroker(), PrincipalCache(10000, 60, 1800), hasher)
+    registered = iter(range(10 ** 9))
+
+    async def get_me(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        _, _, headers = rnd.choice(users)
+        return await client.get("/api/users/me", headers=headers)
+
+    async def get_user(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        user_id, _, headers = rnd.choice(users)
+        return await client.get(f"/api/users/{user_id}", headers=headers)
+
+    async def list_users(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        return await client.get("/api/users/", headers=admin_headers)
+
+    async def update_user(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        user_id, username, headers = rnd.choice(users[1:])
+        return await client.put(
+            f"/api/users/{user_id}", json={"email": f"{username}+{rnd.randrange(10 ** 6)}@example.com"}, headers=headers
+        )
+
+    async def login(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        _, username, _ = rnd.choice(users)
+        return await client.post("/api/auth/login", data={"username": username, "password": PASSWORD})
+
+    async def register(client: httpx.AsyncClient, rnd: random.Random) -> httpx.Response:
+        number = next(registered)
+        return await client.post(
+            "/api/auth/register",
+            json={"username": f"new{number}", "email": f"new{number}@example.com", "password": PASSWORD},
+        )
+
+    scenario: Scenario = [
+        ("GET /api/users/me", 40, get_me),
+        ("GET /api/users/{user_id}", 25, get_user),
+        ("GET /api/users/", 5, list_users),
+        ("PUT /api/users/{user_id}", 25, update_user),
+        # bcrypt на порядки дороже остальных запросов, поэтому веса малы; --exclude убирает их совсем
+        ("POST /api/auth/login", 1, login),
+        ("POST /api/auth/register", 1, register),
+    ]
+    return app, scenario, hasher.shutdown
+
+
+SERVICES = {"notes": setup_notes, "users": setup_users}
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    rnd: random.Random,
+    deadline: float,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, Dict[str, int]],
+) -> None:
+    names = [name for name, _, _ in scenario]
+    requests = {name: request for name, _, request in scenario}
+    weights = [weight for _, weight, _ in scenario]
+    while perf_counter() < deadline:
+        name = rnd.choices(names, weights)[0]
+        start = perf_counter()
+        try:
+            response = await requests[name](client, rnd)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = perf_counter() - start
+        if isinstance(status, int) and status < 400:
+            samples[name].append(elapsed)
+        else:
+            counts = errors[name]
+            counts[str(status)] = counts.get(str(status), 0) + 1
+
+
+async def run_phase(
+    client: httpx.AsyncClient, scenario: Scenario, args: argparse.Namespace, duration: float, seed: int
+) -> Tuple[Dict[str, List[float]], Dict[str, Dict[str, int]], float]:
+    samples: Dict[str, List[float]] = {name: [] for name, _, _ in scenario}
+    errors: Dict[str, Dict[str, int]] = {name: {} for name, _, _ in scenario}
+    start = perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        worker(client, scenario, random.Random(seed + index), deadline, samples, errors)
+        for index in range(args.concurrency)
+    ))
+    return samples, errors, perf_counter() - start
+
+
+def summarize(latencies: List[float], errors: Dict[str, int], elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+    }
+
+
+def print_report(results: dict, baseline: Optional[dict]) -> None:
+    config = results["config"]
+    print(
+        f"service={results['service']} commit={results['commit']} concurrency={config['concurrency']} "
+        f"duration={config['duration']}s"
+    )
+    header = f"{'endpoint':<30} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}"
+    if baseline:
+        header += f" {'Δ req/s':>9} {'Δ p99':>8}"
+    print(header)
+    rows = list(results["endpoints"].items()) + [("total", results["total"])]
+    for name, row in rows:
+        line = (
+            f"{name:<30} {row['rps']:9.1f} {row['p50_ms']:8.2f} {row['p90_ms']:8.2f} {row['p99_ms']:8.2f} "
+            f"{row['max_ms']:8.2f} {sum(row['errors'].values()):7d}"
+        )
+        if baseline:
+            before = baseline["total"] if name == "total" else baseline["endpoints"].get(name)
+            if before and before["rps"] and before["p99_ms"]:
+                line += (
+                    f" {(row['rps'] / before['rps'] - 1) * 100:+8.1f}%"
+                    f" {(row['p99_ms'] / before['p99_ms'] - 1) * 100:+7.1f}%"
+                )
+        print(line)
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    app, scenario, shutdown = await SERVICES[args.service](args)
+    scenario = [entry for entry in scenario if entry[0] not in args.exclude]
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            if args.warmup:
+                await run_phase(client, scenario, args, args.warmup, args.seed)
+            samples, errors, elapsed = await run_phase(client, scenario, args, args.duration, args.seed + args.concurrency)
+    finally:
+        shutdown()
+    endpoints = {name: summarize(samples[name], errors[name], elapsed) for name, _, _ in scenario}
+    all_errors: Dict[str, int] = {}
+    for counts in errors.values():
+        for status, count in counts.items():
+            all_errors[status] = all_errors.get(status, 0) + count
+    return {
+        "service": args.service,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "users": args.users,
+            "notes_per_user": args.notes_per_user,
+            "seed": args.seed,
+            "exclude": args.exclude,
+        },
+        "endpoints": endpoints,
+        "total": summarize([value for values in samples.values() for value in values], all_errors, elapsed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=sorted(SERVICES), required=True)
+    parser.add_argument("--concurrency", type=int, default=16, help="Параллельных клиентов")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность замера, секунд")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Прогрев перед замером, секунд")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--notes-per-user", type=int, default=50)
+    parser.add_argument("--hash-workers", type=int, default=4, help="Потоков bcrypt; 0 — хешировать в event loop")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--exclude", action="append", default=[], metavar="ENDPOINT", help='Исключить эндпоинт, например "POST /api/auth/login"'
+    )
+    parser.add_argument("--output", help="Сохранить результат в JSON")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("service") != args.service:
+            parser.error(f"Baseline is for service {baseline.get('service')}, not {args.service}")
+    results = asyncio.run(run_benchmark(args))
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
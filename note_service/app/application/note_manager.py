@@ -1,8 +1,13 @@
 import logging
-from typing import List
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 from fastapi import HTTPException
-from note_service.app.domain.models.note import Note, NoteCreate, NoteUpdate
+from note_service.app.domain.models.note import Note, NoteCreate, NoteUpdate, NoteBatchUpdate, NoteBatchResult
 from note_service.app.domain.interfaces import NoteRepository, MessageBroker
+from note_service.app.domain.changes import (
+    change_position, decode_change_token, encode_change_token, from_millis, to_millis
+)
+from note_service.app.domain.search import encode_search_cursor, highlight_snippet, parse_query
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +49,165 @@ class NoteManager:
             raise HTTPException(status_code=404, detail="Note not found")
         return success
 
+    async def update_user_note(
+        self, note_id: str, user_id: str, note_update: NoteUpdate, versions: Optional[Sequence[datetime]] = None
+    ) -> Note:
+        """
+        versions — допустимые версии заметки из If-Match; несовпадение даёт 412.
+        """
+        logger.info("Updating user note", extra={"context": f"note_id={note_id}, user_id={user_id}"})
+        updated_note = await self.repository.update_user_note(
+            note_id, user_id, note_update.dict(exclude_unset=True), versions
+        )
+        if not updated_note:
+            if versions is not None:
+                await self._raise_if_modified(note_id, user_id)
+            await self._raise_not_owned_or_missing(note_id, "update")
+        return updated_note
+
+    async def _raise_if_modified(self, note_id: str, user_id: str) -> None:
+        # Редкий путь: заметка пользователя есть, значит, не совпала версия из If-Match
+        note = await self.repository.get_note(note_id)
+        if note is not None and note.user_id == user_id:
+            logger.info("Note version mismatch", extra={"context": f"note_id={note_id}, user_id={user_id}"})
+            raise HTTPException(status_code=412, detail="Note was modified")
+
+    async def delete_user_note(self, note_id: str, user_id: str) -> bool:
+        logger.info("Deleting user note", extra={"context": f"note_id={note_id}, user_id={user_id}"})
+        success = await self.repository.delete_user_note(note_id, user_id)
+        if not success:
+            await self._raise_not_owned_or_missing(note_id, "delete")
+        return success
+
+    async def _raise_not_owned_or_missing(self, note_id: str, action: str) -> None:
+        # Редкий путь: отдельным запросом различаем чужую заметку (403) и отсутствующую (404)
+        if await self.repository.note_exists(note_id):
+            logger.warning("Note belongs to another user", extra={"context": f"note_id={note_id}"})
+            raise HTTPException(status_code=403, detail=f"Not authorized to {action} this note")
+        logger.warning("Note not found", extra={"context": f"note_id={note_id}"})
+        raise HTTPException(status_code=404, detail="Note not found")
+
     async def get_notes_by_user(self, user_id: str) -> List[Note]:
         logger.debug("Fetching notes for user", extra={"context": f"user_id={user_id}"})
         notes = await self.repository.get_notes_by_user(user_id)
         logger.info("Found %d notes for user", len(notes), extra={"context": f"user_id={user_id}"})
-        return notes
\ No newline at end of file
+        return notes
+
+    async def get_note_views_page(
+        self, user_id: str, limit: int, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        logger.debug("Fetching note views page for user", extra={"context": f"user_id={user_id}, limit={limit}, after={after}"})
+        try:
+            views = await self.repository.get_note_views_page(user_id, limit + 1, after, fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from e
+        next_cursor = None
+        if len(views) > limit:
+            views = views[:limit]
+            next_cursor = views[-1]["id"]
+        return views, next_cursor
+
+    def stream_note_views(
+        self, user_id: str, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[dict]:
+        logger.debug("Streaming notes for user", extra={"context": f"user_id={user_id}, after={after}"})
+        try:
+            return self.repository.stream_note_views(user_id, after, fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+    async def get_changes(
+        self, user_id: str, since: Optional[str], limit: int, settle_seconds: float, retention_seconds: float
+    ) -> dict:
+        """
+        Изменения заметок после токена since для дельта-синхронизации.
+        Верхняя граница отстаёт от текущего времени на settle_seconds: запись, получившая
+        updated_at раньше, но ещё не завершённая, не окажется позади выданного токена.
+        Токен старше срока хранения tombstone даёт 410 — клиент должен синхронизироваться заново.
+        """
+        logger.debug("Fetching note changes for user", extra={"context": f"user_id={user_id}, since={since}, limit={limit}"})
+        now = datetime.utcnow()
+        until = now - timedelta(seconds=settle_seconds)
+        position = None
+        if since is not None:
+            try:
+                position = decode_change_token(since)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail="Invalid sync token") from e
+            if from_millis(position[0]) < now - timedelta(seconds=retention_seconds):
+                logger.info("Sync token expired", extra={"context": f"user_id={user_id}, since={since}"})
+                raise HTTPException(status_code=410, detail="Sync token expired, full resync required")
+            if from_millis(position[0]) >= until:
+                # Токен не старше границы: новых завершённых изменений ещё нет
+                return {"notes": [], "deleted": [], "next_since": since, "has_more": False}
+        try:
+            notes, tombstones = await self.repository.get_changes(user_id, position, until, limit + 1)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid sync token") from e
+        # Заметки и tombstone — два упорядоченных потока; страница — первые limit из их слияния
+        changes = sorted(
+            [(change_position(view["updated_at"], view["id"]), False, view) for view in notes]
+            + [(change_position(tombstone["deleted_at"], tombstone["id"]), True, tombstone) for tombstone in tombstones]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if has_more:
+            next_since = encode_change_token(*changes[-1][0])
+        else:
+            next_since = encode_change_token(to_millis(until))
+        return {
+            "notes": [item for _, deleted, item in changes if not deleted],
+            "deleted": [item for _, deleted, item in changes if deleted],
+            "next_since": next_since,
+            "has_more": has_more,
+        }
+
+    async def search_notes(
+        self, user_id: str, query: str, limit: int, after: Optional[str] = None, snippet_length: int = 160
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Ищет заметки пользователя; полный текст заменяется фрагментом с подсветкой.
+        """
+        logger.debug("Searching notes for user", extra={"context": f"user_id={user_id}, limit={limit}, after={after}"})
+        terms, _ = parse_query(query)
+        if not terms:
+            raise HTTPException(status_code=400, detail="Search query has no terms")
+        try:
+            hits = await self.repository.search_notes(user_id, query, limit + 1, after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from e
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_search_cursor(hits[-1]["score"], hits[-1]["id"])
+        for hit in hits:
+            hit["snippet"] = highlight_snippet(hit.pop("content"), terms, snippet_length)
+        return hits, next_cursor
+
+    async def create_notes(self, notes: List[NoteCreate], user_id: str) -> List[NoteBatchResult]:
+        logger.info("Creating notes batch", extra={"context": f"user_id={user_id}, size={len(notes)}"})
+        new_notes = [Note(title=note.title, content=note.content, user_id=user_id) for note in notes]
+        return await self.repository.create_notes(new_notes)
+
+    async def update_notes(self, updates: List[NoteBatchUpdate], user_id: str) -> List[NoteBatchResult]:
+        logger.info("Updating notes batch", extra={"context": f"user_id={user_id}, size={len(updates)}"})
+        # Два обновления одной заметки в неупорядоченном bulk_write применились бы в любом порядке;
+        # регистр не важен: ObjectId в hex
+        if len({update.id.lower() for update in updates}) < len(updates):
+            logger.warning("Duplicate note ids in batch", extra={"context": f"user_id={user_id}"})
+            raise HTTPException(status_code=400, detail="Duplicate note ids in batch")
+        return await self.repository.update_notes(
+            user_id, [(update.id, update.dict(exclude={"id"}, exclude_unset=True)) for update in updates]
+        )
+
+    async def delete_notes(self, note_ids: List[str], user_id: str) -> List[NoteBatchResult]:
+        logger.info("Deleting notes batch", extra={"context": f"user_id={user_id}, size={len(note_ids)}"})
+        return await self.repository.delete_notes(user_id, note_ids)
+
+    async def delete_notes_by_user(
+        self, user_id: str, chunk_size: Optional[int] = None, pause_seconds: float = 0.0
+    ) -> int:
+        logger.info("Deleting all notes for user", extra={"context": f"user_id={user_id}, chunk_size={chunk_size}"})
+        deleted = await self.repository.delete_notes_by_user(user_id, chunk_size, pause_seconds)
+        logger.info("Deleted %d notes for user", deleted, extra={"context": f"user_id={user_id}"})
+        return deleted
@@ -2,10 +2,19 @@ import asyncio
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from note_service.app.application.note_manager import NoteManager
+from note_service.app.infrastructure.change_feed import (
+    FEED_SOURCES, ChangeStreamWatcher, NoteChangeFeed, NotifyingNoteRepository
+)
+from note_service.app.infrastructure.cache import CachedNoteRepository, InMemoryNoteCache, RedisNoteCache
 from note_service.app.infrastructure.db import MongoNoteRepository
+from note_service.app.infrastructure.indexes import INDEX_CHECK_MODES
+from note_service.app.infrastructure.memory import InMemoryNoteRepository
+from note_service.app.infrastructure.memory_broker import InMemoryBroker
+from note_service.app.infrastructure.mongo import CausalSessionTracker, create_mongo_client, replica_read_preference
 from note_service.app.infrastructure.rabbitmq import RabbitMQBroker
 from note_service.app.core.config import Settings
-from note_service.app.domain.interfaces import MessageBroker
+from note_service.app.core.timing import timed
+from note_service.app.domain.interfaces import MessageBroker, NoteCache, NoteRepository
 
 logger = logging.getLogger(__name__)
 
@@ -15,32 +24,116 @@ class Container:
         self.client: AsyncIOMotorClient | None = None
         self.db: AsyncIOMotorDatabase | None = None
         self.broker: MessageBroker | None = None
+        self.note_cache: NoteCache | None = None
+        self.consumer_task: asyncio.Task | None = None
+        self.index_task: asyncio.Task | None = None
+        self.change_feed: NoteChangeFeed | None = None
+        self.feed_task: asyncio.Task | None = None
 
     async def get_mongo_client(self) -> tuple[AsyncIOMotorClient, AsyncIOMotorDatabase]:
         if self.client is None:
-            self.client = AsyncIOMotorClient(self.settings.mongo_url)
+            self.client = create_mongo_client(self.settings)
             self.db = self.client[self.settings.database_name]
         return self.client, self.db
 
     async def get_message_broker(self) -> MessageBroker:
         if self.broker is None:
-            self.broker = RabbitMQBroker()
+            backend = self.settings.broker_backend
+            if backend == "rabbitmq":
+                self.broker = RabbitMQBroker()
+            elif backend == "memory":
+                self.broker = InMemoryBroker(
+                    codec=self.settings.event_codec,
+                    queue_size=self.settings.memory_broker_queue_size,
+                )
+            else:
+                raise ValueError(f"Unknown broker backend: {backend}")
             await self.broker.connect()
         return self.broker
 
-    async def get_note_manager(self) -> NoteManager:
+    def get_note_cache(self) -> NoteCache | None:
+        backend = self.settings.note_cache_backend
+        if self.note_cache is None and backend != "none":
+            if backend == "memory":
+                self.note_cache = InMemoryNoteCache(
+                    max_entries=self.settings.note_cache_max_entries,
+                    ttl=self.settings.note_cache_ttl_seconds,
+                    negative_ttl=self.settings.note_cache_negative_ttl_seconds,
+                )
+            elif backend == "redis":
+                if not self.settings.redis_url:
+                    raise ValueError("REDIS_URL is required for NOTE_CACHE_BACKEND=redis")
+                self.note_cache = RedisNoteCache(
+                    self.settings.redis_url,
+                    ttl=self.settings.note_cache_ttl_seconds,
+                    negative_ttl=self.settings.note_cache_negative_ttl_seconds,
+                )
+            else:
+                raise ValueError(f"Unknown note cache backend: {backend}")
+            logger.info(f"Note cache enabled: {backend}")
+        return self.note_cache
+
+    def get_change_feed(self) -> NoteChangeFeed:
+        if self.change_feed is None:
+            self.change_feed = NoteChangeFeed(
+                queue_size=self.settings.note_feed_queue_size,
+                overflow=self.settings.note_feed_overflow,
+                max_subscribers=self.settings.note_feed_max_subscribers,
+            )
+        return self.change_feed
+
+    def start_change_feed(self) -> None:
+        """
+        Запускает общий для процесса change stream. До его открытия (и без реплика-сета)
+        события публикует NotifyingNoteRepository.
+        """
+        source = self.settings.note_feed_source
+        if source not in FEED_SOURCES:
+            raise ValueError(f"Unknown note feed source: {source}")
+        if source == "auto" and self.settings.storage_backend == "mongo" and self.feed_task is None:
+            watcher = ChangeStreamWatcher(self.db, self.get_change_feed())
+            self.feed_task = asyncio.create_task(watcher.run())
+
+    async def get_note_repository(self) -> NoteRepository:
+        backend = self.settings.storage_backend
+        if backend == "memory":
+            logger.warning("Using in-memory note storage, data is lost on restart")
+            return InMemoryNoteRepository(tombstone_ttl_seconds=self.settings.note_tombstone_ttl_seconds)
+        if backend != "mongo":
+            raise ValueError(f"Unknown storage backend: {backend}")
         if self.client is None or self.db is None:
             self.client, self.db = await self.get_mongo_client()
-        repository = MongoNoteRepository(self.db)
+        read_preference = replica_read_preference(self.settings)
+        causal_tracker = None
+        if read_preference is not None and self.settings.read_your_writes_window_seconds > 0:
+            causal_tracker = CausalSessionTracker(
+                self.client,
+                window=self.settings.read_your_writes_window_seconds,
+                max_users=self.settings.read_your_writes_max_users,
+            )
+        return MongoNoteRepository(
+            self.db,
+            max_time_ms=self.settings.mongo_max_time_ms,
+            replica_read_preference=read_preference,
+            causal_tracker=causal_tracker,
+            tombstone_ttl_seconds=self.settings.note_tombstone_ttl_seconds,
+        )
+
+    async def get_note_manager(self) -> NoteManager:
+        # Кэш оборачивает уже замеряемый репозиторий: попадания в кэш не считаются стадией db
+        repository = timed(await self.get_note_repository(), "db")
+        cache = self.get_note_cache()
+        if cache is not None:
+            repository = CachedNoteRepository(repository, cache)
+        repository = NotifyingNoteRepository(repository, self.get_change_feed())
+        self.start_change_feed()
         broker = await self.get_message_broker()
         manager = NoteManager(repository, broker)  # Передаем брокер как зависимость
-        asyncio.create_task(self.start_consuming(manager))
+        self.consumer_task = asyncio.create_task(self.start_consuming(manager))
         return manager
 
     async def start_consuming(self, manager: NoteManager):
-        async def callback(body: str):
-            from json import loads
-            message = loads(body)
+        async def callback(message: dict):
             event_type = message.get("event_type")
             user_id = message.get("user_id")
             if event_type == "user.created":
@@ -49,16 +142,67 @@ class Container:
                 await manager.create_note(welcome_note, user_id)
                 logger.info(f"Created welcome note for user: {user_id}")
             elif event_type == "user.deleted":
-                notes = await manager.get_notes_by_user(user_id)
-                for note in notes:
-                    await manager.delete_note(note.id)
-                logger.info(f"Deleted all notes for user: {user_id}")
+                if self.settings.user_purge_chunk_size:
+                    # Порционное удаление с паузами идёт минуты: возвращаем его отдельной задачей,
+                    # чтобы не задерживать события других пользователей той же партиции
+                    return purge_notes(user_id)
+                await purge_notes(user_id)
+
+        async def purge_notes(user_id: str) -> None:
+            deleted = await manager.delete_notes_by_user(
+                user_id,
+                chunk_size=self.settings.user_purge_chunk_size or None,
+                pause_seconds=self.settings.user_purge_pause_seconds,
+            )
+            logger.info(f"Deleted {deleted} notes for user: {user_id}")
+
         broker = await self.get_message_broker()
-        await broker.consume("user.events", callback)
+        await broker.consume(
+            "user.events",
+            callback,
+            prefetch=self.settings.consumer_prefetch,
+            concurrency=self.settings.consumer_concurrency,
+            partition_key=lambda message: message.get("user_id"),
+        )
+
+    async def prepare_indexes(self, *repositories) -> None:
+        """
+        Создаёт индексы и проверяет планы запросов. В режиме fail выполняется до старта
+        приложения (ошибка прерывает запуск), иначе — в фоне, не задерживая старт воркера.
+        """
+        if self.settings.index_check_mode not in INDEX_CHECK_MODES:
+            raise ValueError(f"Unknown index check mode: {self.settings.index_check_mode}")
+        if self.settings.index_check_mode == "fail":
+            await self._prepare_indexes(repositories)
+        else:
+            self.index_task = asyncio.create_task(self._run_in_background(self._prepare_indexes(repositories)))
+
+    async def _prepare_indexes(self, repositories) -> None:
+        for repository in repositories:
+            if self.settings.index_auto_create:
+                await repository.init_indexes()
+            await repository.check_query_plans(self.settings.index_check_mode)
+
+    @staticmethod
+    async def _run_in_background(job) -> None:
+        try:
+            await job
+        except Exception as e:
+            logger.error(f"Index preparation failed: {e}")
 
     async def close(self) -> None:
+        if self.index_task:
+            self.index_task.cancel()
+        if self.consumer_task:
+            self.consumer_task.cancel()
+        if self.feed_task:
+            self.feed_task.cancel()
+        if self.change_feed:
+            self.change_feed.close()
         if self.client:
             self.client.close()
         if self.broker:
             await self.broker.close()
+        if isinstance(self.note_cache, RedisNoteCache):
+            await self.note_cache.close()
         logger.info("MongoDB connection closed")
\ No newline at end of file
@@ -2,8 +2,10 @@ from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from note_service.app.application.note_manager import NoteManager
 from note_service.app.domain.models.user import User
+from note_service.app.infrastructure.change_feed import NoteChangeFeed
 from jose import JWTError, jwt
 from note_service.app.core.config import settings
+from note_service.app.core.timing import stage
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=settings.auth_token_url)
 def get_note_manager(request: Request) -> NoteManager:
@@ -12,6 +14,12 @@ def get_note_manager(request: Request) -> NoteManager:
         raise HTTPException(status_code=500, detail="NoteManager not initialized")
     return manager
 
+def get_change_feed(request: Request) -> NoteChangeFeed:
+    feed: NoteChangeFeed | None = getattr(request.app.state, "note_feed", None)
+    if feed is None:
+        raise HTTPException(status_code=500, detail="Note change feed not initialized")
+    return feed
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -19,10 +27,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        with stage("auth"):
+            payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-        return User(id=user_id, username="")
+        return User(id=user_id, username=payload.get("username", ""))
     except JWTError:
         raise credentials_exception
\ No newline at end of file
@@ -1,4 +1,7 @@
 from .interfaces import NoteRepository
-from .models import Note, NoteView, NoteCreate, NoteUpdate, User
+from .models import Note, NoteView, NoteCreate, NoteUpdate, NoteBatchUpdate, NoteBatchResult, NoteBatchStatus, NoteSearchHit, NoteTombstone, NoteChanges, User
 
-__all__ = ["NoteRepository", "Note", "NoteCreate", "NoteView", "NoteUpdate", "User"]
+__all__ = [
+    "NoteRepository", "Note", "NoteCreate", "NoteView", "NoteUpdate",
+    "NoteBatchUpdate", "NoteBatchResult", "NoteBatchStatus", "NoteSearchHit", "NoteTombstone", "NoteChanges", "User",
+]
@@ -0,0 +1,46 @@
+"""
+Токен синхронизации для GET /api/notes/changes.
+Позиция в потоке изменений — пара (время изменения в миллисекундах, id заметки):
+MongoDB хранит datetime с точностью до миллисекунд, поэтому сравнение идёт в миллисекундах
+и одинаково для MongoDB и хранилища в памяти. Токен без id означает «всё до этого момента
+включительно уже получено».
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+ChangePosition = Tuple[int, str]
+
+def to_millis(moment: datetime) -> int:
+    return (moment - EPOCH) // _MILLISECOND
+
+def from_millis(millis: int) -> datetime:
+    """
+    Обратное to_millis; значение вне диапазона datetime — ValueError.
+    """
+    try:
+        return EPOCH + millis * _MILLISECOND
+    except OverflowError as e:
+        raise ValueError(f"Timestamp out of range: {millis}") from e
+
+def change_position(moment: datetime, note_id: str) -> ChangePosition:
+    """
+    Ключ упорядочивания изменений: заметки и tombstone сортируются по нему вместе.
+    """
+    return to_millis(moment), note_id
+
+def encode_change_token(millis: int, note_id: Optional[str] = None) -> str:
+    return f"{millis}_{note_id}" if note_id else str(millis)
+
+def decode_change_token(token: str) -> Tuple[int, Optional[str]]:
+    millis, _, note_id = token.partition("_")
+    try:
+        if not millis.isdigit():
+            raise ValueError
+        from_millis(int(millis))
+        return int(millis), note_id or None
+    except ValueError as e:
+        raise ValueError(f"Invalid sync token: {token}") from e
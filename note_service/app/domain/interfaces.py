@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from note_service.app.domain.models.note import Note
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+from note_service.app.domain.models.note import Note, NoteBatchResult
 
 class NoteRepository(ABC):
     @abstractmethod
@@ -19,10 +20,125 @@ class NoteRepository(ABC):
     async def delete_note(self, note_id: str) -> bool:
         pass
 
+    @abstractmethod
+    async def update_user_note(
+        self, note_id: str, user_id: str, note_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[Note]:
+        """
+        Обновляет заметку, только если она принадлежит пользователю; одна операция с БД.
+        versions — допустимые значения updated_at (If-Match); при несовпадении возвращает None.
+        """
+        pass
+
+    @abstractmethod
+    async def delete_user_note(self, note_id: str, user_id: str) -> bool:
+        """Удаляет заметку, только если она принадлежит пользователю; одна операция с БД."""
+        pass
+
+    @abstractmethod
+    async def note_exists(self, note_id: str) -> bool:
+        pass
+
     @abstractmethod
     async def get_notes_by_user(self, user_id: str) -> List[Note]:
         pass
 
+    @abstractmethod
+    async def get_note_views_page(
+        self, user_id: str, limit: int, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """
+        Возвращает страницу заметок в виде готовых словарей NoteView без валидации.
+        fields ограничивает набор полей (проекция на стороне БД); id возвращается всегда.
+        """
+        pass
+
+    @abstractmethod
+    def stream_note_views(
+        self, user_id: str, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[dict]:
+        """Отдаёт заметки пользователя по одной в виде словарей NoteView, не загружая их все в память."""
+        pass
+
+    @abstractmethod
+    async def search_notes(self, user_id: str, query: str, limit: int, after: Optional[str] = None) -> List[dict]:
+        """
+        Полнотекстовый поиск по заметкам пользователя, по убыванию релевантности.
+        Возвращает словари с полями id, title, content, score, created_at, updated_at.
+        Курсор after — закодированная пара (score, id); некорректный курсор — ValueError.
+        """
+        pass
+
+    @abstractmethod
+    async def get_changes(
+        self, user_id: str, since: Optional[Tuple[int, Optional[str]]], until: datetime, limit: int
+    ) -> Tuple[List[dict], List[dict]]:
+        """
+        Изменения заметок пользователя после позиции since (миллисекунды, id) и не позже until.
+        Возвращает до limit словарей NoteView и до limit tombstone ({"id", "deleted_at"}),
+        каждый список упорядочен по (время, id). При since=None tombstone не нужны и не читаются.
+        """
+        pass
+
+    @abstractmethod
+    async def create_notes(self, notes: List[Note]) -> List[NoteBatchResult]:
+        """Вставляет заметки одним пакетом; ошибка одного элемента не прерывает остальные."""
+        pass
+
+    @abstractmethod
+    async def update_notes(self, user_id: str, updates: List[Tuple[str, dict]]) -> List[NoteBatchResult]:
+        """Обновляет заметки пользователя пакетом: updates — пары (note_id, данные)."""
+        pass
+
+    @abstractmethod
+    async def delete_notes(self, user_id: str, note_ids: List[str]) -> List[NoteBatchResult]:
+        """Удаляет заметки пользователя пакетом."""
+        pass
+
+    @abstractmethod
+    async def delete_notes_by_user(
+        self, user_id: str, chunk_size: Optional[int] = None, pause_seconds: float = 0.0
+    ) -> int:
+        """
+        Удаляет все заметки пользователя и возвращает их количество.
+        При chunk_size удаление идёт порциями с паузой pause_seconds между ними.
+        """
+        pass
+
+class NoteCache(ABC):
+    """
+    Кэш заметок по идентификатору. Хранит и отрицательные записи для отсутствующих id.
+    """
+    @abstractmethod
+    async def get(self, note_id: str) -> Tuple[bool, Optional[Note]]:
+        """Возвращает (найдено в кэше, заметка); заметка None означает закэшированное отсутствие."""
+        pass
+
+    @abstractmethod
+    async def snapshot(self, note_id: str) -> object:
+        """
+        Метка состояния кэша, снимаемая до чтения заметки из хранилища. set и set_missing
+        с этой меткой ничего не запишут, если после неё заметку инвалидировали.
+        """
+        pass
+
+    @abstractmethod
+    async def set(self, note: Note, snapshot: object) -> None:
+        pass
+
+    @abstractmethod
+    async def set_missing(self, note_id: str, snapshot: object) -> None:
+        pass
+
+    @abstractmethod
+    async def invalidate(self, note_id: str) -> None:
+        pass
+
+    @abstractmethod
+    async def invalidate_user(self, user_id: str) -> None:
+        """Удаляет из кэша все заметки пользователя."""
+        pass
+
 class MessageBroker(ABC):
     @abstractmethod
     async def publish(self, queue: str, message: dict) -> None:
@@ -30,6 +146,18 @@ class MessageBroker(ABC):
         pass
 
     @abstractmethod
-    async def consume(self, queue: str, callback) -> None:
-        """Подписывается на очередь и вызывает callback для каждого сообщения."""
+    async def consume(
+        self,
+        queue: str,
+        callback,
+        prefetch: Optional[int] = None,
+        concurrency: int = 1,
+        partition_key: Optional[Callable[[dict], Optional[str]]] = None,
+    ) -> None:
+        """
+        Подписывается на очередь и вызывает callback с разобранным сообщением (dict).
+        При concurrency > 1 сообщения с одинаковым partition_key обрабатываются по порядку.
+        Если callback вернул awaitable, он выполняется отдельной задачей вне очереди
+        партиции, и сообщение подтверждается после его завершения.
+        """
         pass
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .note import Note, NoteView, NoteCreate, NoteUpdate
+from .note import Note, NoteView, NoteCreate, NoteUpdate, NoteBatchUpdate, NoteBatchResult, NoteBatchStatus, NoteSearchHit, NoteTombstone, NoteChanges
 from .user import User
 
-__all__ = ["Note", "NoteCreate", "NoteView", "NoteUpdate", "User"]
+__all__ = ["Note", "NoteCreate", "NoteView", "NoteUpdate", "NoteBatchUpdate", "NoteBatchResult", "NoteBatchStatus", "NoteSearchHit", "NoteTombstone", "NoteChanges", "User"]
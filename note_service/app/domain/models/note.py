@@ -4,8 +4,14 @@
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from enum import Enum
+
+# Поля NoteView, которые клиент может запросить через проекцию
+NOTE_VIEW_FIELDS = ("id", "title", "content", "created_at", "updated_at")
+# Сокращённое представление для списков: без тела заметки
+NOTE_SUMMARY_FIELDS = ("id", "title", "created_at", "updated_at")
 
 class Note(BaseModel):
     """
@@ -28,6 +34,35 @@ class NoteView(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class NoteSearchHit(BaseModel):
+    """
+    Результат поиска: заметка без полного текста, с релевантностью и фрагментом.
+    В snippet найденные слова обёрнуты в <mark>, остальной текст экранирован.
+    """
+    id: str
+    title: str
+    snippet: str
+    score: float
+    created_at: datetime
+    updated_at: datetime
+
+class NoteTombstone(BaseModel):
+    """
+    Запись об удалённой заметке в потоке изменений.
+    """
+    id: str
+    deleted_at: datetime
+
+class NoteChanges(BaseModel):
+    """
+    Страница изменений заметок после токена синхронизации.
+    next_since передаётся в следующий запрос; при has_more=true изменения получены не все.
+    """
+    notes: List[NoteView]
+    deleted: List[NoteTombstone]
+    next_since: str
+    has_more: bool
+
 class NoteCreate(BaseModel):
     """
     Модель для создания новой заметки.
@@ -41,3 +76,26 @@ class NoteUpdate(BaseModel):
     """
     title: Optional[str] = None
     content: Optional[str] = None
+
+class NoteBatchUpdate(NoteUpdate):
+    """
+    Элемент пакетного обновления заметок.
+    """
+    id: str
+
+class NoteBatchStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    NOT_FOUND = "not_found"
+    FAILED = "failed"
+
+class NoteBatchResult(BaseModel):
+    """
+    Результат пакетной операции для одного элемента.
+    index — позиция элемента в запросе.
+    """
+    index: int
+    id: Optional[str] = None
+    status: NoteBatchStatus
+    error: Optional[str] = None
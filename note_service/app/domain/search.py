@@ -0,0 +1,77 @@
+"""
+Правила полнотекстового поиска заметок, общие для всех реализаций репозитория:
+разбор запроса, курсор ранжированной выдачи и подсветка фрагментов.
+"""
+
+import html
+import re
+from typing import List, Tuple
+
+# Веса полей текстового индекса: совпадение в заголовке важнее совпадения в тексте
+SEARCH_WEIGHTS = {"title": 3, "content": 1}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Разбивает текст на слова в нижнем регистре.
+    """
+    return [word.lower() for word in _WORD.findall(text)]
+
+def parse_query(query: str) -> Tuple[List[str], List[str]]:
+    """
+    Возвращает (искомые, исключённые) термы. Слова с префиксом "-" исключаются,
+    как в операторе $text MongoDB.
+    """
+    terms: List[str] = []
+    excluded: List[str] = []
+    for part in query.split():
+        if part.startswith("-"):
+            excluded.extend(tokenize(part[1:]))
+        else:
+            terms.extend(tokenize(part))
+    return terms, excluded
+
+def encode_search_cursor(score: float, note_id: str) -> str:
+    """
+    Курсор ранжированной выдачи — пара (score, id) последнего результата страницы.
+    """
+    return f"{score!r}_{note_id}"
+
+def decode_search_cursor(cursor: str) -> Tuple[float, str]:
+    score, separator, note_id = cursor.rpartition("_")
+    try:
+        if not separator or not note_id:
+            raise ValueError
+        return float(score), note_id
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def highlight_snippet(text: str, terms: List[str], length: int) -> str:
+    """
+    Вырезает фрагмент текста длиной около length вокруг первого совпадения
+    и оборачивает найденные слова в <mark>. Текст экранируется как HTML.
+    """
+    wanted = set(terms)
+    matches = [match for match in _WORD.finditer(text) if match.group().lower() in wanted]
+    start = 0
+    if matches:
+        start = max(0, matches[0].start() - length // 4)
+        # Не начинаем фрагмент с середины слова
+        while 0 < start < matches[0].start() and text[start - 1].isalnum():
+            start += 1
+    end = min(len(text), start + length)
+    parts: List[str] = ["…"] if start > 0 else []
+    position = start
+    for match in matches:
+        if match.start() < start:
+            continue
+        if match.end() > end:
+            break
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    if end < len(text):
+        parts.append("…")
+    return "".join(parts)
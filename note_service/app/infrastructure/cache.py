@@ -0,0 +1,294 @@
+"""
+Кэширование заметок поверх NoteRepository.
+CachedNoteRepository оборачивает любой репозиторий: точечные чтения идут через кэш,
+операции записи инвалидируют затронутые записи.
+Чтение, начатое до записи, не должно вернуть в кэш устаревшую заметку: перед чтением
+из хранилища снимается метка (snapshot), и кэш принимает значение, только если
+инвалидаций после неё не было. В Redis метка — счётчик поколений, и проверка идёт
+на стороне Redis, поэтому защищает и от записей в других воркерах.
+"""
+
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+from note_service.app.core.metrics import CACHE_HITS, CACHE_MISSES
+from note_service.app.domain.interfaces import NoteCache, NoteRepository
+from note_service.app.domain.models.note import Note, NoteBatchResult, NoteBatchStatus
+
+logger = logging.getLogger(__name__)
+
+class InMemoryNoteCache(NoteCache):
+    """
+    LRU-кэш в памяти процесса с TTL для найденных и отсутствующих заметок.
+    Метка — общий счётчик инвалидаций процесса.
+    """
+    backend = "memory"
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Note]]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._epoch = 0
+
+    async def get(self, note_id: str) -> Tuple[bool, Optional[Note]]:
+        entry = self._entries.get(note_id)
+        if entry is None:
+            return False, None
+        expires_at, note = entry
+        if expires_at < monotonic():
+            self._evict(note_id)
+            return False, None
+        self._entries.move_to_end(note_id)
+        return True, note
+
+    async def snapshot(self, note_id: str) -> object:
+        return self._epoch
+
+    async def set(self, note: Note, snapshot: object) -> None:
+        if snapshot != self._epoch:
+            return
+        self._store(note.id, note, self.ttl)
+        self._by_user.setdefault(note.user_id, set()).add(note.id)
+
+    async def set_missing(self, note_id: str, snapshot: object) -> None:
+        if snapshot != self._epoch:
+            return
+        self._store(note_id, None, self.negative_ttl)
+
+    async def invalidate(self, note_id: str) -> None:
+        self._epoch += 1
+        self._evict(note_id)
+
+    async def invalidate_user(self, user_id: str) -> None:
+        self._epoch += 1
+        for note_id in self._by_user.pop(user_id, set()):
+            self._entries.pop(note_id, None)
+
+    def _store(self, note_id: str, note: Optional[Note], ttl: float) -> None:
+        self._evict(note_id)
+        self._entries[note_id] = (monotonic() + ttl, note)
+        while len(self._entries) > self.max_entries:
+            oldest_id = next(iter(self._entries))
+            self._evict(oldest_id)
+
+    def _evict(self, note_id: str) -> None:
+        entry = self._entries.pop(note_id, None)
+        if entry is None or entry[1] is None:
+            return
+        user_notes = self._by_user.get(entry[1].user_id)
+        if user_notes is not None:
+            user_notes.discard(note_id)
+            if not user_notes:
+                del self._by_user[entry[1].user_id]
+
+# Запись в кэш, только если поколения заметки и удалений пользователей не изменились с метки.
+# KEYS: заметка, поколение заметки, поколение удалений[, множество заметок пользователя];
+# ARGV: поколение заметки, поколение удалений, значение, TTL[, id заметки]
+_SET_IF_UNCHANGED = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] or (redis.call('GET', KEYS[3]) or '') ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+if #KEYS == 4 then
+    redis.call('SADD', KEYS[4], ARGV[5])
+    redis.call('EXPIRE', KEYS[4], ARGV[4])
+end
+return 1
+"""
+
+class RedisNoteCache(NoteCache):
+    """
+    Общий для всех воркеров кэш в Redis. Требует пакет redis (не входит в базовые зависимости).
+    Инвалидация заметки увеличивает её поколение, удаление заметок пользователя — общее
+    поколение удалений (id ещё не закэшированных заметок пользователя неизвестны).
+    Метка — пара этих поколений; запись сравнивает их атомарно скриптом Lua.
+    """
+    backend = "redis"
+    _missing = b""
+    # Поколение живёт дольше любого чтения из хранилища (ограничено maxTimeMS):
+    # иначе истёкший счётчик совпал бы с меткой, снятой до записи
+    generation_ttl = 3600
+
+    def __init__(self, url: str, ttl: float, negative_ttl: float, prefix: str = "note_service") -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("NOTE_CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.client = redis.from_url(url)
+        self.ttl = max(1, int(ttl))
+        self.negative_ttl = max(1, int(negative_ttl))
+        self.prefix = prefix
+        self._set_if_unchanged = self.client.register_script(_SET_IF_UNCHANGED)
+
+    async def get(self, note_id: str) -> Tuple[bool, Optional[Note]]:
+        value = await self.client.get(self._note_key(note_id))
+        if value is None:
+            return False, None
+        if value == self._missing:
+            return True, None
+        return True, Note.parse_obj(json.loads(value))
+
+    async def snapshot(self, note_id: str) -> object:
+        generations = await self.client.mget(self._generation_key(note_id), self._purge_key())
+        return tuple((generation or b"").decode() for generation in generations)
+
+    async def set(self, note: Note, snapshot: object) -> None:
+        await self._set_if_unchanged(
+            keys=[
+                self._note_key(note.id), self._generation_key(note.id), self._purge_key(), self._user_key(note.user_id)
+            ],
+            args=[*snapshot, note.json(by_alias=True), self.ttl, note.id],
+        )
+
+    async def set_missing(self, note_id: str, snapshot: object) -> None:
+        await self._set_if_unchanged(
+            keys=[self._note_key(note_id), self._generation_key(note_id), self._purge_key()],
+            args=[*snapshot, self._missing, self.negative_ttl],
+        )
+
+    async def invalidate(self, note_id: str) -> None:
+        generation_key = self._generation_key(note_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, self.generation_ttl)
+            pipe.delete(self._note_key(note_id))
+            await pipe.execute()
+
+    async def invalidate_user(self, user_id: str) -> None:
+        user_key = self._user_key(user_id)
+        note_ids = await self.client.smembers(user_key)
+        keys = [self._note_key(note_id.decode()) for note_id in note_ids]
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incr(self._purge_key())
+            pipe.delete(user_key, *keys)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def _note_key(self, note_id: str) -> str:
+        return f"{self.prefix}:note:{note_id}"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.prefix}:user_notes:{user_id}"
+
+    def _generation_key(self, note_id: str) -> str:
+        return f"{self.prefix}:note_generation:{note_id}"
+
+    def _purge_key(self) -> str:
+        return f"{self.prefix}:purge_generation"
+
+class CachedNoteRepository(NoteRepository):
+    """
+    Read-through кэш над репозиторием заметок.
+    Списки и курсоры не кэшируются и передаются напрямую.
+    """
+    def __init__(self, repository: NoteRepository, cache: NoteCache) -> None:
+        self.repository = repository
+        self.cache = cache
+        self.backend = getattr(cache, "backend", type(cache).__name__)
+
+    def __getattr__(self, name: str):
+        # Методы конкретного репозитория вне порта (например, init_indexes)
+        return getattr(self.repository, name)
+
+    async def get_note(self, note_id: str) -> Optional[Note]:
+        found, note = await self.cache.get(note_id)
+        if found:
+            CACHE_HITS.labels(backend=self.backend, kind="positive" if note else "negative").inc()
+            return note.copy() if note else None
+        CACHE_MISSES.labels(backend=self.backend).inc()
+        snapshot = await self.cache.snapshot(note_id)
+        note = await self.repository.get_note(note_id)
+        if note:
+            await self.cache.set(note.copy(), snapshot)
+        else:
+            await self.cache.set_missing(note_id, snapshot)
+        return note
+
+    async def note_exists(self, note_id: str) -> bool:
+        return await self.get_note(note_id) is not None
+
+    async def create_note(self, note: Note) -> Note:
+        created_note = await self.repository.create_note(note)
+        await self._invalidate(created_note.id)
+        return created_note
+
+    async def update_note(self, note_id: str, note_data: dict) -> Optional[Note]:
+        updated_note = await self.repository.update_note(note_id, note_data)
+        await self._invalidate(note_id)
+        return updated_note
+
+    async def update_user_note(
+        self, note_id: str, user_id: str, note_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[Note]:
+        updated_note = await self.repository.update_user_note(note_id, user_id, note_data, versions)
+        await self._invalidate(note_id)
+        return updated_note
+
+    async def delete_note(self, note_id: str) -> bool:
+        success = await self.repository.delete_note(note_id)
+        await self._invalidate(note_id)
+        return success
+
+    async def delete_user_note(self, note_id: str, user_id: str) -> bool:
+        success = await self.repository.delete_user_note(note_id, user_id)
+        await self._invalidate(note_id)
+        return success
+
+    async def create_notes(self, notes: List[Note]) -> List[NoteBatchResult]:
+        return await self.repository.create_notes(notes)
+
+    async def update_notes(self, user_id: str, updates: List[Tuple[str, dict]]) -> List[NoteBatchResult]:
+        results = await self.repository.update_notes(user_id, updates)
+        for result in results:
+            if result.status == NoteBatchStatus.UPDATED:
+                await self._invalidate(result.id)
+        return results
+
+    async def delete_notes(self, user_id: str, note_ids: List[str]) -> List[NoteBatchResult]:
+        results = await self.repository.delete_notes(user_id, note_ids)
+        for result in results:
+            if result.status == NoteBatchStatus.DELETED:
+                await self._invalidate(result.id)
+        return results
+
+    async def delete_notes_by_user(
+        self, user_id: str, chunk_size: Optional[int] = None, pause_seconds: float = 0.0
+    ) -> int:
+        deleted = await self.repository.delete_notes_by_user(user_id, chunk_size, pause_seconds)
+        await self.invalidate_user(user_id)
+        return deleted
+
+    async def invalidate_user(self, user_id: str) -> None:
+        await self.cache.invalidate_user(user_id)
+
+    async def get_notes_by_user(self, user_id: str) -> List[Note]:
+        return await self.repository.get_notes_by_user(user_id)
+
+    async def get_note_views_page(
+        self, user_id: str, limit: int, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        return await self.repository.get_note_views_page(user_id, limit, after, fields)
+
+    def stream_note_views(
+        self, user_id: str, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[dict]:
+        return self.repository.stream_note_views(user_id, after, fields)
+
+    async def search_notes(self, user_id: str, query: str, limit: int, after: Optional[str] = None) -> List[dict]:
+        return await self.repository.search_notes(user_id, query, limit, after)
+
+    async def get_changes(
+        self, user_id: str, since: Optional[Tuple[int, Optional[str]]], until: datetime, limit: int
+    ) -> Tuple[List[dict], List[dict]]:
+        return await self.repository.get_changes(user_id, since, until, limit)
+
+    async def _invalidate(self, note_id: Optional[str]) -> None:
+        if note_id:
+            await self.cache.invalidate(note_id)
@@ -0,0 +1,333 @@
+"""
+Поток изменений заметок для подписчиков (GET /api/notes/events, Server-Sent Events).
+NoteChangeFeed раздаёт события подписчикам пользователя: кадр SSE кодируется один раз
+на событие, у каждого подписчика своя ограниченная очередь.
+Источник событий — один ChangeStreamWatcher на процесс (change streams MongoDB, нужен
+реплика-сет) либо, если change streams недоступны, NotifyingNoteRepository, который
+публикует записи этого процесса. Во втором случае подписчик видит только изменения,
+сделанные через тот же воркер, поэтому для нескольких воркеров нужен реплика-сет.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+import orjson
+from pymongo.errors import OperationFailure, PyMongoError
+from note_service.app.core.metrics import NOTE_FEED_EVENTS, NOTE_FEED_OVERFLOWS, NOTE_FEED_SUBSCRIBERS
+from note_service.app.domain.interfaces import NoteRepository
+from note_service.app.domain.models.note import Note, NoteBatchResult, NoteBatchStatus, NOTE_VIEW_FIELDS
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+# Часть событий потеряна: клиент догоняет состояние через GET /api/notes/changes
+RESYNC = "resync"
+OVERFLOW_POLICIES = ("resync", "disconnect")
+FEED_SOURCES = ("auto", "local")
+
+_HEARTBEAT_FRAME = b": ping\n\n"
+# Коды ошибок MongoDB: change streams не поддерживаются (standalone) и потеряна история oplog
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+def sse_frame(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+_RESYNC_FRAME = sse_frame(RESYNC, {})
+
+class Subscription:
+    """
+    Подписка одного клиента. None в очереди закрывает поток.
+    """
+    __slots__ = ("user_id", "queue")
+
+    def __init__(self, user_id: str, queue_size: int) -> None:
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def frames(self, heartbeat_seconds: float) -> AsyncIterator[bytes]:
+        """
+        Кадры SSE; при отсутствии событий — комментарий-heartbeat, чтобы прокси не
+        закрывали соединение, а отключение клиента обнаруживалось.
+        """
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield _HEARTBEAT_FRAME
+                continue
+            if frame is None:
+                return
+            yield frame
+
+    def drain(self) -> int:
+        dropped = 0
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            dropped += 1
+        return dropped
+
+class NoteChangeFeed:
+    """
+    Раздача событий подписчикам по user_id.
+    Медленный подписчик, чья очередь заполнена, теряет накопленные события и получает
+    resync (политика resync) или resync и закрытие потока (политика disconnect);
+    публикация никогда не ждёт подписчиков.
+    """
+    def __init__(self, queue_size: int = 256, overflow: str = "resync", max_subscribers: int = 10000) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown note feed overflow policy: {overflow}")
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.max_subscribers = max_subscribers
+        # Публиковать ли записи этого процесса; выключается, когда работает change stream
+        self.local_events = True
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def has_subscribers(self, user_id: Optional[str] = None) -> bool:
+        return user_id in self._subscribers if user_id is not None else self._count > 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        # Очередь на 2 больше: после сброса всегда помещаются resync и закрытие
+        subscription = Subscription(user_id, self.queue_size + 2)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        self._count += 1
+        NOTE_FEED_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+        self._count -= 1
+        NOTE_FEED_SUBSCRIBERS.dec()
+
+    def publish(self, user_id: str, event: str, data: dict) -> None:
+        subscribers = self._subscribers.get(user_id)
+        if not subscribers:
+            return
+        NOTE_FEED_EVENTS.labels(type=event).inc()
+        frame = sse_frame(event, data)
+        for subscription in list(subscribers):
+            if subscription.queue.qsize() >= self.queue_size:
+                self._overflow(subscription)
+            else:
+                subscription.queue.put_nowait(frame)
+
+    def resync_all(self) -> None:
+        """
+        Просит всех подписчиков догнать состояние (например, после потери истории change stream).
+        """
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.drain()
+                subscription.queue.put_nowait(_RESYNC_FRAME)
+
+    def close(self) -> None:
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.drain()
+                subscription.queue.put_nowait(None)
+                self.unsubscribe(subscription)
+
+    def _overflow(self, subscription: Subscription) -> None:
+        dropped = subscription.drain()
+        NOTE_FEED_OVERFLOWS.labels(policy=self.overflow).inc()
+        logger.warning(f"Note feed subscriber of {subscription.user_id} overflowed, dropped {dropped} events")
+        subscription.queue.put_nowait(_RESYNC_FRAME)
+        if self.overflow == "disconnect":
+            subscription.queue.put_nowait(None)
+            self.unsubscribe(subscription)
+
+def note_event(note: Note) -> dict:
+    return {"id": note.id, "note": {field: getattr(note, field) for field in NOTE_VIEW_FIELDS}}
+
+def deleted_event(note_id: str, deleted_at: datetime) -> dict:
+    return {"id": note_id, "deleted_at": deleted_at}
+
+class ChangeStreamWatcher:
+    """
+    Один change stream на процесс по коллекциям notes и note_tombstones.
+    Удаление берётся из вставки tombstone: в событии delete самой заметки нет user_id.
+    После сбоя поток возобновляется с последнего resume token; если история oplog уже
+    потеряна, подписчики получают resync.
+    """
+    PIPELINE = [{"$match": {
+        "ns.coll": {"$in": ["notes", "note_tombstones"]},
+        "operationType": {"$in": ["insert", "update", "replace"]},
+    }}]
+
+    def __init__(self, db, feed: NoteChangeFeed, retry_seconds: float = 1.0, max_retry_seconds: float = 30.0) -> None:
+        self.db = db
+        self.feed = feed
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.resume_token = None
+
+    async def run(self) -> None:
+        delay = self.retry_seconds
+        while True:
+            try:
+                # updateLookup: одно чтение документа на изменение вместо чтения на каждого подписчика
+                async with self.db.watch(
+                    self.PIPELINE, full_document="updateLookup", resume_after=self.resume_token
+                ) as stream:
+                    if self.feed.local_events:
+                        self.feed.local_events = False
+                        logger.info("Note change feed is using MongoDB change streams")
+                    delay = self.retry_seconds
+                    async for change in stream:
+                        self.resume_token = stream.resume_token
+                        self.dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning("MongoDB change streams are unavailable, note change feed uses local events")
+                    self.feed.local_events = True
+                    return
+                if e.code == _CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Note change stream history lost, subscribers must resync")
+                    self.resume_token = None
+                    self.feed.resync_all()
+                    continue
+                logger.error(f"Note change stream failed: {e}")
+            except PyMongoError as e:
+                logger.error(f"Note change stream failed: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_seconds)
+
+    def dispatch(self, change: dict) -> None:
+        document = change.get("fullDocument")
+        if document is None:
+            # Заметка удалена до чтения updateLookup: событие придёт из tombstone
+            return
+        note_id = str(document["_id"])
+        if change["ns"]["coll"] == "note_tombstones":
+            self.feed.publish(document["user_id"], DELETED, deleted_event(note_id, document["deleted_at"]))
+            return
+        event = CREATED if change["operationType"] == "insert" else UPDATED
+        view = {field: document[field] for field in NOTE_VIEW_FIELDS if field != "id"}
+        view["id"] = note_id
+        self.feed.publish(document["user_id"], event, {"id": note_id, "note": view})
+
+class NotifyingNoteRepository(NoteRepository):
+    """
+    Публикует в NoteChangeFeed изменения, сделанные через этот репозиторий, когда
+    change streams недоступны. Если у пользователя нет подписчиков, лишней работы нет.
+    Удаление всех заметок пользователя (при удалении пользователя) не публикуется.
+    """
+    def __init__(self, repository: NoteRepository, feed: NoteChangeFeed) -> None:
+        self.repository = repository
+        self.feed = feed
+
+    def __getattr__(self, name: str):
+        return getattr(self.repository, name)
+
+    def _listening(self, user_id: Optional[str] = None) -> bool:
+        return self.feed.local_events and self.feed.has_subscribers(user_id)
+
+    async def create_note(self, note: Note) -> Note:
+        created = await self.repository.create_note(note)
+        if self._listening(created.user_id):
+            self.feed.publish(created.user_id, CREATED, note_event(created))
+        return created
+
+    async def get_note(self, note_id: str) -> Optional[Note]:
+        return await self.repository.get_note(note_id)
+
+    async def update_note(self, note_id: str, note_data: dict) -> Optional[Note]:
+        note = await self.repository.update_note(note_id, note_data)
+        if note is not None and self._listening(note.user_id):
+            self.feed.publish(note.user_id, UPDATED, note_event(note))
+        return note
+
+    async def delete_note(self, note_id: str) -> bool:
+        # Владелец нужен только для публикации: читаем его, лишь если кто-то подписан
+        note = await self.repository.get_note(note_id) if self._listening() else None
+        success = await self.repository.delete_note(note_id)
+        if success and note is not None:
+            self.feed.publish(note.user_id, DELETED, deleted_event(note_id, datetime.utcnow()))
+        return success
+
+    async def update_user_note(
+        self, note_id: str, user_id: str, note_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[Note]:
+        note = await self.repository.update_user_note(note_id, user_id, note_data, versions)
+        if note is not None and self._listening(user_id):
+            self.feed.publish(user_id, UPDATED, note_event(note))
+        return note
+
+    async def delete_user_note(self, note_id: str, user_id: str) -> bool:
+        success = await self.repository.delete_user_note(note_id, user_id)
+        if success and self._listening(user_id):
+            self.feed.publish(user_id, DELETED, deleted_event(note_id, datetime.utcnow()))
+        return success
+
+    async def note_exists(self, note_id: str) -> bool:
+        return await self.repository.note_exists(note_id)
+
+    async def get_notes_by_user(self, user_id: str) -> List[Note]:
+        return await self.repository.get_notes_by_user(user_id)
+
+    async def get_note_views_page(
+        self, user_id: str, limit: int, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        return await self.repository.get_note_views_page(user_id, limit, after, fields)
+
+    def stream_note_views(
+        self, user_id: str, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[dict]:
+        return self.repository.stream_note_views(user_id, after, fields)
+
+    async def search_notes(self, user_id: str, query: str, limit: int, after: Optional[str] = None) -> List[dict]:
+        return await self.repository.search_notes(user_id, query, limit, after)
+
+    async def get_changes(
+        self, user_id: str, since: Optional[Tuple[int, Optional[str]]], until: datetime, limit: int
+    ) -> Tuple[List[dict], List[dict]]:
+        return await self.repository.get_changes(user_id, since, until, limit)
+
+    async def create_notes(self, notes: List[Note]) -> List[NoteBatchResult]:
+        results = await self.repository.create_notes(notes)
+        for result in results:
+            note = notes[result.index]
+            if result.status == NoteBatchStatus.CREATED and self._listening(note.user_id):
+                self.feed.publish(note.user_id, CREATED, note_event(note))
+        return results
+
+    async def update_notes(self, user_id: str, updates: List[Tuple[str, dict]]) -> List[NoteBatchResult]:
+        results = await self.repository.update_notes(user_id, updates)
+        if self._listening(user_id):
+            # Пакетное обновление не возвращает документы: перечитываем только при подписчиках
+            for result in results:
+                if result.status == NoteBatchStatus.UPDATED:
+                    note = await self.repository.get_note(result.id)
+                    if note is not None:
+                        self.feed.publish(user_id, UPDATED, note_event(note))
+        return results
+
+    async def delete_notes(self, user_id: str, note_ids: List[str]) -> List[NoteBatchResult]:
+        results = await self.repository.delete_notes(user_id, note_ids)
+        if self._listening(user_id):
+            now = datetime.utcnow()
+            for result in results:
+                if result.status == NoteBatchStatus.DELETED:
+                    self.feed.publish(user_id, DELETED, deleted_event(result.id, now))
+        return results
+
+    async def delete_notes_by_user(
+        self, user_id: str, chunk_size: Optional[int] = None, pause_seconds: float = 0.0
+    ) -> int:
+        return await self.repository.delete_notes_by_user(user_id, chunk_size, pause_seconds)
@@ -0,0 +1,117 @@
+"""
+Кодеки событий брокера сообщений.
+Формат тела определяется заголовком content-type, поэтому сервисы с разными
+кодеками публикации совместимы: потребитель понимает JSON всегда, а msgpack — если
+установлен пакет msgpack; сообщения без content-type (от старых версий) читаются как JSON.
+"""
+
+import json
+from typing import Dict, Optional
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+SCHEMA_VERSION_HEADER = "x-schema-version"
+# Версия схемы событий; потребитель отклоняет сообщения более новой версии
+SCHEMA_VERSION = 1
+
+class JsonCodec:
+    name = "json"
+    content_type = JSON_CONTENT_TYPE
+
+    def encode(self, payload: dict) -> bytes:
+        return json.dumps(payload).encode()
+
+    def decode(self, body: bytes) -> dict:
+        return json.loads(body)
+
+class OrjsonCodec:
+    """
+    Тот же JSON на проводе, но кодирование и разбор через orjson.
+    """
+    name = "orjson"
+    content_type = JSON_CONTENT_TYPE
+
+    def __init__(self) -> None:
+        try:
+            import orjson
+        except ImportError as e:
+            raise RuntimeError("EVENT_CODEC=orjson requires the 'orjson' package") from e
+        self._orjson = orjson
+
+    def encode(self, payload: dict) -> bytes:
+        return self._orjson.dumps(payload)
+
+    def decode(self, body: bytes) -> dict:
+        return self._orjson.loads(body)
+
+class MsgpackCodec:
+    """
+    Компактный бинарный формат. Требует пакет msgpack (не входит в базовые зависимости).
+    """
+    name = "msgpack"
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def __init__(self) -> None:
+        try:
+            import msgpack
+        except ImportError as e:
+            raise RuntimeError("EVENT_CODEC=msgpack requires the 'msgpack' package") from e
+        self._msgpack = msgpack
+
+    def encode(self, payload: dict) -> bytes:
+        return self._msgpack.packb(payload, use_bin_type=True)
+
+    def decode(self, body: bytes) -> dict:
+        return self._msgpack.unpackb(body, raw=False)
+
+_CODECS = {"json": JsonCodec, "orjson": OrjsonCodec, "msgpack": MsgpackCodec}
+_decoders: Dict[str, object] = {}
+
+def get_codec(name: str):
+    """
+    Возвращает кодек публикации по имени из настроек.
+    """
+    try:
+        return _CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown event codec: {name}") from None
+
+def decode_message(body: bytes, content_type: Optional[str], headers: Optional[dict] = None) -> dict:
+    """
+    Разбирает тело сообщения по content-type. Ошибки формата приводятся к ValueError.
+    """
+    version = (headers or {}).get(SCHEMA_VERSION_HEADER, SCHEMA_VERSION)
+    try:
+        newer = int(version) > SCHEMA_VERSION
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid event schema version: {version!r}") from e
+    if newer:
+        raise ValueError(f"Unsupported event schema version: {version}")
+    decoder = _decoder(content_type or JSON_CONTENT_TYPE)
+    try:
+        payload = decoder.decode(body)
+    except Exception as e:
+        raise ValueError(f"Malformed {content_type or JSON_CONTENT_TYPE} message: {e}") from e
+    if not isinstance(payload, dict):
+        raise ValueError("Event payload must be an object")
+    return payload
+
+def _decoder(content_type: str):
+    decoder = _decoders.get(content_type)
+    if decoder is None:
+        if content_type in (JSON_CONTENT_TYPE, "text/plain"):
+            # orjson быстрее и читает тот же формат; без него — стандартный json
+            try:
+                decoder = OrjsonCodec()
+            except RuntimeError:
+                decoder = JsonCodec()
+        elif content_type in (MSGPACK_CONTENT_TYPE, "application/x-msgpack"):
+            try:
+                decoder = MsgpackCodec()
+            except RuntimeError as e:
+                # Без пакета msgpack сообщение не прочитать: отклоняется как некорректное
+                raise ValueError(f"Cannot decode {content_type} message: msgpack is not installed") from e
+        else:
+            raise ValueError(f"Unsupported content type: {content_type}")
+        _decoders[content_type] = decoder
+    return decoder
@@ -0,0 +1,113 @@
+"""
+Конкурентная обработка сообщений RabbitMQ с сохранением порядка по ключу.
+Сообщения распределяются по партициям хэшем ключа (например, user_id):
+партиции обрабатываются параллельно, сообщения одной партиции — строго по очереди.
+Долгую обработку callback может вернуть отдельной задачей (awaitable): партиция
+переходит к следующему сообщению, а это подтверждается, когда задача завершится.
+"""
+
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Awaitable, Callable, List, Optional, Set
+from aio_pika.abc import AbstractIncomingMessage
+from note_service.app.infrastructure.codecs import decode_message
+from note_service.app.core.metrics import (
+    CONSUMER_IN_FLIGHT, EVENT_LAG, EVENT_PROCESSING_LATENCY, EVENTS_CONSUMED
+)
+
+logger = logging.getLogger(__name__)
+
+class PartitionedConsumer:
+    """
+    Пул воркеров с партиционированием по ключу сообщения.
+    Сообщение подтверждается (ack) только после успешной обработки, в том числе
+    отложенной: неподтверждённые сообщения занимают prefetch, что ограничивает
+    число одновременных отложенных задач.
+    """
+    def __init__(
+        self,
+        queue_name: str,
+        callback: Callable[[dict], Awaitable[Optional[Awaitable[None]]]],
+        partitions: int,
+        partition_key: Optional[Callable[[dict], Optional[str]]] = None,
+    ) -> None:
+        self.queue_name = queue_name
+        self.callback = callback
+        self.partition_key = partition_key
+        self._queues: List[asyncio.Queue] = [asyncio.Queue() for _ in range(max(1, partitions))]
+        self._workers: List[asyncio.Task] = []
+        self._deferred: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    async def stop(self) -> None:
+        # Прерванные отложенные задачи не подтверждены: брокер доставит сообщения повторно
+        tasks = [*self._workers, *self._deferred]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, message: AbstractIncomingMessage) -> None:
+        try:
+            payload = decode_message(message.body, message.content_type, message.headers)
+        except ValueError as e:
+            logger.error(f"Rejecting malformed message from {self.queue_name}: {e}")
+            EVENTS_CONSUMED.labels(queue=self.queue_name, status="malformed").inc()
+            await message.reject(requeue=False)
+            return
+        self._observe_lag(message)
+        key = self.partition_key(payload) if self.partition_key else None
+        index = zlib.crc32(key.encode()) % len(self._queues) if key else 0
+        CONSUMER_IN_FLIGHT.labels(queue=self.queue_name).inc()
+        await self._queues[index].put((message, payload))
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            message, payload = await queue.get()
+            try:
+                await self._process(message, self.callback(payload), perf_counter())
+            finally:
+                queue.task_done()
+
+    async def _process(self, message: AbstractIncomingMessage, job: Awaitable, start_time: float) -> None:
+        """
+        Ждёт job и подтверждает сообщение. Если job вернул отложенную задачу,
+        она запускается отдельно и подтверждает сообщение сама.
+        """
+        deferred = None
+        try:
+            deferred = await job
+            if deferred is None:
+                await message.ack()
+            status = "ok"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process message from {self.queue_name}: {e}")
+            await message.reject(requeue=False)
+            status = "error"
+        finally:
+            if deferred is None:
+                CONSUMER_IN_FLIGHT.labels(queue=self.queue_name).dec()
+        if deferred is not None:
+            task = asyncio.create_task(self._process(message, deferred, start_time))
+            self._deferred.add(task)
+            task.add_done_callback(self._deferred.discard)
+            return
+        EVENTS_CONSUMED.labels(queue=self.queue_name, status=status).inc()
+        EVENT_PROCESSING_LATENCY.labels(queue=self.queue_name).observe(perf_counter() - start_time)
+
+    def _observe_lag(self, message: AbstractIncomingMessage) -> None:
+        published_at = message.timestamp
+        if published_at is None:
+            return
+        # AMQP хранит секунды Unix, а pamqp разбирает их в наивный datetime в UTC
+        if published_at.tzinfo is None:
+            published_at = published_at.replace(tzinfo=timezone.utc)
+        lag = (datetime.now(timezone.utc) - published_at).total_seconds()
+        EVENT_LAG.labels(queue=self.queue_name).observe(max(lag, 0.0))
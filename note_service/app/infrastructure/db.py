@@ -3,38 +3,144 @@
 Обеспечивает CRUD-операции для сущности Note с использованием библиотеки motor.
 """
 
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from bson.objectid import ObjectId, InvalidId
 from datetime import datetime
-from note_service.app.domain.models.note import Note
+from pymongo import UpdateOne
+from pymongo.read_preferences import SecondaryPreferred
+from pymongo.errors import BulkWriteError
+from note_service.app.domain.models.note import Note, NoteBatchResult, NoteBatchStatus, NOTE_VIEW_FIELDS
 from note_service.app.domain.interfaces import NoteRepository
+from note_service.app.domain.changes import from_millis
+from note_service.app.domain.search import SEARCH_WEIGHTS, decode_search_cursor
+from note_service.app.infrastructure.mongo import CausalSessionTracker, no_session
+from note_service.app.infrastructure.indexes import IndexSpec, QueryShape, drop_indexes, ensure_indexes, verify_query_plans
 import logging
 
 logger = logging.getLogger(__name__)
 
+def to_view_document(document: dict) -> dict:
+    """
+    Приводит документ MongoDB к формату NoteView без pydantic-валидации.
+    Документ должен быть получен с проекцией полей NoteView.
+    """
+    document["id"] = str(document.pop("_id"))
+    return document
+
 class MongoNoteRepository(NoteRepository):
     """
     Репозиторий для работы с заметками в MongoDB.
     """
-    def __init__(self, db) -> None:
+    INDEXES = (
+        # Keyset-пагинация и выборки по пользователю (префикс user_id заменяет отдельный индекс)
+        IndexSpec([("user_id", 1), ("_id", 1)]),
+        # Поток изменений для синхронизации: keyset по (updated_at, _id) внутри пользователя.
+        # Обратный обход этого же индекса отдаёт заметки от новых к старым
+        IndexSpec([("user_id", 1), ("updated_at", 1), ("_id", 1)]),
+        # Текстовый индекс с префиксом user_id: поиск всегда ограничен одним пользователем.
+        # Язык "none" отключает стемминг, чтобы подсветка совпадала с найденными словами.
+        IndexSpec(
+            [("user_id", 1), ("title", "text"), ("content", "text")],
+            weights=SEARCH_WEIGHTS,
+            default_language="none",
+            name="user_id_text",
+        ),
+    )
+
+    # Заменены индексом (user_id, updated_at, _id): его обратный обход даёт тот же порядок
+    OBSOLETE_INDEXES = ("user_id_1_updated_at_-1",)
+
+    def __init__(
+        self,
+        db,
+        max_time_ms: Optional[int] = None,
+        replica_read_preference: Optional[SecondaryPreferred] = None,
+        causal_tracker: Optional[CausalSessionTracker] = None,
+        tombstone_ttl_seconds: int = 30 * 24 * 3600,
+    ) -> None:
         """
         Инициализирует репозиторий с заданной базой данных.
+        max_time_ms — серверный лимит времени (maxTimeMS) для запросов чтения.
+        replica_read_preference — куда направлять списки и поиск; точечные чтения
+        и проверки владельца всегда идут по настройке клиента (primary).
+        causal_tracker — read-your-writes для списков после записи того же пользователя.
+        tombstone_ttl_seconds — сколько хранятся записи об удалённых заметках (TTL-индекс).
         """
         self.collection = db.get_collection("notes")
+        self.tombstones = db.get_collection("note_tombstones")
+        self.tombstone_indexes = (
+            # Удаления пользователя после токена синхронизации, в порядке (deleted_at, _id)
+            IndexSpec([("user_id", 1), ("deleted_at", 1), ("_id", 1)]),
+            # MongoDB удаляет tombstone сам; новый TTL применяется к индексу через collMod (ensure_indexes)
+            IndexSpec([("deleted_at", 1)], expireAfterSeconds=tombstone_ttl_seconds),
+        )
+        self.replica_collection = (
+            self.collection.with_options(read_preference=replica_read_preference)
+            if replica_read_preference else self.collection
+        )
+        self.max_time_ms = max_time_ms
+        self.command_options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        self.write_session = causal_tracker.write_session if causal_tracker else no_session
+        self.read_session = causal_tracker.read_session if causal_tracker else no_session
 
     async def init_indexes(self) -> None:
         """
-        Создаёт индексы в коллекции заметок.
+        Создаёт недостающие индексы коллекции заметок.
         """
-        await self.collection.create_index("user_id")
+        await ensure_indexes(self.collection, self.INDEXES)
+        await drop_indexes(self.collection, self.OBSOLETE_INDEXES)
+        await ensure_indexes(self.tombstones, self.tombstone_indexes)
         logger.info("Note indexes initialized")
 
+    async def check_query_plans(self, mode: str) -> None:
+        """
+        Проверяет через explain(), что основные запросы репозитория используют индексы.
+        """
+        await verify_query_plans(self.collection, self.query_shapes(), mode)
+        await verify_query_plans(self.tombstones, self.tombstone_query_shapes(), mode)
+
+    @staticmethod
+    def query_shapes() -> List[QueryShape]:
+        sample_id = ObjectId("000000000000000000000000")
+        sample_time = datetime(2024, 1, 1)
+        return [
+            QueryShape("get_note", {"_id": sample_id}),
+            QueryShape("get_notes_by_user", {"user_id": "user"}),
+            QueryShape(
+                "get_note_views_page",
+                {"user_id": "user", "_id": {"$gt": sample_id}},
+                sort=[("_id", 1)],
+                projection=MongoNoteRepository._view_projection(None),
+            ),
+            QueryShape("owned_ids", {"_id": {"$in": [sample_id]}, "user_id": "user"}, projection={"_id": 1}),
+            QueryShape("search_notes", {"user_id": "user", "$text": {"$search": "note"}}),
+            QueryShape("delete_notes_by_user", {"user_id": "user"}, sort=[("_id", 1)], projection={"_id": 1}),
+            QueryShape(
+                "get_changes",
+                {"user_id": "user", "updated_at": {"$gt": sample_time, "$lte": sample_time}},
+                sort=[("updated_at", 1), ("_id", 1)],
+            ),
+        ]
+
+    @staticmethod
+    def tombstone_query_shapes() -> List[QueryShape]:
+        sample_time = datetime(2024, 1, 1)
+        return [
+            QueryShape(
+                "get_changes_tombstones",
+                {"user_id": "user", "deleted_at": {"$gt": sample_time, "$lte": sample_time}},
+                sort=[("deleted_at", 1), ("_id", 1)],
+            ),
+        ]
+
     async def create_note(self, note: Note) -> Note:
         """
         Вставляет новую заметку в базу данных.
         """
         note_dict = note.dict(exclude={"id"})
-        result = await self.collection.insert_one(note_dict)
+        async with self.write_session(note.user_id) as session:
+            result = await self.collection.insert_one(note_dict, session=session)
         note.id = str(result.inserted_id)
         return note
 
@@ -47,7 +153,7 @@ class MongoNoteRepository(NoteRepository):
         except (InvalidId, TypeError):
             logger.debug("Invalid note_id format: %s", note_id)
             return None
-        document = await self.collection.find_one({"_id": object_id})
+        document = await self.collection.find_one({"_id": object_id}, max_time_ms=self.max_time_ms)
         if document:
             document["_id"] = str(document["_id"])
             return Note.parse_obj(document)
@@ -63,10 +169,12 @@ class MongoNoteRepository(NoteRepository):
             logger.debug("Invalid note_id format for update: %s", note_id)
             return None
         update_command = {"$set": {**note_data, "updated_at": datetime.utcnow()}}
-        result = await self.collection.update_one({"_id": object_id}, update_command)
-        if result.matched_count == 0:
-            return None
-        document = await self.collection.find_one({"_id": object_id})
+        document = await self.collection.find_one_and_update(
+            {"_id": object_id},
+            update_command,
+            return_document=True,
+            **self.command_options
+        )
         if document:
             document["_id"] = str(document["_id"])
             return Note.parse_obj(document)
@@ -81,16 +189,354 @@ class MongoNoteRepository(NoteRepository):
         except (InvalidId, TypeError):
             logger.debug("Invalid note_id format for deletion: %s", note_id)
             return False
-        result = await self.collection.delete_one({"_id": object_id})
-        return result.deleted_count > 0
+        document = await self.collection.find_one_and_delete(
+            {"_id": object_id}, projection={"user_id": 1}, **self.command_options
+        )
+        if document is None:
+            return False
+        await self._write_tombstones(document["user_id"], [object_id])
+        return True
+
+    async def update_user_note(
+        self, note_id: str, user_id: str, note_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[Note]:
+        """
+        Обновляет заметку пользователя: владелец и версия (If-Match) проверяются
+        в фильтре find_one_and_update.
+        """
+        try:
+            object_id = ObjectId(note_id)
+        except (InvalidId, TypeError):
+            logger.debug("Invalid note_id format for update: %s", note_id)
+            return None
+        update_command = {"$set": {**note_data, "updated_at": datetime.utcnow()}}
+        query: dict = {"_id": object_id, "user_id": user_id}
+        if versions is not None:
+            query["updated_at"] = {"$in": list(versions)}
+        async with self.write_session(user_id) as session:
+            document = await self.collection.find_one_and_update(
+                query,
+                update_command,
+                return_document=True,
+                session=session,
+                **self.command_options
+            )
+        if document:
+            document["_id"] = str(document["_id"])
+            return Note.parse_obj(document)
+        return None
+
+    async def delete_user_note(self, note_id: str, user_id: str) -> bool:
+        """
+        Удаляет заметку пользователя: владелец проверяется в фильтре find_one_and_delete.
+        """
+        try:
+            object_id = ObjectId(note_id)
+        except (InvalidId, TypeError):
+            logger.debug("Invalid note_id format for deletion: %s", note_id)
+            return False
+        async with self.write_session(user_id) as session:
+            document = await self.collection.find_one_and_delete(
+                {"_id": object_id, "user_id": user_id},
+                projection={"_id": 1},
+                session=session,
+                **self.command_options
+            )
+            if document is not None:
+                await self._write_tombstones(user_id, [object_id], session)
+        return document is not None
+
+    async def note_exists(self, note_id: str) -> bool:
+        """
+        Проверяет существование заметки, читая только _id.
+        """
+        try:
+            object_id = ObjectId(note_id)
+        except (InvalidId, TypeError):
+            return False
+        document = await self.collection.find_one({"_id": object_id}, {"_id": 1}, max_time_ms=self.max_time_ms)
+        return document is not None
 
     async def get_notes_by_user(self, user_id: str) -> List[Note]:
         """
         Получает все заметки для заданного пользователя.
         """
         notes: List[Note] = []
-        cursor = self.collection.find({"user_id": user_id})
-        async for document in cursor:
-            document["_id"] = str(document["_id"])
-            notes.append(Note.parse_obj(document))
+        async with self.read_session(user_id) as session:
+            cursor = self.replica_collection.find({"user_id": user_id}, session=session).max_time_ms(self.max_time_ms)
+            async for document in cursor:
+                document["_id"] = str(document["_id"])
+                notes.append(Note.parse_obj(document))
         return notes
+
+    async def get_note_views_page(
+        self, user_id: str, limit: int, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """
+        Получает страницу заметок в виде словарей NoteView.
+        Лишние поля отсекаются проекцией MongoDB, pydantic-валидация не выполняется.
+        """
+        query = self._page_query(user_id, after)
+        async with self.read_session(user_id) as session:
+            cursor = self.replica_collection.find(
+                query, self._view_projection(fields), session=session
+            ).sort("_id", 1).limit(limit).max_time_ms(self.max_time_ms)
+            return [to_view_document(document) async for document in cursor]
+
+    def stream_note_views(
+        self, user_id: str, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Возвращает асинхронный итератор по заметкам пользователя прямо поверх курсора motor.
+        Курсор проверяется сразу, до начала итерации.
+        """
+        return self._iterate_views(user_id, self._page_query(user_id, after), self._view_projection(fields))
+
+    async def search_notes(self, user_id: str, query: str, limit: int, after: Optional[str] = None) -> List[dict]:
+        """
+        Ищет заметки пользователя по текстовому индексу.
+        Страницы строятся keyset-курсором по (score, _id) в порядке убывания.
+        """
+        pipeline: List[dict] = [
+            {"$match": {"user_id": user_id, "$text": {"$search": query}}},
+            {"$project": {
+                "title": 1, "content": 1, "created_at": 1, "updated_at": 1,
+                "score": {"$meta": "textScore"},
+            }},
+        ]
+        if after is not None:
+            score, note_id = decode_search_cursor(after)
+            try:
+                object_id = ObjectId(note_id)
+            except (InvalidId, TypeError) as e:
+                raise ValueError(f"Invalid cursor: {after}") from e
+            pipeline.append({"$match": {"$or": [
+                {"score": {"$lt": score}},
+                {"score": score, "_id": {"$lt": object_id}},
+            ]}})
+        pipeline += [{"$sort": {"score": -1, "_id": -1}}, {"$limit": limit}]
+        async with self.read_session(user_id) as session:
+            cursor = self.replica_collection.aggregate(pipeline, session=session, **self.command_options)
+            return [to_view_document(document) async for document in cursor]
+
+    async def get_changes(
+        self, user_id: str, since: Optional[Tuple[int, Optional[str]]], until: datetime, limit: int
+    ) -> Tuple[List[dict], List[dict]]:
+        """
+        Читает изменённые заметки и tombstone по индексам (user_id, время, _id).
+        Чтение всегда идёт с primary: отставание вторичного узла сдвинуло бы токен
+        дальше ещё не реплицированных изменений, и клиент бы их пропустил.
+        """
+        notes_cursor = self.collection.find(
+            self._changes_query(user_id, "updated_at", since, until), self._view_projection(None)
+        ).sort([("updated_at", 1), ("_id", 1)]).limit(limit).max_time_ms(self.max_time_ms)
+        notes = [to_view_document(document) async for document in notes_cursor]
+        if since is None:
+            return notes, []
+        tombstones_cursor = self.tombstones.find(
+            self._changes_query(user_id, "deleted_at", since, until), {"deleted_at": 1}
+        ).sort([("deleted_at", 1), ("_id", 1)]).limit(limit).max_time_ms(self.max_time_ms)
+        return notes, [to_view_document(document) async for document in tombstones_cursor]
+
+    async def create_notes(self, notes: List[Note]) -> List[NoteBatchResult]:
+        """
+        Вставляет заметки одним вызовом insert_many без упорядочивания.
+        """
+        if not notes:
+            return []
+        documents = [note.dict(exclude={"id"}) for note in notes]
+        try:
+            async with self.write_session(*{note.user_id for note in notes}) as session:
+                await self.collection.insert_many(documents, ordered=False, session=session)
+            errors: Dict[int, str] = {}
+        except BulkWriteError as e:
+            errors = self._write_errors(e)
+        results: List[NoteBatchResult] = []
+        for index, (note, document) in enumerate(zip(notes, documents)):
+            if index in errors:
+                results.append(NoteBatchResult(index=index, status=NoteBatchStatus.FAILED, error=errors[index]))
+                continue
+            note.id = str(document["_id"])
+            results.append(NoteBatchResult(index=index, id=note.id, status=NoteBatchStatus.CREATED))
+        return results
+
+    async def update_notes(self, user_id: str, updates: List[Tuple[str, dict]]) -> List[NoteBatchResult]:
+        """
+        Обновляет заметки пользователя одним вызовом bulk_write.
+        Заметки, которых нет или которые принадлежат другому пользователю, получают статус not_found,
+        в том числе удалённые между проверкой владельца и обновлением. id в пакете не повторяются.
+        """
+        results, object_ids = self._resolve_batch_ids([note_id for note_id, _ in updates])
+        owned = await self._owned_ids(user_id, object_ids.values())
+        now = datetime.utcnow()
+        operations = []
+        operation_indexes: List[int] = []
+        for index, object_id in object_ids.items():
+            if object_id not in owned:
+                results[index] = NoteBatchResult(index=index, id=updates[index][0], status=NoteBatchStatus.NOT_FOUND)
+                continue
+            update_command = {"$set": {**updates[index][1], "updated_at": now}}
+            operations.append(UpdateOne({"_id": object_id, "user_id": user_id}, update_command))
+            operation_indexes.append(index)
+        errors: Dict[int, str] = {}
+        matched = len(operations)
+        if operations:
+            try:
+                async with self.write_session(user_id) as session:
+                    result = await self.collection.bulk_write(operations, ordered=False, session=session)
+                matched = result.matched_count
+            except BulkWriteError as e:
+                errors = self._write_errors(e)
+                matched = e.details.get("nMatched", 0)
+        missing: set = set()
+        if matched < len(operations) - len(errors):
+            # bulk_write возвращает только общее число совпадений: какие заметки удалили
+            # параллельно, видно по повторной проверке владельца
+            targets = [object_ids[index] for index in operation_indexes]
+            missing = set(targets) - await self._owned_ids(user_id, targets)
+        for position, index in enumerate(operation_indexes):
+            if position in errors:
+                results[index] = NoteBatchResult(
+                    index=index, id=updates[index][0], status=NoteBatchStatus.FAILED, error=errors[position]
+                )
+            elif object_ids[index] in missing:
+                results[index] = NoteBatchResult(index=index, id=updates[index][0], status=NoteBatchStatus.NOT_FOUND)
+            else:
+                results[index] = NoteBatchResult(index=index, id=updates[index][0], status=NoteBatchStatus.UPDATED)
+        return results
+
+    async def delete_notes(self, user_id: str, note_ids: List[str]) -> List[NoteBatchResult]:
+        """
+        Удаляет заметки пользователя одним вызовом delete_many.
+        """
+        results, object_ids = self._resolve_batch_ids(note_ids)
+        owned = await self._owned_ids(user_id, object_ids.values())
+        if owned:
+            async with self.write_session(user_id) as session:
+                await self.collection.delete_many({"_id": {"$in": list(owned)}, "user_id": user_id}, session=session)
+                await self._write_tombstones(user_id, owned, session)
+        for index, object_id in object_ids.items():
+            status = NoteBatchStatus.DELETED if object_id in owned else NoteBatchStatus.NOT_FOUND
+            results[index] = NoteBatchResult(index=index, id=note_ids[index], status=status)
+        return results
+
+    async def delete_notes_by_user(
+        self, user_id: str, chunk_size: Optional[int] = None, pause_seconds: float = 0.0
+    ) -> int:
+        """
+        Удаляет все заметки пользователя на стороне сервера, не загружая их.
+        Вызывается при удалении пользователя, поэтому tombstone не пишутся: синхронизировать некому.
+        Без chunk_size — один delete_many; иначе порциями по _id, чтобы не
+        создавать длительную нагрузку на запись для больших аккаунтов.
+        """
+        if not chunk_size:
+            result = await self.collection.delete_many({"user_id": user_id})
+            return result.deleted_count
+        deleted = 0
+        while True:
+            cursor = self.collection.find({"user_id": user_id}, {"_id": 1}).sort("_id", 1).limit(chunk_size).max_time_ms(
+                self.max_time_ms
+            )
+            object_ids = [document["_id"] async for document in cursor]
+            if not object_ids:
+                return deleted
+            result = await self.collection.delete_many({"_id": {"$in": object_ids}, "user_id": user_id})
+            deleted += result.deleted_count
+            if len(object_ids) < chunk_size:
+                return deleted
+            if pause_seconds:
+                await asyncio.sleep(pause_seconds)
+
+    @staticmethod
+    def _resolve_batch_ids(note_ids: List[str]) -> Tuple[List[Optional[NoteBatchResult]], Dict[int, ObjectId]]:
+        """
+        Разбирает идентификаторы пакета: некорректные сразу получают статус not_found.
+        """
+        results: List[Optional[NoteBatchResult]] = [None] * len(note_ids)
+        object_ids: Dict[int, ObjectId] = {}
+        for index, note_id in enumerate(note_ids):
+            try:
+                object_ids[index] = ObjectId(note_id)
+            except (InvalidId, TypeError):
+                results[index] = NoteBatchResult(index=index, id=note_id, status=NoteBatchStatus.NOT_FOUND)
+        return results, object_ids
+
+    async def _owned_ids(self, user_id: str, object_ids) -> set:
+        """
+        Возвращает те из object_ids, что принадлежат пользователю (один запрос).
+        """
+        unique_ids = list(set(object_ids))
+        if not unique_ids:
+            return set()
+        cursor = self.collection.find(
+            {"_id": {"$in": unique_ids}, "user_id": user_id}, {"_id": 1}
+        ).max_time_ms(self.max_time_ms)
+        return {document["_id"] async for document in cursor}
+
+    async def _write_tombstones(self, user_id: str, object_ids, session=None) -> None:
+        """
+        Записывает tombstone удалённых заметок для потока изменений.
+        Пишется после удаления без транзакции: при сбое между операциями клиент
+        не узнает об удалении до полной пересинхронизации.
+        """
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": object_id}, {"$set": {"user_id": user_id, "deleted_at": now}}, upsert=True)
+            for object_id in object_ids
+        ]
+        if operations:
+            await self.tombstones.bulk_write(operations, ordered=False, session=session)
+
+    @staticmethod
+    def _write_errors(error: BulkWriteError) -> Dict[int, str]:
+        return {item["index"]: item.get("errmsg", "Write error") for item in error.details.get("writeErrors", [])}
+
+    async def _iterate_views(self, user_id: str, query: dict, projection: dict) -> AsyncIterator[dict]:
+        async with self.read_session(user_id) as session:
+            # Без maxTimeMS: лимит суммируется по всем getMore и оборвал бы длинный поток
+            cursor = self.replica_collection.find(query, projection, session=session).sort("_id", 1)
+            async for document in cursor:
+                yield to_view_document(document)
+
+    @staticmethod
+    def _view_projection(fields: Optional[Sequence[str]]) -> dict:
+        """
+        Строит проекцию MongoDB для полей NoteView; _id включается всегда.
+        Пустая проекция в MongoDB означает «все поля», поэтому для fields=id — только _id.
+        """
+        return {field: 1 for field in (fields or NOTE_VIEW_FIELDS) if field != "id"} or {"_id": 1}
+
+    @staticmethod
+    def _changes_query(user_id: str, field: str, since: Optional[Tuple[int, Optional[str]]], until: datetime) -> dict:
+        """
+        Фильтр keyset по (field, _id) после позиции since и не позже until.
+        """
+        bounds: dict = {"$lte": until}
+        query: dict = {"user_id": user_id, field: bounds}
+        if since is None:
+            return query
+        millis, note_id = since
+        moment = from_millis(millis)
+        if note_id is None:
+            bounds["$gt"] = moment
+            return query
+        try:
+            object_id = ObjectId(note_id)
+        except (InvalidId, TypeError) as e:
+            raise ValueError(f"Invalid sync token: {note_id}") from e
+        bounds["$gte"] = moment
+        query["$or"] = [{field: {"$gt": moment}}, {"_id": {"$gt": object_id}}]
+        return query
+
+    @staticmethod
+    def _page_query(user_id: str, after: Optional[str]) -> dict:
+        """
+        Строит фильтр для keyset-пагинации по (user_id, _id).
+        """
+        query: dict = {"user_id": user_id}
+        if after is not None:
+            try:
+                query["_id"] = {"$gt": ObjectId(after)}
+            except (InvalidId, TypeError) as e:
+                raise ValueError(f"Invalid cursor: {after}") from e
+        return query
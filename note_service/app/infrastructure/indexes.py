@@ -0,0 +1,114 @@
+"""
+Декларативное управление индексами MongoDB.
+Репозиторий описывает свои индексы (IndexSpec) и типовые запросы (QueryShape);
+индексы создаются идемпотентно, а планы запросов проверяются через explain().
+"""
+
+import logging
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from pymongo import IndexModel
+
+logger = logging.getLogger(__name__)
+
+INDEX_CHECK_MODES = ("off", "warn", "fail")
+
+class IndexSpec:
+    """
+    Описание индекса. Имя по умолчанию совпадает с именем, которое генерирует MongoDB,
+    поэтому уже существующие индексы распознаются и не пересоздаются.
+    """
+    def __init__(self, keys: Sequence[Tuple[str, Any]], **options: Any) -> None:
+        self.keys = list(keys)
+        self.name = options.pop("name", None) or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+        self.options = options
+
+    def model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+class QueryShape:
+    """
+    Типовой запрос репозитория с примерными значениями параметров — для проверки плана.
+    """
+    def __init__(
+        self, name: str, filter: dict, sort: Optional[List[Tuple[str, int]]] = None, projection: Optional[dict] = None
+    ) -> None:
+        self.name = name
+        self.filter = filter
+        self.sort = sort
+        self.projection = projection
+
+async def ensure_indexes(collection, specs: Iterable[IndexSpec]) -> List[str]:
+    """
+    Создаёт отсутствующие индексы и возвращает их имена.
+    Существующие индексы не трогает, поэтому вызов дёшев на каждом старте каждого воркера.
+    """
+    existing = await collection.index_information()
+    missing = [spec for spec in specs if spec.name not in existing]
+    if missing:
+        await collection.create_indexes([spec.model() for spec in missing])
+        logger.info(f"Created indexes on {collection.name}: {', '.join(spec.name for spec in missing)}")
+    for spec in specs:
+        await _sync_ttl(collection, spec, existing.get(spec.name))
+    return [spec.name for spec in missing]
+
+async def _sync_ttl(collection, spec: IndexSpec, info: Optional[dict]) -> None:
+    """
+    Индексы сравниваются по имени, поэтому новый срок TTL-индекса сам не применится:
+    он меняется через collMod без пересоздания индекса.
+    """
+    ttl = spec.options.get("expireAfterSeconds")
+    if info is None or ttl is None or info.get("expireAfterSeconds") == ttl:
+        return
+    await collection.database.command(
+        "collMod", collection.name, index={"name": spec.name, "expireAfterSeconds": ttl}
+    )
+    logger.info(f"Changed TTL of {collection.name}.{spec.name}: {info.get('expireAfterSeconds')} -> {ttl} s")
+
+async def drop_indexes(collection, names: Iterable[str]) -> List[str]:
+    """
+    Удаляет существующие индексы из names (заменённые другими) и возвращает их имена.
+    """
+    existing = await collection.index_information()
+    dropped = [name for name in names if name in existing]
+    for name in dropped:
+        await collection.drop_index(name)
+    if dropped:
+        logger.info(f"Dropped obsolete indexes on {collection.name}: {', '.join(dropped)}")
+    return dropped
+
+async def find_collscans(collection, shapes: Iterable[QueryShape]) -> List[str]:
+    """
+    Выполняет explain() для каждого запроса и возвращает имена тех, чей план содержит COLLSCAN.
+    """
+    offenders: List[str] = []
+    for shape in shapes:
+        cursor = collection.find(shape.filter, shape.projection)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        plan = await cursor.explain()
+        if _has_stage(plan.get("queryPlanner", {}).get("winningPlan", {}), "COLLSCAN"):
+            offenders.append(shape.name)
+    return offenders
+
+async def verify_query_plans(collection, shapes: Iterable[QueryShape], mode: str) -> None:
+    """
+    Проверяет планы запросов в режиме warn (пишет предупреждение) или fail (RuntimeError).
+    """
+    if mode == "off":
+        return
+    offenders = await find_collscans(collection, shapes)
+    if not offenders:
+        logger.info(f"Query plans on {collection.name} use indexes")
+        return
+    message = f"Queries on {collection.name} fall back to COLLSCAN: {', '.join(offenders)}"
+    if mode == "fail":
+        raise RuntimeError(message)
+    logger.warning(message)
+
+def _has_stage(plan: Any, stage: str) -> bool:
+    # План — дерево из inputStage/inputStages (или queryPlan в SBE), обходим его целиком
+    if isinstance(plan, dict):
+        return plan.get("stage") == stage or any(_has_stage(value, stage) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_stage(item, stage) for item in plan)
+    return False
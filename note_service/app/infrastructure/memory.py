@@ -0,0 +1,253 @@
+"""
+Реализация репозитория заметок в памяти процесса.
+Повторяет семантику MongoNoteRepository (keyset-курсоры, проверка владельца,
+ранжированный поиск) и используется в тестах, бенчмарках и при STORAGE_BACKEND=memory.
+"""
+
+import asyncio
+from bisect import bisect_right, insort
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from bson.objectid import ObjectId, InvalidId
+from note_service.app.domain.changes import change_position, to_millis
+from note_service.app.domain.interfaces import NoteRepository
+from note_service.app.domain.models.note import Note, NoteBatchResult, NoteBatchStatus, NOTE_VIEW_FIELDS
+from note_service.app.domain.search import SEARCH_WEIGHTS, decode_search_cursor, parse_query, tokenize
+
+class InMemoryNoteRepository(NoteRepository):
+    """
+    Хранит заметки в словаре документов того же вида, что и в MongoDB.
+    Вторичный индекс по user_id — отсортированный список id заметок пользователя
+    (аналог индекса (user_id, _id)): строковые ObjectId одной длины сравниваются
+    так же, как сами ObjectId, поэтому страница по курсору — это bisect и срез.
+    Tombstone удалённых заметок хранятся в словаре и истекают через tombstone_ttl_seconds.
+    """
+    def __init__(self, tombstone_ttl_seconds: int = 30 * 24 * 3600) -> None:
+        self.documents: Dict[str, dict] = {}
+        self._by_user: Dict[str, List[str]] = {}
+        self.tombstones: Dict[str, dict] = {}
+        self.tombstone_ttl = timedelta(seconds=tombstone_ttl_seconds)
+
+    async def init_indexes(self) -> None:
+        pass
+
+    async def check_query_plans(self, mode: str) -> None:
+        pass
+
+    async def create_note(self, note: Note) -> Note:
+        note.id = self._insert(note)
+        return note
+
+    async def get_note(self, note_id: str) -> Optional[Note]:
+        document = self.documents.get(note_id)
+        return self._to_note(document) if document else None
+
+    async def update_note(self, note_id: str, note_data: dict) -> Optional[Note]:
+        document = self.documents.get(note_id)
+        if document is None:
+            return None
+        document.update(note_data, updated_at=datetime.utcnow())
+        return self._to_note(document)
+
+    async def delete_note(self, note_id: str) -> bool:
+        return self._remove(note_id)
+
+    async def update_user_note(
+        self, note_id: str, user_id: str, note_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[Note]:
+        if not self._owns(note_id, user_id):
+            return None
+        if versions is not None and to_millis(self.documents[note_id]["updated_at"]) not in map(to_millis, versions):
+            return None
+        return await self.update_note(note_id, note_data)
+
+    async def delete_user_note(self, note_id: str, user_id: str) -> bool:
+        return self._owns(note_id, user_id) and self._remove(note_id)
+
+    async def note_exists(self, note_id: str) -> bool:
+        return note_id in self.documents
+
+    async def get_notes_by_user(self, user_id: str) -> List[Note]:
+        return [self._to_note(document) for document in self._user_documents(user_id)]
+
+    async def get_note_views_page(
+        self, user_id: str, limit: int, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        return [self._to_view(document, fields) for document in self._page(user_id, after, limit)]
+
+    def stream_note_views(
+        self, user_id: str, after: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[dict]:
+        return self._iterate_views(self._page(user_id, after), fields)
+
+    async def search_notes(self, user_id: str, query: str, limit: int, after: Optional[str] = None) -> List[dict]:
+        """
+        Линейный поиск по заметкам пользователя. Оценка приближает textScore MongoDB:
+        сумма по полям веса поля, умноженного на долю совпавших слов.
+        """
+        position = decode_search_cursor(after) if after is not None else None
+        terms, excluded = parse_query(query)
+        wanted, unwanted = set(terms), set(excluded)
+        hits: List[Tuple[float, str, dict]] = []
+        for document in self._user_documents(user_id):
+            score = 0.0
+            skip = False
+            for field, weight in SEARCH_WEIGHTS.items():
+                words = Counter(tokenize(document[field]))
+                if unwanted.intersection(words):
+                    skip = True
+                    break
+                matched = sum(count for word, count in words.items() if word in wanted)
+                if matched:
+                    score += weight * matched / len(words)
+            if skip or not score:
+                continue
+            note_id = str(document["_id"])
+            if position is not None and (score, note_id) >= position:
+                continue
+            hits.append((score, note_id, document))
+        hits.sort(key=lambda hit: (hit[0], hit[1]), reverse=True)
+        return [
+            {**self._to_view(document, ("id", "title", "content", "created_at", "updated_at")), "score": score}
+            for score, _, document in hits[:limit]
+        ]
+
+    async def get_changes(
+        self, user_id: str, since: Optional[Tuple[int, Optional[str]]], until: datetime, limit: int
+    ) -> Tuple[List[dict], List[dict]]:
+        """
+        Линейный просмотр заметок и tombstone пользователя: индекса по времени изменения нет.
+        """
+        # "~" больше любого шестнадцатеричного id: позиция без id покрывает всю миллисекунду
+        start = (since[0], since[1] or "~") if since is not None else (-1, "~")
+        end = (to_millis(until), "~")
+        changed = sorted(
+            (position, document)
+            for position, document in (
+                (change_position(document["updated_at"], str(document["_id"])), document)
+                for document in self._user_documents(user_id)
+            )
+            if start < position <= end
+        )
+        notes = [self._to_view(document, None) for _, document in changed[:limit]]
+        if since is None:
+            return notes, []
+        expired_before = datetime.utcnow() - self.tombstone_ttl
+        expired = [note_id for note_id, tombstone in self.tombstones.items() if tombstone["deleted_at"] < expired_before]
+        for note_id in expired:
+            del self.tombstones[note_id]
+        deleted = sorted(
+            (position, note_id, tombstone["deleted_at"])
+            for position, note_id, tombstone in (
+                (change_position(tombstone["deleted_at"], note_id), note_id, tombstone)
+                for note_id, tombstone in self.tombstones.items()
+                if tombstone["user_id"] == user_id
+            )
+            if start < position <= end
+        )
+        return notes, [{"id": note_id, "deleted_at": deleted_at} for _, note_id, deleted_at in deleted[:limit]]
+
+    async def create_notes(self, notes: List[Note]) -> List[NoteBatchResult]:
+        results: List[NoteBatchResult] = []
+        for index, note in enumerate(notes):
+            note.id = self._insert(note)
+            results.append(NoteBatchResult(index=index, id=note.id, status=NoteBatchStatus.CREATED))
+        return results
+
+    async def update_notes(self, user_id: str, updates: List[Tuple[str, dict]]) -> List[NoteBatchResult]:
+        now = datetime.utcnow()
+        results: List[NoteBatchResult] = []
+        for index, (note_id, note_data) in enumerate(updates):
+            status = NoteBatchStatus.NOT_FOUND
+            if self._owns(note_id, user_id):
+                self.documents[note_id].update(note_data, updated_at=now)
+                status = NoteBatchStatus.UPDATED
+            results.append(NoteBatchResult(index=index, id=note_id, status=status))
+        return results
+
+    async def delete_notes(self, user_id: str, note_ids: List[str]) -> List[NoteBatchResult]:
+        owned = {note_id for note_id in note_ids if self._owns(note_id, user_id)}
+        for note_id in owned:
+            self._remove(note_id)
+        return [
+            NoteBatchResult(
+                index=index,
+                id=note_id,
+                status=NoteBatchStatus.DELETED if note_id in owned else NoteBatchStatus.NOT_FOUND,
+            )
+            for index, note_id in enumerate(note_ids)
+        ]
+
+    async def delete_notes_by_user(
+        self, user_id: str, chunk_size: Optional[int] = None, pause_seconds: float = 0.0
+    ) -> int:
+        # Как и в MongoDB, удаление всех заметок пользователя не оставляет tombstone
+        note_ids = list(self._by_user.get(user_id, ()))
+        if not chunk_size:
+            return sum(self._remove(note_id, tombstone=False) for note_id in note_ids)
+        deleted = 0
+        for start in range(0, len(note_ids), chunk_size):
+            deleted += sum(self._remove(note_id, tombstone=False) for note_id in note_ids[start:start + chunk_size])
+            if pause_seconds and start + chunk_size < len(note_ids):
+                await asyncio.sleep(pause_seconds)
+        return deleted
+
+    def _insert(self, note: Note) -> str:
+        document = note.dict(exclude={"id"})
+        document["_id"] = ObjectId()
+        note_id = str(document["_id"])
+        self.documents[note_id] = document
+        insort(self._by_user.setdefault(document["user_id"], []), note_id)
+        return note_id
+
+    def _remove(self, note_id: str, tombstone: bool = True) -> bool:
+        document = self.documents.pop(note_id, None)
+        if document is None:
+            return False
+        if tombstone:
+            self.tombstones[note_id] = {"user_id": document["user_id"], "deleted_at": datetime.utcnow()}
+        user_notes = self._by_user.get(document["user_id"])
+        if user_notes is not None:
+            index = bisect_right(user_notes, note_id) - 1
+            if index >= 0 and user_notes[index] == note_id:
+                del user_notes[index]
+            if not user_notes:
+                del self._by_user[document["user_id"]]
+        return True
+
+    def _owns(self, note_id: str, user_id: str) -> bool:
+        document = self.documents.get(note_id)
+        return document is not None and document["user_id"] == user_id
+
+    def _user_documents(self, user_id: str) -> List[dict]:
+        return [self.documents[note_id] for note_id in self._by_user.get(user_id, ())]
+
+    def _page(self, user_id: str, after: Optional[str], limit: Optional[int] = None) -> List[dict]:
+        """
+        До limit заметок пользователя в порядке _id, начиная после курсора after.
+        """
+        note_ids = self._by_user.get(user_id, [])
+        start = 0
+        if after is not None:
+            try:
+                start = bisect_right(note_ids, str(ObjectId(after)))
+            except (InvalidId, TypeError) as e:
+                raise ValueError(f"Invalid cursor: {after}") from e
+        end = start + limit if limit is not None else len(note_ids)
+        return [self.documents[note_id] for note_id in note_ids[start:end]]
+
+    @staticmethod
+    async def _iterate_views(documents: List[dict], fields: Optional[Sequence[str]]) -> AsyncIterator[dict]:
+        for document in documents:
+            yield InMemoryNoteRepository._to_view(document, fields)
+
+    @staticmethod
+    def _to_view(document: dict, fields: Optional[Sequence[str]]) -> dict:
+        view = {field: document[field] for field in (fields or NOTE_VIEW_FIELDS) if field != "id"}
+        view["id"] = str(document["_id"])
+        return view
+
+    @staticmethod
+    def _to_note(document: dict) -> Note:
+        return Note.parse_obj({**document, "_id": str(document["_id"])})
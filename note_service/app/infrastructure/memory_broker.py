@@ -0,0 +1,94 @@
+"""
+Брокер сообщений на очередях asyncio в пределах процесса.
+Сообщения кодируются тем же кодеком, что и для RabbitMQ, и обрабатываются
+PartitionedConsumer, поэтому сериализация, порядок по ключу и prefetch ведут себя
+как с RabbitMQ, но без сети. Используется при BROKER_BACKEND=memory для тестов
+и профилирования; сообщения не переживают перезапуск процесса.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from note_service.app.domain.interfaces import MessageBroker
+from note_service.app.infrastructure.codecs import SCHEMA_VERSION, SCHEMA_VERSION_HEADER, get_codec
+from note_service.app.infrastructure.consumer import PartitionedConsumer
+from note_service.app.core.metrics import CONSUMER_BACKLOG
+
+logger = logging.getLogger(__name__)
+
+class InMemoryMessage:
+    """
+    Сообщение с тем же интерфейсом, что использует PartitionedConsumer у aio_pika.
+    ack/reject освобождают слот prefetch.
+    """
+    __slots__ = ("body", "content_type", "headers", "timestamp", "_settle")
+
+    def __init__(self, body: bytes, content_type: str, headers: dict, settle: Optional[Callable[[], None]] = None) -> None:
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers
+        self.timestamp = datetime.now(timezone.utc)
+        self._settle = settle
+
+    async def ack(self) -> None:
+        self._release()
+
+    async def reject(self, requeue: bool = False) -> None:
+        # Как и с RabbitMQ, потребитель отклоняет без возврата в очередь: сообщение теряется
+        self._release()
+
+    def _release(self) -> None:
+        if self._settle is not None:
+            self._settle()
+            self._settle = None
+
+class InMemoryBroker(MessageBroker):
+    def __init__(self, codec: str = "json", queue_size: int = 10000) -> None:
+        self.codec = get_codec(codec)
+        # Ограниченные очереди: при переполнении publish ждёт, как при backpressure брокера
+        self.queue_size = queue_size
+        self._queues: Dict[str, asyncio.Queue] = {}
+
+    async def connect(self) -> None:
+        pass
+
+    async def publish(self, queue: str, message: dict) -> None:
+        body = self.codec.encode(message)
+        await self._queue(queue).put(
+            InMemoryMessage(body, self.codec.content_type, {SCHEMA_VERSION_HEADER: SCHEMA_VERSION})
+        )
+        logger.debug(f"Published message to {queue}: {message}")
+
+    async def consume(
+        self,
+        queue: str,
+        callback,
+        prefetch: Optional[int] = None,
+        concurrency: int = 1,
+        partition_key: Optional[Callable[[dict], Optional[str]]] = None,
+    ) -> None:
+        source = self._queue(queue)
+        slots = asyncio.Semaphore(prefetch) if prefetch else None
+        consumer = PartitionedConsumer(queue, callback, concurrency, partition_key)
+        consumer.start()
+        try:
+            while True:
+                if slots is not None:
+                    await slots.acquire()
+                message = await source.get()
+                CONSUMER_BACKLOG.labels(queue=queue).set(source.qsize())
+                if slots is not None:
+                    message._settle = slots.release
+                await consumer.submit(message)
+        finally:
+            await consumer.stop()
+
+    async def close(self) -> None:
+        self._queues.clear()
+
+    def _queue(self, name: str) -> asyncio.Queue:
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = self._queues[name] = asyncio.Queue(maxsize=self.queue_size)
+        return queue
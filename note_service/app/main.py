@@ -1,10 +1,14 @@
 import logging
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 from note_service.app.core.container import Container
 from note_service.app.core.config import settings
+from note_service.app.core.timing import configure_timing
 from note_service.app.presentation.api.notes import router as notes_router
+from note_service.app.presentation.api.metrics import router as metrics_router
+from note_service.app.presentation.compression import CompressionMiddleware, parse_encodings
+from note_service.app.presentation.middleware import MetricsMiddleware
 from note_service import __version__
 
 # Настройка логирования
@@ -13,11 +17,31 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
+configure_timing(
+    settings.request_stages_enabled or settings.server_timing_enabled, settings.otel_enabled, settings.service_name
+)
 
 app = FastAPI(
     title="Note Service",
     version=__version__,
-    description="A simple note management microservice built with hexagonal architecture."
+    description="A simple note management microservice built with hexagonal architecture.",
+    default_response_class=ORJSONResponse,
+)
+if settings.compression_enabled:
+    # Добавляется раньше метрик, чтобы MetricsMiddleware оставался внешним и видел размер после сжатия
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=parse_encodings(settings.compression_encodings),
+        levels={
+            "gzip": settings.compression_gzip_level,
+            "br": settings.compression_brotli_quality,
+            "zstd": settings.compression_zstd_level,
+        },
+        minimum_size=settings.compression_min_size,
+        threadpool_size=settings.compression_threadpool_size,
+    )
+app.add_middleware(
+    MetricsMiddleware, stages=settings.request_stages_enabled, server_timing=settings.server_timing_enabled
 )
 
 @app.exception_handler(Exception)
@@ -34,7 +58,8 @@ async def lifespan(app: FastAPI):
     container = Container(settings)
     app.state.container = container
     app.state.note_manager = await container.get_note_manager()
-    await app.state.note_manager.repository.init_indexes()
+    app.state.note_feed = container.get_change_feed()
+    await container.prepare_indexes(app.state.note_manager.repository)
     logger.info("Application initialized", extra={"context": "lifespan=ready"})
     yield
     await container.close()
@@ -42,6 +67,7 @@ async def lifespan(app: FastAPI):
 
 app.router.lifespan_context = lifespan
 app.include_router(notes_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
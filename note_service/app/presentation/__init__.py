@@ -1,3 +1,5 @@
 from .api.notes import router as notes_router
+from .api.metrics import router as metrics_router
+from .middleware import MetricsMiddleware
 
-__all__ = ["notes_router"]
+__all__ = ["notes_router", "metrics_router", "MetricsMiddleware"]
@@ -3,16 +3,25 @@ API-эндпоинты для управления заметками.
 Реализует CRUD-операции, используя зависимости для получения менеджера заметок и текущего пользователя.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from time import time
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import AsyncIterator, List, Optional, Tuple
 from note_service.app.application.note_manager import NoteManager
-from note_service.app.core.dependencies import get_current_user, get_note_manager
-from note_service.app.domain.models.note import Note, NoteView, NoteCreate, NoteUpdate
+from note_service.app.core.config import settings
+from note_service.app.core.dependencies import get_change_feed, get_current_user, get_note_manager
+from note_service.app.core.timing import SERIALIZE, stage
+from note_service.app.domain.models.note import (
+    Note, NoteView, NoteCreate, NoteUpdate, NoteBatchUpdate, NoteBatchResult, NoteSearchHit, NoteChanges, NOTE_VIEW_FIELDS, NOTE_SUMMARY_FIELDS
+)
 from note_service.app.domain.models.user import User
-from note_service.app.core.metrics import REQUEST_COUNT, REQUEST_LATENCY
+from note_service.app.infrastructure.change_feed import NoteChangeFeed
+from note_service.app.presentation.conditional import (
+    CACHE_CONTROL, body_etag, if_match_versions, list_etag, not_modified, not_modified_response, version_etag
+)
+from note_service.app.presentation.routing import TimedRoute
 
-router = APIRouter(prefix="/api/notes", tags=["notes"])
+router = APIRouter(prefix="/api/notes", tags=["notes"], route_class=TimedRoute)
 
 @router.post("/", response_model=NoteView)
 async def create_note(
@@ -23,54 +32,215 @@ async def create_note(
     """
     Создаёт новую заметку для текущего пользователя.
     """
-    start_time = time()
-    REQUEST_COUNT.labels(method="POST", endpoint="/api/notes/").inc()
-    try:
-        created_note = await manager.create_note(note, current_user.id)
-        return created_note
-    finally:
-        elapsed = time() - start_time
-        REQUEST_LATENCY.labels(endpoint="/api/notes/").observe(elapsed)
+    return await manager.create_note(note, current_user.id)
 
 @router.get("/", response_model=List[NoteView])
 async def list_notes(
+    limit: Optional[int] = Query(None, ge=1, le=settings.notes_page_size_max, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор: id последней заметки предыдущей страницы"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например title,updated_at"),
+    summary: bool = Query(False, description="Вернуть заметки без content"),
+    stream: bool = Query(False, description="Отдать все заметки потоком в формате NDJSON"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    manager: NoteManager = Depends(get_note_manager)
+) -> Response:
+    """
+    Возвращает страницу заметок текущего пользователя.
+    Курсор следующей страницы передаётся в заголовке X-Next-Cursor.
+    С stream=true все заметки (начиная с after) отдаются потоком NDJSON.
+    Документы читаются с проекцией и сериализуются сразу в JSON, минуя повторную валидацию.
+    Страница получает ETag; при совпадении If-None-Match — 304 без тела.
+    """
+    projection = _parse_fields(fields, summary)
+    if stream:
+        views = manager.stream_note_views(current_user.id, after, projection)
+        return StreamingResponse(_ndjson(views), media_type="application/x-ndjson")
+    views, next_cursor = await manager.get_note_views_page(
+        current_user.id, limit or settings.notes_page_size, after, projection
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    headers["Cache-Control"] = CACHE_CONTROL
+    etag = list_etag(views, limit, after, projection, next_cursor)
+    if etag is None:
+        # В проекции нет updated_at: ETag по телу ответа экономит только передачу
+        with stage(SERIALIZE):
+            body = orjson.dumps(views)
+        etag = body_etag(body)
+        if not_modified(if_none_match, etag):
+            return not_modified_response(etag)
+        return Response(body, media_type="application/json", headers={**headers, "ETag": etag})
+    if not_modified(if_none_match, etag):
+        return not_modified_response(etag)
+    with stage(SERIALIZE):
+        return ORJSONResponse(views, headers={**headers, "ETag": etag})
+
+@router.get("/changes", response_model=NoteChanges)
+async def get_changes(
+    since: Optional[str] = Query(None, description="Токен next_since из предыдущего ответа; без него — все заметки"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.notes_page_size_max, description="Размер страницы"),
+    current_user: User = Depends(get_current_user),
+    manager: NoteManager = Depends(get_note_manager)
+) -> Response:
+    """
+    Дельта-синхронизация: заметки, созданные или изменённые после токена since,
+    и tombstone удалённых. Пока has_more=true, запрос повторяется с next_since.
+    Объём ответа и стоимость запроса зависят от числа изменений, а не от числа заметок.
+    410 — токен старше срока хранения tombstone, нужна полная синхронизация без since.
+    """
+    changes = await manager.get_changes(
+        current_user.id,
+        since,
+        limit or settings.notes_page_size,
+        settings.notes_changes_settle_seconds,
+        settings.note_tombstone_ttl_seconds,
+    )
+    with stage(SERIALIZE):
+        return ORJSONResponse(changes)
+
+@router.get("/events")
+async def note_events(
+    current_user: User = Depends(get_current_user),
+    feed: NoteChangeFeed = Depends(get_change_feed)
+) -> StreamingResponse:
+    """
+    Server-Sent Events с изменениями заметок текущего пользователя: created и updated
+    (с заметкой), deleted (с id и deleted_at). Событие resync означает, что часть событий
+    потеряна, и состояние нужно догнать через /changes с последним токеном.
+    """
+    if feed.full:
+        raise HTTPException(status_code=503, detail="Too many note feed subscribers")
+    return StreamingResponse(
+        _events(feed, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _events(feed: NoteChangeFeed, user_id: str) -> AsyncIterator[bytes]:
+    # Подписка создаётся внутри генератора: её снимает finally при отключении клиента
+    subscription = feed.subscribe(user_id)
+    try:
+        async for frame in subscription.frames(settings.note_feed_heartbeat_seconds):
+            yield frame
+    finally:
+        feed.unsubscribe(subscription)
+
+@router.get("/search", response_model=List[NoteSearchHit])
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=256, description="Поисковый запрос; -слово исключает заметки"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.notes_search_page_size_max, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    current_user: User = Depends(get_current_user),
+    manager: NoteManager = Depends(get_note_manager)
+) -> Response:
+    """
+    Полнотекстовый поиск по заметкам текущего пользователя, по убыванию релевантности.
+    Курсор следующей страницы передаётся в заголовке X-Next-Cursor.
+    """
+    hits, next_cursor = await manager.search_notes(
+        current_user.id, q, limit or settings.notes_search_page_size, after, settings.notes_search_snippet_length
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    with stage(SERIALIZE):
+        return ORJSONResponse(hits, headers=headers)
+
+def _parse_fields(fields: Optional[str], summary: bool) -> Optional[Tuple[str, ...]]:
+    """
+    Разбирает параметры проекции списка заметок.
+    """
+    if fields is None:
+        return NOTE_SUMMARY_FIELDS if summary else None
+    requested = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = set(requested) - set(NOTE_VIEW_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+async def _ndjson(views: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """
+    Сериализует заметки построчно в NDJSON.
+    """
+    async for view in views:
+        yield orjson.dumps(view) + b"\n"
+
+@router.post("/batch", response_model=List[NoteBatchResult])
+async def create_notes_batch(
+    notes: List[NoteCreate],
+    current_user: User = Depends(get_current_user),
+    manager: NoteManager = Depends(get_note_manager)
+) -> List[NoteBatchResult]:
+    """
+    Создаёт заметки пакетом. Результат возвращается для каждого элемента в порядке запроса.
+    """
+    _check_batch_size(notes)
+    return await manager.create_notes(notes, current_user.id)
+
+@router.put("/batch", response_model=List[NoteBatchResult])
+async def update_notes_batch(
+    updates: List[NoteBatchUpdate],
     current_user: User = Depends(get_current_user),
     manager: NoteManager = Depends(get_note_manager)
-) -> List[NoteView]:
+) -> List[NoteBatchResult]:
     """
-    Возвращает список всех заметок текущего пользователя.
+    Обновляет заметки текущего пользователя пакетом. Повтор id в пакете — 400.
     """
-    return await manager.get_notes_by_user(current_user.id)
+    _check_batch_size(updates)
+    return await manager.update_notes(updates, current_user.id)
+
+@router.post("/batch/delete", response_model=List[NoteBatchResult])
+async def delete_notes_batch(
+    note_ids: List[str],
+    current_user: User = Depends(get_current_user),
+    manager: NoteManager = Depends(get_note_manager)
+) -> List[NoteBatchResult]:
+    """
+    Удаляет заметки текущего пользователя пакетом.
+    """
+    _check_batch_size(note_ids)
+    return await manager.delete_notes(note_ids, current_user.id)
+
+def _check_batch_size(items: list) -> None:
+    if len(items) > settings.notes_batch_max_size:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {settings.notes_batch_max_size} items")
 
 @router.get("/{note_id}", response_model=NoteView)
 async def get_note(
     note_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     manager: NoteManager = Depends(get_note_manager)
 ) -> NoteView:
     """
     Получает заметку по идентификатору.
+    ETag — версия заметки; при совпадении If-None-Match — 304 без сериализации.
     """
     note = await manager.get_note(note_id)
     if note.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access this note")
+    etag = version_etag(note.updated_at)
+    if not_modified(if_none_match, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
     return note
 
 @router.put("/{note_id}", response_model=NoteView)
 async def update_note(
     note_id: str,
     note_update: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     manager: NoteManager = Depends(get_note_manager)
 ) -> NoteView:
     """
-    Обновляет существующую заметку.
+    Обновляет существующую заметку. Владелец и версия из If-Match проверяются
+    в том же запросе к БД; устаревшая версия даёт 412.
     """
-    note = await manager.get_note(note_id)
-    if note.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this note")
-    updated_note = await manager.update_note(note_id, note_update)
-    return updated_note
+    note = await manager.update_user_note(note_id, current_user.id, note_update, if_match_versions(if_match))
+    response.headers["ETag"] = version_etag(note.updated_at)
+    return note
 
 @router.delete("/{note_id}", response_model=dict)
 async def delete_note(
@@ -79,10 +249,7 @@ async def delete_note(
     manager: NoteManager = Depends(get_note_manager)
 ) -> dict:
     """
-    Удаляет заметку по её идентификатору.
+    Удаляет заметку по её идентификатору. Владелец проверяется в том же запросе к БД.
     """
-    note = await manager.get_note(note_id)
-    if note.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this note")
-    success = await manager.delete_note(note_id)
+    success = await manager.delete_user_note(note_id, current_user.id)
     return {"success": success}
@@ -0,0 +1,229 @@
+"""
+ASGI-middleware сжатия ответов: gzip, br (brotli) и zstd по Accept-Encoding.
+Ответ целиком сжимается, только если он не меньше minimum_size; потоковые ответы
+(NDJSON) сжимаются по частям со сбросом буфера после каждой, чтобы клиент получал
+строки без задержки. Server-Sent Events и уже сжатые ответы не трогаются.
+Сильный ETag сжатого ответа становится слабым.
+Большие тела сжимаются в пуле потоков: zlib, brotli и zstandard отпускают GIL,
+и цикл событий не блокируется на мегабайтных списках.
+"""
+
+import zlib
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ENCODINGS = ("zstd", "br", "gzip")
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+class _GzipStream:
+    def __init__(self, level: int) -> None:
+        # wbits=31 — формат gzip, а не голый zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class _BrotliStream:
+    def __init__(self, brotli, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+class _ZstdStream:
+    def __init__(self, zstandard, compressor) -> None:
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = compressor.compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_block)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class Codec:
+    """
+    Сжатие одним из кодирований; пакеты brotli и zstandard импортируются, только если нужны.
+    """
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        self.level = level
+        if encoding == "br":
+            try:
+                import brotli
+            except ImportError as e:
+                raise RuntimeError("COMPRESSION_ENCODINGS=br requires the 'brotli' package") from e
+            self._module = brotli
+        elif encoding == "zstd":
+            try:
+                import zstandard
+            except ImportError as e:
+                raise RuntimeError("COMPRESSION_ENCODINGS=zstd requires the 'zstandard' package") from e
+            self._module = zstandard
+            self._zstd = zstandard.ZstdCompressor(level=level)
+        elif encoding != "gzip":
+            raise ValueError(f"Unknown compression encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self.stream().finish(data)
+        if self.encoding == "br":
+            return self._module.compress(data, quality=self.level)
+        return self._zstd.compress(data)
+
+    def stream(self):
+        if self.encoding == "gzip":
+            return _GzipStream(self.level)
+        if self.encoding == "br":
+            return _BrotliStream(self._module, self.level)
+        return _ZstdStream(self._module, self._zstd)
+
+@lru_cache(maxsize=256)
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    """
+    Разбирает Accept-Encoding в словарь кодирование -> q. Значения заголовка у клиентов
+    повторяются, поэтому результат кэшируется.
+    """
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+class CompressionMiddleware:
+    """
+    Выбирает первое из encodings (порядок предпочтения сервера), которое клиент принимает с q > 0.
+    levels — уровень для каждого кодирования (gzip 1–9, br 0–11, zstd 1–22).
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        encodings: Sequence[str] = ("gzip",),
+        levels: Optional[Dict[str, int]] = None,
+        minimum_size: int = 1024,
+        threadpool_size: int = 256 * 1024,
+    ) -> None:
+        self.app = app
+        levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+        self.codecs = tuple(Codec(encoding, levels[encoding]) for encoding in encodings)
+        self.minimum_size = minimum_size
+        self.threadpool_size = threadpool_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.codecs:
+            await self.app(scope, receive, send)
+            return
+        codec = self._negotiate(Headers(scope=scope).get("accept-encoding"))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(self, codec, send))
+
+    def _negotiate(self, accept_encoding: Optional[str]) -> Optional[Codec]:
+        if not accept_encoding:
+            return None
+        accepted = _accepted(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        for codec in self.codecs:
+            if accepted.get(codec.encoding, wildcard) > 0:
+                return codec
+        return None
+
+class _CompressingSend:
+    """
+    Откладывает http.response.start до первого куска тела: по нему видно,
+    нужно ли сжатие и целый это ответ или поток.
+    """
+    __slots__ = ("middleware", "codec", "send", "start", "stream", "passthrough")
+
+    def __init__(self, middleware: CompressionMiddleware, codec: Codec, send: Send) -> None:
+        self.middleware = middleware
+        self.codec = codec
+        self.send = send
+        self.start: Optional[Message] = None
+        self.stream = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is not None:
+            data = self.stream.chunk(body) if more_body else self.stream.finish(body)
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+        headers = MutableHeaders(raw=self.start["headers"])
+        if not self._compressible(headers) or self._size(headers, body, more_body) < self.middleware.minimum_size:
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+        headers["Content-Encoding"] = self.codec.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            # Разные кодирования не могут делить сильный валидатор (RFC 9110, 8.8.3);
+            # not_modified сравнивает слабо, поэтому 304 по-прежнему работает
+            headers["ETag"] = f"W/{etag}"
+        if more_body:
+            del headers["Content-Length"]
+            self.stream = self.codec.stream()
+            body = self.stream.chunk(body)
+        else:
+            if len(body) >= self.middleware.threadpool_size:
+                body = await run_in_threadpool(self.codec.compress, body)
+            else:
+                body = self.codec.compress(body)
+            headers["Content-Length"] = str(len(body))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    @staticmethod
+    def _size(headers: MutableHeaders, body: bytes, more_body: bool) -> float:
+        """
+        Размер тела: по Content-Length, если он известен (BaseHTTPMiddleware отдаёт
+        даже целый ответ по частям), иначе — целиком пришедшее тело; у потока — без ограничения.
+        """
+        content_length = headers.get("content-length")
+        if content_length is not None and content_length.isdigit():
+            return int(content_length)
+        return float("inf") if more_body else len(body)
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(UNCOMPRESSIBLE_TYPES)
+
+def parse_encodings(value: str) -> Tuple[str, ...]:
+    encodings = tuple(encoding.strip().lower() for encoding in value.split(",") if encoding.strip())
+    unknown = set(encodings) - set(ENCODINGS)
+    if unknown:
+        raise ValueError(f"Unknown compression encodings: {', '.join(sorted(unknown))}")
+    return encodings
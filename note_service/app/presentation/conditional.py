@@ -0,0 +1,68 @@
+"""
+Условные HTTP-запросы: ETag, If-None-Match (304) и If-Match (412).
+Версия заметки — её updated_at в миллисекундах (точность хранения MongoDB), поэтому
+If-Match проверяется условием на updated_at прямо в фильтре обновления, без
+дополнительного чтения. Для списков ETag — хеш пар (id, updated_at) страницы и
+параметров запроса: он считается до сериализации, и ответ 304 её пропускает.
+"""
+
+from datetime import datetime
+from hashlib import blake2b
+from typing import List, Optional, Sequence
+from fastapi import Response
+from note_service.app.domain.changes import from_millis, to_millis
+
+# Ответ зависит от пользователя; no-cache — кэшировать можно, но только с перепроверкой ETag
+CACHE_CONTROL = "private, no-cache"
+
+def version_etag(updated_at: datetime) -> str:
+    return f'"{to_millis(updated_at)}"'
+
+def list_etag(views: Sequence[dict], *params) -> Optional[str]:
+    """
+    Слабый ETag страницы списка; None, если в проекции нет updated_at.
+    """
+    digest = blake2b(repr(params).encode(), digest_size=16)
+    for view in views:
+        updated_at = view.get("updated_at")
+        if updated_at is None:
+            return None
+        digest.update(f"{view['id']}:{to_millis(updated_at)};".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{blake2b(body, digest_size=16).hexdigest()}"'
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Слабое сравнение If-None-Match с ETag (RFC 9110, 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def if_match_versions(if_match: Optional[str]) -> Optional[List[datetime]]:
+    """
+    Версии из If-Match для фильтра обновления; None — условия нет (заголовка нет или "*").
+    Версионный ETag ослабляется только при сжатии ответа (CompressionMiddleware), версия
+    в нём та же, поэтому W/"<ms>" принимается наравне с "<ms>". Чужие ETag не совпадают
+    ни с одной версией, и пустой список всегда даёт 412.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions: List[datetime] = []
+    for candidate in if_match.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if len(candidate) > 2 and candidate[0] == candidate[-1] == '"' and candidate[1:-1].isdigit():
+            try:
+                versions.append(from_millis(int(candidate[1:-1])))
+            except (OverflowError, ValueError):
+                # Версия вне диапазона дат не совпадает ни с одной — 412
+                continue
+    return versions
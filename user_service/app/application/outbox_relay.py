@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from user_service.app.domain.interfaces import MessageBroker, OutboxRepository
+from user_service.app.core.metrics import OUTBOX_PUBLISHED, OUTBOX_FAILED
+
+logger = logging.getLogger(__name__)
+
+class OutboxRelay:
+    """
+    Фоновая доставка событий из outbox в брокер.
+    Событие удаляется из outbox только после подтверждения брокером (at-least-once):
+    при сбое между публикацией и удалением оно будет отправлено повторно.
+    """
+    def __init__(
+        self,
+        outbox: OutboxRepository,
+        broker: MessageBroker,
+        batch_size: int = 100,
+        poll_interval: float = 0.5,
+        lease_seconds: float = 30.0,
+    ) -> None:
+        self.outbox = outbox
+        self.broker = broker
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+    async def relay_once(self) -> int:
+        messages = await self.outbox.claim_batch(self.batch_size, self.lease_seconds)
+        if not messages:
+            return 0
+        results = await self.broker.publish_many(messages)
+        published = [message.id for message, ok in zip(messages, results) if ok]
+        await self.outbox.mark_published(published)
+        OUTBOX_PUBLISHED.inc(len(published))
+        failed = len(messages) - len(published)
+        if failed:
+            OUTBOX_FAILED.inc(failed)
+            logger.warning("Failed to publish %d outbox messages, will retry after lease expires", failed)
+        return len(messages)
+
+    async def run(self) -> None:
+        logger.info("Outbox relay started")
+        while True:
+            try:
+                processed = await self.relay_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Outbox relay iteration failed: %s", str(e))
+                processed = 0
+            # Полная пачка — в outbox, скорее всего, есть ещё события, продолжаем без паузы
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
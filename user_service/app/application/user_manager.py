@@ -1,35 +1,47 @@
 import logging
-from typing import Optional, List
+from datetime import datetime
+from typing import AsyncIterator, Optional, List, Sequence, Tuple
 from fastapi import HTTPException
-from user_service.app.domain.models.user import User, UserCreate, UserUpdate, UserRole
+from user_service.app.domain.models.outbox import OutboxMessage
+from user_service.app.domain.models.user import User, UserCreate, UserFilter, UserUpdate, UserRole
+from user_service.app.domain.user_list import encode_user_cursor, list_order
 from user_service.app.domain.interfaces import UserRepository, MessageBroker
-from user_service.app.core.auth import get_password_hash, verify_password
+from user_service.app.core.auth import PasswordHasher
+from user_service.app.core.principal_cache import PrincipalCache
 
 logger = logging.getLogger(__name__)
 
 class UserManager:
-    def __init__(self, repository: UserRepository, broker: MessageBroker) -> None:
+    def __init__(
+        self,
+        repository: UserRepository,
+        broker: MessageBroker,
+        principal_cache: Optional[PrincipalCache] = None,
+        password_hasher: Optional[PasswordHasher] = None,
+    ) -> None:
         self.repository = repository
         self.broker = broker
+        self.principal_cache = principal_cache
+        self.password_hasher = password_hasher or PasswordHasher()
 
     async def register_user(self, user: UserCreate) -> User:
         logger.info("Registering user", extra={"context": f"username={user.username}"})
         existing_user = await self.repository.get_user_by_username(user.username)
         if existing_user:
             raise HTTPException(status_code=400, detail="Username already exists")
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await self.password_hasher.hash(user.password)
         # Явно задаем роль USER при регистрации
         new_user = User(username=user.username, email=user.email, password_hash=hashed_password, role=UserRole.USER)
-        created_user = await self.repository.create_user(new_user)
-        await self.broker.publish(
-            "user.events",
-            {"event_type": "user.created", "user_id": created_user.id, "username": created_user.username, "email": created_user.email}
+        # Событие пишется в outbox вместе с пользователем и публикуется фоновым OutboxRelay
+        event = OutboxMessage(
+            queue="user.events",
+            payload={"event_type": "user.created", "username": new_user.username, "email": new_user.email}
         )
-        return created_user
+        return await self.repository.create_user(new_user, outbox=[event])
 
     async def authenticate_user(self, username: str, password: str) -> Optional[User]:
         user = await self.repository.get_user_by_username(username)
-        if not user or not verify_password(password, user.password_hash):
+        if not user or not await self.password_hasher.verify(password, user.password_hash):
             return None
         return user
 
@@ -40,31 +52,72 @@ class UserManager:
             raise HTTPException(status_code=404, detail="User not found")
         return user
 
-    async def update_user(self, user_id: str, user_update: UserUpdate) -> User:
+    async def update_user(
+        self, user_id: str, user_update: UserUpdate, versions: Optional[Sequence[datetime]] = None
+    ) -> User:
+        """
+        versions — допустимые версии пользователя из If-Match; несовпадение даёт 412.
+        """
         logger.info("Updating user", extra={"context": f"user_id={user_id}"})
         update_data = user_update.dict(exclude_unset=True)
         if "password" in update_data:
-            update_data["password_hash"] = get_password_hash(update_data.pop("password"))
-        updated_user = await self.repository.update_user(user_id, update_data)
+            update_data["password_hash"] = await self.password_hasher.hash(update_data.pop("password"))
+        updated_user = await self.repository.update_user(user_id, update_data, versions)
         if not updated_user:
+            # Редкий путь: отдельным чтением различаем устаревшую версию (412) и отсутствие (404)
+            if versions is not None and await self.repository.get_user(user_id) is not None:
+                logger.info("User version mismatch", extra={"context": f"user_id={user_id}"})
+                raise HTTPException(status_code=412, detail="User was modified")
             raise HTTPException(status_code=404, detail="User not found")
+        # Роль, пароль и данные профиля попадают в claims токена — сбрасываем закэшированного пользователя
+        self._invalidate_principal(user_id)
         return updated_user
 
     async def delete_user(self, user_id: str) -> bool:
         logger.info("Deleting user", extra={"context": f"user_id={user_id}"})
-        success = await self.repository.delete_user(user_id)
+        event = OutboxMessage(queue="user.events", payload={"event_type": "user.deleted", "user_id": user_id})
+        success = await self.repository.delete_user(user_id, outbox=[event])
         if not success:
             raise HTTPException(status_code=404, detail="User not found")
-        await self.broker.publish(
-            "user.events",
-            {"event_type": "user.deleted", "user_id": user_id}
-        )
+        self._invalidate_principal(user_id)
         return success
 
+    def _invalidate_principal(self, user_id: str) -> None:
+        if self.principal_cache is not None:
+            self.principal_cache.invalidate(user_id)
+
     async def get_user_by_username(self, username: str) -> Optional[User]:
         logger.debug("Fetching user by username", extra={"context": f"username={username}"})
         return await self.repository.get_user_by_username(username)
 
-    async def list_users(self) -> List[User]:
-        logger.debug("Fetching all users")
-        return await self.repository.list_users()
\ No newline at end of file
+    async def list_users(
+        self, user_filter: UserFilter, limit: int, after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Страница пользователей по фильтру и курсор следующей страницы (None — страница последняя).
+        """
+        logger.debug("Fetching users page", extra={"context": f"filter={user_filter}, limit={limit}, after={after}"})
+        self._check_filter(user_filter)
+        try:
+            views = await self.repository.get_user_views_page(user_filter, limit + 1, after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from e
+        next_cursor = None
+        if len(views) > limit:
+            views = views[:limit]
+            next_cursor = encode_user_cursor(views[-1], list_order(user_filter))
+        return views, next_cursor
+
+    def stream_users(self, user_filter: UserFilter) -> AsyncIterator[dict]:
+        logger.info("Exporting users", extra={"context": f"filter={user_filter}"})
+        self._check_filter(user_filter)
+        return self.repository.stream_user_views(user_filter)
+
+    @staticmethod
+    def _check_filter(user_filter: UserFilter) -> None:
+        if (
+            user_filter.created_from is not None
+            and user_filter.created_to is not None
+            and user_filter.created_from >= user_filter.created_to
+        ):
+            raise HTTPException(status_code=400, detail="created_from must be earlier than created_to")
\ No newline at end of file
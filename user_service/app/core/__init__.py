@@ -1,6 +1,6 @@
 from .config import settings
 from .container import Container
 from .dependencies import get_user_manager
-from .metrics import REQUEST_COUNT, REQUEST_LATENCY, setup_metrics
+from .metrics import REQUEST_METRICS, setup_metrics
 
-__all__ = ["settings", "Container", "get_user_manager", "REQUEST_COUNT", "REQUEST_LATENCY", "setup_metrics"]
\ No newline at end of file
+__all__ = ["settings", "Container", "get_user_manager", "REQUEST_METRICS", "setup_metrics"]
\ No newline at end of file
@@ -1,8 +1,15 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from time import perf_counter
 from typing import Optional
+from fastapi import HTTPException
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from user_service.app.core.config import settings
+from user_service.app.core.metrics import HASH_LATENCY, HASH_QUEUE_DEPTH, HASH_REJECTED
+from user_service.app.core.timing import stage
+from user_service.app.domain.models.user import User, UserRole
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -12,6 +19,58 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """
+    Выполняет bcrypt в пуле потоков или процессов, чтобы не блокировать event loop.
+    Число ожидающих операций ограничено: при переполнении запрос получает 503.
+    workers=0 — выполнение прямо в event loop (прежнее поведение).
+    """
+    def __init__(self, workers: int = 0, queue_limit: int = 0, executor: str = "thread") -> None:
+        self.queue_limit = queue_limit
+        self._pending = 0
+        self._executor: Optional[Executor] = None
+        if workers > 0:
+            executor_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+            self._executor = executor_cls(max_workers=workers)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    async def _run(self, operation: str, func, *args):
+        with stage("password_hash"):
+            return await self._run_stage(operation, func, *args)
+
+    async def _run_stage(self, operation: str, func, *args):
+        if self._executor is None:
+            start_time = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                HASH_LATENCY.labels(operation=operation).observe(perf_counter() - start_time)
+        if self.queue_limit and self._pending >= self.queue_limit:
+            HASH_REJECTED.labels(operation=operation).inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Password hashing is overloaded, retry later",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        HASH_QUEUE_DEPTH.set(self._pending)
+        start_time = perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            HASH_QUEUE_DEPTH.set(self._pending)
+            HASH_LATENCY.labels(operation=operation).observe(perf_counter() - start_time)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -22,6 +81,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
+def principal_claims(user: User) -> dict:
+    """
+    Claims токена, достаточные для сборки User без обращения к БД.
+    """
+    return {
+        "sub": user.id,
+        "username": user.username,
+        "email": user.email,
+        "role": user.role.value,
+        "created_at": user.created_at.isoformat(),
+        "updated_at": user.updated_at.isoformat(),
+        "iat": datetime.utcnow(),
+    }
+
+def user_from_claims(payload: dict) -> Optional[User]:
+    """
+    Собирает User из claims токена; None, если токен выпущен без них.
+    """
+    try:
+        return User(
+            _id=payload["sub"],
+            username=payload["username"],
+            email=payload["email"],
+            role=UserRole(payload["role"]),
+            created_at=datetime.fromisoformat(payload["created_at"]),
+            updated_at=datetime.fromisoformat(payload["updated_at"]),
+        )
+    except (KeyError, ValueError):
+        return None
+
 def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
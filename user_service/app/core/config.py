@@ -13,6 +13,55 @@ class Settings(BaseSettings):
     jwt_access_token_expire_minutes: int
     sentry_dsn: Optional[str] = None
     auth_token_url: str = "http://localhost:8001/api/auth/login"
+    users_page_size: int = 100  # Размер страницы списка пользователей по умолчанию
+    users_page_size_max: int = 1000
+    # database — пользователь читается из БД (через principal-кэш);
+    # claims — пользователь собирается из claims токена без обращения к БД.
+    # Инвалидация при смене роли или пароля действует в пределах процесса,
+    # в остальных воркерах старые claims живут до истечения токена.
+    auth_mode: str = "database"
+    principal_cache_ttl_seconds: float = 30.0
+    principal_cache_max_entries: int = 10000
+    password_hash_executor: str = "thread"  # thread | process
+    password_hash_workers: int = 4  # 0 — хэшировать прямо в event loop
+    password_hash_queue_limit: int = 64  # При превышении — 503
+    outbox_use_transactions: bool = True  # Требует реплика-сет MongoDB
+    outbox_batch_size: int = 100
+    outbox_poll_interval_seconds: float = 0.5
+    outbox_lease_seconds: float = 30.0
+    # Пул соединений MongoDB (на один процесс/воркер uvicorn)
+    # Не заданные параметры берутся из mongo_url, а если нет и там — из драйвера (100 и 0)
+    mongo_max_pool_size: Optional[int] = None
+    mongo_min_pool_size: Optional[int] = None
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None  # Сколько ждать свободное соединение из пула
+    mongo_compressors: Optional[str] = None  # Например, "zstd,zlib" (zstd требует пакет zstandard)
+    mongo_read_preference: Optional[str] = None  # primary | primaryPreferred | secondary | ...
+    mongo_write_concern: Optional[str] = None  # Например, "majority" или "1"
+    mongo_max_time_ms: Optional[int] = 10000  # Серверный лимит времени запросов чтения (maxTimeMS)
+    mongo_replica_reads: bool = False  # Списки и поиск читать с вторичных узлов (secondaryPreferred)
+    mongo_max_staleness_seconds: int = 90  # Допустимое отставание вторичного узла (минимум 90, -1 без ограничения)
+    read_your_writes_window_seconds: float = 10.0  # Сколько после записи читать с причинной согласованностью
+    rabbitmq_channel_pool_size: int = 4  # Каналов для публикации (с publisher confirms)
+    event_codec: str = "json"  # json | orjson | msgpack — формат публикуемых событий
+    request_stages_enabled: bool = False  # Метрика *_request_stage_seconds: время стадий запроса (auth, db, ...)
+    server_timing_enabled: bool = False  # Заголовок Server-Timing со временем стадий запроса (auth, db, ...)
+    otel_enabled: bool = False  # Спаны OpenTelemetry для стадий; требует opentelemetry-api и настроенный SDK
+    compression_enabled: bool = True
+    compression_min_size: int = 1024  # Ответы меньше (в байтах) не сжимаются
+    compression_encodings: str = "gzip"  # Порядок предпочтения, например "zstd,br,gzip" (br и zstd требуют пакеты)
+    compression_gzip_level: int = 6  # 1–9
+    compression_brotli_quality: int = 4  # 0–11
+    compression_zstd_level: int = 3  # 1–22
+    compression_threadpool_size: int = 262144  # Ответы от этого размера сжимаются в пуле потоков
+    # memory — хранилище и брокер в памяти процесса (тесты, профилирование без I/O);
+    # данные не переживают перезапуск, события не покидают процесс
+    storage_backend: str = "mongo"  # mongo | memory
+    broker_backend: str = "rabbitmq"  # rabbitmq | memory
+    memory_broker_queue_size: int = 10000  # Ёмкость очереди брокера в памяти; при переполнении publish ждёт
+    rabbitmq_publish_timeout_seconds: float = 10.0  # Ожидание подтверждения публикации
+    index_auto_create: bool = True  # false, если индексы создаются миграциями
+    index_check_mode: str = "off"  # off | warn | fail: проверка планов запросов на COLLSCAN при старте
 
     model_config = SettingsConfigDict(
         env_file=".env.user_service",
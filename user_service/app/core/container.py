@@ -1,11 +1,20 @@
 import asyncio
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from user_service.app.application.outbox_relay import OutboxRelay
 from user_service.app.application.user_manager import UserManager
 from user_service.app.infrastructure.db import MongoUserRepository
+from user_service.app.infrastructure.indexes import INDEX_CHECK_MODES
+from user_service.app.infrastructure.memory import InMemoryOutboxRepository, InMemoryUserRepository
+from user_service.app.infrastructure.memory_broker import InMemoryBroker
+from user_service.app.infrastructure.mongo import CausalSessionTracker, create_mongo_client, replica_read_preference
+from user_service.app.infrastructure.outbox import MongoOutboxRepository
 from user_service.app.infrastructure.rabbitmq import RabbitMQBroker
+from user_service.app.core.auth import PasswordHasher
 from user_service.app.core.config import Settings
-from user_service.app.domain.interfaces import MessageBroker
+from user_service.app.core.timing import timed
+from user_service.app.core.principal_cache import PrincipalCache
+from user_service.app.domain.interfaces import MessageBroker, OutboxRepository, UserRepository
 
 logger = logging.getLogger(__name__)
 
@@ -15,37 +24,126 @@ class Container:
         self.client: AsyncIOMotorClient | None = None
         self.db: AsyncIOMotorDatabase | None = None
         self.broker: MessageBroker | None = None
+        self.password_hasher: PasswordHasher | None = None
+        self.outbox: OutboxRepository | None = None
+        self.outbox_task: asyncio.Task | None = None
+        self.index_task: asyncio.Task | None = None
 
     async def get_mongo_client(self) -> tuple[AsyncIOMotorClient, AsyncIOMotorDatabase]:
         if self.client is None:
-            self.client = AsyncIOMotorClient(self.settings.mongo_url)
+            self.client = create_mongo_client(self.settings)
             self.db = self.client[self.settings.database_name]
         return self.client, self.db
 
     async def get_message_broker(self) -> MessageBroker:
         if self.broker is None:
-            self.broker = RabbitMQBroker()
+            backend = self.settings.broker_backend
+            if backend == "rabbitmq":
+                self.broker = RabbitMQBroker()
+            elif backend == "memory":
+                self.broker = InMemoryBroker(
+                    codec=self.settings.event_codec,
+                    queue_size=self.settings.memory_broker_queue_size,
+                )
+            else:
+                raise ValueError(f"Unknown broker backend: {backend}")
             await self.broker.connect()
         return self.broker
 
-    async def get_user_manager(self) -> UserManager:
+    async def get_user_repository(self) -> UserRepository:
+        """
+        Создаёт репозиторий пользователей и outbox (self.outbox) выбранного хранилища.
+        """
+        backend = self.settings.storage_backend
+        if backend == "memory":
+            logger.warning("Using in-memory user storage, data is lost on restart")
+            self.outbox = InMemoryOutboxRepository()
+            return InMemoryUserRepository(self.outbox)
+        if backend != "mongo":
+            raise ValueError(f"Unknown storage backend: {backend}")
         if self.client is None or self.db is None:
             self.client, self.db = await self.get_mongo_client()
-        repository = MongoUserRepository(self.db)
+        self.outbox = MongoOutboxRepository(self.db)
+        read_preference = replica_read_preference(self.settings)
+        causal_tracker = None
+        if read_preference is not None and self.settings.read_your_writes_window_seconds > 0:
+            # Список общий, поэтому отслеживается одна последняя запись
+            causal_tracker = CausalSessionTracker(
+                self.client, window=self.settings.read_your_writes_window_seconds, max_users=1
+            )
+        return MongoUserRepository(
+            self.db,
+            use_transactions=self.settings.outbox_use_transactions,
+            max_time_ms=self.settings.mongo_max_time_ms,
+            replica_read_preference=read_preference,
+            causal_tracker=causal_tracker,
+        )
+
+    async def get_user_manager(self) -> UserManager:
+        repository = await self.get_user_repository()
         broker = await self.get_message_broker()
-        manager = UserManager(repository, broker)  # Передаем брокер как зависимость
+        relay = OutboxRelay(
+            self.outbox,
+            broker,
+            batch_size=self.settings.outbox_batch_size,
+            poll_interval=self.settings.outbox_poll_interval_seconds,
+            lease_seconds=self.settings.outbox_lease_seconds,
+        )
+        self.outbox_task = asyncio.create_task(relay.run())
+        principal_cache = PrincipalCache(
+            max_entries=self.settings.principal_cache_max_entries,
+            ttl=self.settings.principal_cache_ttl_seconds,
+            revocation_ttl=self.settings.jwt_access_token_expire_minutes * 60,
+        )
+        self.password_hasher = PasswordHasher(
+            workers=self.settings.password_hash_workers,
+            queue_limit=self.settings.password_hash_queue_limit,
+            executor=self.settings.password_hash_executor,
+        )
+        manager = UserManager(timed(repository, "db"), broker, principal_cache, self.password_hasher)  # Передаем брокер как зависимость
         asyncio.create_task(self.start_consuming(manager))
         return manager
 
     async def start_consuming(self, manager: UserManager):
-        async def callback(body: str):
-            logger.info(f"Received message: {body}")  # Заглушка для потребления
+        async def callback(message: dict):
+            logger.info(f"Received message: {message}")  # Заглушка для потребления
         broker = await self.get_message_broker()
         await broker.consume("user.events", callback)
 
+    async def prepare_indexes(self, *repositories) -> None:
+        """
+        Создаёт индексы и проверяет планы запросов. В режиме fail выполняется до старта
+        приложения (ошибка прерывает запуск), иначе — в фоне, не задерживая старт воркера.
+        """
+        if self.settings.index_check_mode not in INDEX_CHECK_MODES:
+            raise ValueError(f"Unknown index check mode: {self.settings.index_check_mode}")
+        if self.settings.index_check_mode == "fail":
+            await self._prepare_indexes(repositories)
+        else:
+            self.index_task = asyncio.create_task(self._run_in_background(self._prepare_indexes(repositories)))
+
+    async def _prepare_indexes(self, repositories) -> None:
+        for repository in repositories:
+            if self.settings.index_auto_create:
+                await repository.init_indexes()
+            await repository.check_query_plans(self.settings.index_check_mode)
+
+    @staticmethod
+    async def _run_in_background(job) -> None:
+        try:
+            await job
+        except Exception as e:
+            logger.error(f"Index preparation failed: {e}")
+
     async def close(self) -> None:
+        if self.index_task:
+            self.index_task.cancel()
+        if self.outbox_task:
+            self.outbox_task.cancel()
         if self.client:
             self.client.close()
         if self.broker:
             await self.broker.close()
+        if self.password_hasher:
+            self.password_hasher.shutdown()
         logger.info("Resources closed")
\ No newline at end of file
@@ -3,7 +3,8 @@ from fastapi.security import OAuth2PasswordBearer
 
 from user_service.app.core.config import settings
 from user_service.app.application.user_manager import UserManager
-from user_service.app.core.auth import decode_access_token
+from user_service.app.core.auth import decode_access_token, user_from_claims
+from user_service.app.core.timing import stage
 from user_service.app.domain.models.user import User, UserRole
 
 from fastapi import Depends, HTTPException, status
@@ -27,16 +28,29 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    user_id: str = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
-    user = await manager.get_user(user_id)
-    if user is None:
-        raise credentials_exception
-    return user
+    with stage("auth"):
+        payload = decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise credentials_exception
+        cache = manager.principal_cache
+        if settings.auth_mode == "claims" and (cache is None or not cache.is_revoked(user_id, payload.get("iat"))):
+            user = user_from_claims(payload)
+            if user is not None:
+                return user
+        if cache is not None:
+            user = cache.get(user_id)
+            if user is not None:
+                return user
+        # Чтение из БД внутри auth учитывается как стадия db, а не auth
+        user = await manager.get_user(user_id)
+        if user is None:
+            raise credentials_exception
+        if cache is not None:
+            cache.set(user)
+        return user
 
 
 async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
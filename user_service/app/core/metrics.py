@@ -3,13 +3,124 @@
 Определены счетчики и гистограммы для мониторинга количества запросов и задержек.
 """
 
-from prometheus_client import Counter, Histogram
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, Iterator, List, Tuple
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.utils import floatToGoString
 
-REQUEST_COUNT = Counter("user_service_requests_total", "Total number of requests", ["method", "endpoint"])
-REQUEST_LATENCY = Histogram("user_service_request_latency_seconds", "Request latency in seconds", ["endpoint"])
+HASH_QUEUE_DEPTH = Gauge("user_service_password_hash_queue_depth", "Password hash operations waiting or running")
+HASH_LATENCY = Histogram(
+    "user_service_password_hash_seconds", "Password hash time including queue wait", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+OUTBOX_PUBLISHED = Counter("user_service_outbox_published_total", "Outbox messages published to the broker")
+OUTBOX_FAILED = Counter("user_service_outbox_failed_total", "Outbox messages that failed to publish")
+HASH_REJECTED = Counter("user_service_password_hash_rejected_total", "Password hash operations rejected by backpressure", ["operation"])
+PUBLISH_LATENCY = Histogram(
+    "user_service_publish_latency_seconds", "Time from publish to broker confirm", ["queue"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+PUBLISH_CONFIRMS_IN_FLIGHT = Gauge("user_service_publish_confirms_in_flight", "Published messages awaiting broker confirm")
+PUBLISH_FAILED = Counter("user_service_publish_failed_total", "Publishes that were nacked, timed out or failed", ["queue"])
+MONGO_POOL_CONNECTIONS = Gauge("user_service_mongo_pool_connections", "Open MongoDB connections", ["address"])
+MONGO_POOL_IN_USE = Gauge("user_service_mongo_pool_in_use", "MongoDB connections checked out of the pool", ["address"])
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "user_service_mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection", ["address"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+MONGO_POOL_CHECKOUT_FAILED = Counter(
+    "user_service_mongo_pool_checkout_failed_total", "Failed MongoDB connection checkouts", ["address", "reason"]
+)
 
 def setup_metrics() -> None:
     """
     Заглушка для инициализации метрик, если потребуется дополнительная настройка.
     """
-    pass
\ No newline at end of file
+    pass
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.sum = 0.0
+
+class RequestMetrics:
+    """
+    HTTP-метрики (их пишет MetricsMiddleware). Обновляются без блокировок prometheus_client:
+    все запросы процесса обрабатываются в одном event loop, поэтому достаточно обычных
+    счётчиков, а в формат Prometheus они переводятся только при сборе (collect).
+    endpoint — шаблон маршрута, например /api/notes/{note_id}.
+    """
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+    SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+    STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self.in_flight: Dict[str, int] = {}
+        self._counts: Dict[Tuple[str, str, int], int] = {}
+        self._latency: Dict[Tuple[str, str], _HistogramSeries] = {}
+        self._size: Dict[Tuple[str, str], _HistogramSeries] = {}
+        self._stages: Dict[Tuple[str, str, str], _HistogramSeries] = {}
+
+    def observe(self, method: str, endpoint: str, status: int, elapsed: float, size: int) -> None:
+        key = (method, endpoint, status)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        series_key = (method, endpoint)
+        latency = self._latency.get(series_key)
+        if latency is None:
+            latency = self._latency[series_key] = _HistogramSeries(len(self.LATENCY_BUCKETS) + 1)
+            self._size[series_key] = _HistogramSeries(len(self.SIZE_BUCKETS) + 1)
+        latency.buckets[bisect_left(self.LATENCY_BUCKETS, elapsed)] += 1
+        latency.sum += elapsed
+        response_size = self._size[series_key]
+        response_size.buckets[bisect_left(self.SIZE_BUCKETS, size)] += 1
+        response_size.sum += size
+
+    def observe_stages(self, method: str, endpoint: str, durations: Dict[str, float]) -> None:
+        """
+        Время стадий запроса (auth, db, serialize, app и др.), см. core/timing.py.
+        """
+        for stage, seconds in durations.items():
+            key = (method, endpoint, stage)
+            series = self._stages.get(key)
+            if series is None:
+                series = self._stages[key] = _HistogramSeries(len(self.STAGE_BUCKETS) + 1)
+            series.buckets[bisect_left(self.STAGE_BUCKETS, seconds)] += 1
+            series.sum += seconds
+
+    def collect(self) -> Iterator:
+        requests = CounterMetricFamily(
+            f"{self.prefix}_requests", "Total number of requests", labels=["method", "endpoint", "status"]
+        )
+        for (method, endpoint, status), count in list(self._counts.items()):
+            requests.add_metric([method, endpoint, str(status)], count)
+        yield requests
+        yield self._histogram("request_latency_seconds", "Request latency in seconds", self._latency, self.LATENCY_BUCKETS)
+        yield self._histogram("response_size_bytes", "Response body size in bytes", self._size, self.SIZE_BUCKETS)
+        yield self._histogram(
+            "request_stage_seconds", "Request time by stage", self._stages, self.STAGE_BUCKETS, ["method", "endpoint", "stage"]
+        )
+        in_flight = GaugeMetricFamily(f"{self.prefix}_requests_in_flight", "Requests being processed", labels=["method"])
+        for method, count in list(self.in_flight.items()):
+            in_flight.add_metric([method], count)
+        yield in_flight
+
+    def _histogram(
+        self, name: str, documentation: str, series: Dict[tuple, _HistogramSeries], bounds, labels=("method", "endpoint")
+    ) -> HistogramMetricFamily:
+        family = HistogramMetricFamily(f"{self.prefix}_{name}", documentation, labels=list(labels))
+        for key, values in list(series.items()):
+            cumulative: List[int] = list(accumulate(values.buckets))
+            family.add_metric(
+                list(key),
+                [(floatToGoString(bound), count) for bound, count in zip((*bounds, float("inf")), cumulative)],
+                values.sum,
+            )
+        return family
+
+REQUEST_METRICS = RequestMetrics("user_service")
+REGISTRY.register(REQUEST_METRICS)
@@ -0,0 +1,67 @@
+"""
+Кэш аутентифицированных пользователей (principal) в памяти процесса.
+Позволяет не обращаться к MongoDB на каждый запрос с токеном.
+"""
+
+from collections import OrderedDict
+from time import monotonic, time
+from typing import Optional, Tuple
+from user_service.app.domain.models.user import User
+
+class PrincipalCache:
+    """
+    Ограниченный LRU-кэш пользователей с TTL.
+    Дополнительно помнит момент инвалидации пользователя, чтобы токены,
+    выпущенные до смены роли или пароля, не принимались по одним только claims.
+    Инвалидации не вытесняются по max_entries: каждая хранится весь revocation_ttl
+    (срок жизни токена), иначе при большом потоке изменений устаревшие claims снова
+    принимались бы. Их число ограничено числом изменений пользователей за этот срок.
+    """
+    def __init__(self, max_entries: int, ttl: float, revocation_ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.revocation_ttl = revocation_ttl
+        self._users: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._revoked: "OrderedDict[str, float]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < monotonic():
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return user
+
+    def set(self, user: User) -> None:
+        # Хэш пароля в кэше не нужен
+        self._users[user.id] = (monotonic() + self.ttl, user.copy(update={"password_hash": None}))
+        self._users.move_to_end(user.id)
+        while len(self._users) > self.max_entries:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self._users.pop(user_id, None)
+        now = time()
+        self._revoked[user_id] = now
+        self._revoked.move_to_end(user_id)
+        # Записи упорядочены по времени инвалидации: истёкшие всегда в начале
+        while self._revoked:
+            oldest_id, revoked_at = next(iter(self._revoked.items()))
+            if revoked_at + self.revocation_ttl >= now:
+                break
+            del self._revoked[oldest_id]
+
+    def is_revoked(self, user_id: str, issued_at: Optional[float]) -> bool:
+        """
+        True, если токен выпущен не позже последней инвалидации пользователя (или без iat).
+        """
+        revoked_at = self._revoked.get(user_id)
+        if revoked_at is None:
+            return False
+        if revoked_at + self.revocation_ttl < time():
+            del self._revoked[user_id]
+            return False
+        return issued_at is None or issued_at <= revoked_at
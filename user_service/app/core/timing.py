@@ -0,0 +1,159 @@
+"""
+Разбивка времени запроса по стадиям: auth, db, password_hash, serialize и остаток app.
+Разбивка включается настройкой REQUEST_STAGES_ENABLED (или SERVER_TIMING_ENABLED):
+тогда MetricsMiddleware создаёт StageTimings на запрос и кладёт его в contextvar, а код
+отмечает стадии через `with stage("db"):` или обёртку timed(). По умолчанию она выключена:
+timed() возвращает объект без обёртки, а stage() — общий пустой контекстный менеджер,
+так что запрос не платит за учёт стадий.
+При OTEL_ENABLED=true каждая стадия дополнительно оформляется спаном OpenTelemetry;
+по умолчанию трассировка выключена и не импортируется.
+"""
+
+import functools
+import inspect
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+# Время от возврата из эндпоинта до начала ответа: валидация response_model и рендеринг
+SERIALIZE = "serialize"
+# Время запроса, не попавшее ни в одну стадию: маршрутизация, зависимости, прикладная логика
+APP = "app"
+
+_tracer: Any = None
+_stages_enabled = False
+
+class StageTimings:
+    """
+    Накопленное время стадий одного запроса (в секундах).
+    Время вложенной стадии вычитается из внешней: db внутри auth не считается дважды.
+    """
+    __slots__ = ("durations", "current", "endpoint_done")
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        self.current: Optional[str] = None
+        self.endpoint_done: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def finish(self, started: float, response_started: float) -> Dict[str, float]:
+        """
+        Дописывает serialize и остаток app к моменту начала ответа и возвращает все стадии.
+        """
+        if self.endpoint_done is not None and response_started >= self.endpoint_done:
+            self.add(SERIALIZE, response_started - self.endpoint_done)
+            self.endpoint_done = None
+        spent = sum(self.durations.values())
+        self.durations[APP] = max(response_started - started - spent, 0.0)
+        return self.durations
+
+    def server_timing(self) -> bytes:
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.durations.items()).encode()
+
+STAGE_TIMINGS: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+class _Stage:
+    __slots__ = ("name", "timings", "parent", "start", "span")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.span = None
+
+    def __enter__(self) -> "_Stage":
+        if _tracer is not None:
+            self.span = _tracer.start_as_current_span(self.name)
+            self.span.__enter__()
+        timings = self.timings = STAGE_TIMINGS.get()
+        if timings is not None:
+            self.parent = timings.current
+            timings.current = self.name
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        timings = self.timings
+        if timings is not None:
+            elapsed = perf_counter() - self.start
+            timings.add(self.name, elapsed)
+            timings.current = self.parent
+            if self.parent is not None:
+                timings.add(self.parent, -elapsed)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+_NO_STAGE = _NoStage()
+
+def stage(name: str):
+    """
+    Контекстный менеджер стадии запроса.
+    Стадии одного запроса должны быть вложены, а не выполняться параллельно (gather).
+    """
+    if _tracer is None and STAGE_TIMINGS.get() is None:
+        return _NO_STAGE
+    return _Stage(name)
+
+def mark_endpoint_done() -> None:
+    timings = STAGE_TIMINGS.get()
+    if timings is not None:
+        timings.endpoint_done = perf_counter()
+
+class _Timed:
+    """
+    Прокси, выполняющий корутинные методы объекта внутри stage(name).
+    Обёрнутые методы кэшируются, остальные атрибуты читаются из объекта при каждом обращении.
+    """
+    def __init__(self, target: Any, name: str) -> None:
+        self._target = target
+        self._stage = name
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(self._target, attribute)
+        if not inspect.iscoroutinefunction(value):
+            return value
+        name = self._stage
+
+        @functools.wraps(value)
+        async def timed_method(*args, **kwargs):
+            with _Stage(name):
+                return await value(*args, **kwargs)
+
+        setattr(self, attribute, timed_method)
+        return timed_method
+
+def timed(target: Any, name: str) -> Any:
+    """
+    Оборачивает репозиторий: его асинхронные методы учитываются как стадия name.
+    Без разбивки по стадиям и трассировки возвращает target как есть.
+    """
+    if not _stages_enabled and _tracer is None:
+        return target
+    return _Timed(target, name)
+
+def configure_timing(stages_enabled: bool, otel_enabled: bool, service_name: str) -> None:
+    """
+    Включает разбивку по стадиям и спаны OpenTelemetry. Вызывается до создания контейнера:
+    timed() решает, оборачивать ли репозиторий, в момент вызова.
+    Провайдер и экспортёр OpenTelemetry настраиваются стандартно (opentelemetry-instrument
+    или переменные OTEL_*); без них спаны не пишутся.
+    """
+    global _tracer, _stages_enabled
+    _stages_enabled = stages_enabled
+    if not otel_enabled:
+        _tracer = None
+        return
+    try:
+        from opentelemetry import trace
+    except ImportError as e:
+        raise RuntimeError("OTEL_ENABLED=true requires the 'opentelemetry-api' package") from e
+    _tracer = trace.get_tracer(service_name)
@@ -1,4 +1,5 @@
-from .interfaces import UserRepository
-from .models.user import User, UserView, UserCreate, UserUpdate
+from .interfaces import UserRepository, OutboxRepository
+from .models.user import User, UserView, UserFilter, UserCreate, UserUpdate
+from .models.outbox import OutboxMessage
 
-__all__ = ["UserRepository", "User", "UserView", "UserCreate", "UserUpdate"]
\ No newline at end of file
+__all__ = ["UserRepository", "OutboxRepository", "User", "UserView", "UserFilter", "UserCreate", "UserUpdate", "OutboxMessage"]
\ No newline at end of file
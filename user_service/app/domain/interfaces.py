@@ -1,10 +1,16 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from user_service.app.domain.models.user import User
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence
+from user_service.app.domain.models.outbox import OutboxMessage
+from user_service.app.domain.models.user import User, UserFilter
 
 class UserRepository(ABC):
     @abstractmethod
-    async def create_user(self, user: User) -> User:
+    async def create_user(self, user: User, outbox: Sequence[OutboxMessage] = ()) -> User:
+        """
+        Создаёт пользователя и в той же операции записывает события outbox.
+        В payload событий добавляется user_id созданного пользователя.
+        """
         pass
 
     @abstractmethod
@@ -12,11 +18,17 @@ class UserRepository(ABC):
         pass
 
     @abstractmethod
-    async def update_user(self, user_id: str, user_data: dict) -> Optional[User]:
+    async def update_user(
+        self, user_id: str, user_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[User]:
+        """
+        versions — допустимые значения updated_at (If-Match); при несовпадении возвращает None.
+        """
         pass
 
     @abstractmethod
-    async def delete_user(self, user_id: str) -> bool:
+    async def delete_user(self, user_id: str, outbox: Sequence[OutboxMessage] = ()) -> bool:
+        """Удаляет пользователя; события outbox записываются, только если пользователь был удалён."""
         pass
 
     @abstractmethod
@@ -24,7 +36,30 @@ class UserRepository(ABC):
         pass
 
     @abstractmethod
-    async def list_users(self) -> List[User]:
+    async def get_user_views_page(self, user_filter: UserFilter, limit: int, after: Optional[str] = None) -> List[dict]:
+        """
+        Возвращает страницу пользователей в виде словарей UserView без валидации;
+        password_hash не читается из хранилища. Порядок и курсор — domain.user_list.
+        Некорректный курсор — ValueError.
+        """
+        pass
+
+    @abstractmethod
+    def stream_user_views(self, user_filter: UserFilter) -> AsyncIterator[dict]:
+        """Отдаёт пользователей по фильтру по одному в виде словарей UserView, не загружая их все в память."""
+        pass
+
+class OutboxRepository(ABC):
+    @abstractmethod
+    async def claim_batch(self, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+        """
+        Захватывает до limit неопубликованных событий на lease_seconds.
+        Если захват истёк до mark_published, события будут выданы повторно.
+        """
+        pass
+
+    @abstractmethod
+    async def mark_published(self, message_ids: List[str]) -> None:
         pass
 
 class MessageBroker(ABC):
@@ -33,7 +68,21 @@ class MessageBroker(ABC):
         """Публикует сообщение в очередь."""
         pass
 
+    async def publish_many(self, messages: Sequence[OutboxMessage]) -> List[bool]:
+        """
+        Публикует пачку сообщений и возвращает признак успеха для каждого.
+        Реализация по умолчанию публикует сообщения по одному.
+        """
+        results = []
+        for message in messages:
+            try:
+                await self.publish(message.queue, message.payload)
+                results.append(True)
+            except Exception:
+                results.append(False)
+        return results
+
     @abstractmethod
     async def consume(self, queue: str, callback) -> None:
-        """Подписывается на очередь и вызывает callback для каждого сообщения."""
+        """Подписывается на очередь и вызывает callback с разобранным сообщением (dict)."""
         pass
\ No newline at end of file
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+class OutboxMessage(BaseModel):
+    """Событие, записанное вместе с изменением данных и ожидающее публикации в брокер."""
+    id: Optional[str] = Field(None, alias='_id')
+    queue: str
+    payload: dict
+    created_at: datetime = Field(default_factory=datetime.utcnow)
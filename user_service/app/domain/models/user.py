@@ -3,6 +3,9 @@ from typing import Optional
 from datetime import datetime
 from enum import Enum
 
+# Поля UserView: проекция списка пользователей читает только их (без password_hash)
+USER_VIEW_FIELDS = ("id", "username", "email", "role", "created_at", "updated_at")
+
 class UserRole(str, Enum):
     USER = "user"
     ADMIN = "admin"
@@ -24,6 +27,16 @@ class UserView(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class UserFilter(BaseModel):
+    """
+    Фильтры списка пользователей; все условия объединяются через AND.
+    created_from включительно, created_to — нет.
+    """
+    role: Optional[UserRole] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    username_prefix: Optional[str] = None
+
 class UserCreate(BaseModel):
     username: str
     email: EmailStr
@@ -0,0 +1,55 @@
+"""
+Порядок и курсоры списка пользователей (GET /api/users/).
+С фильтром по префиксу username список идёт в порядке username (уникальный индекс
+сужается до диапазона префикса), без него — в порядке (created_at, id): диапазон дат
+и роль обслуживаются индексами (created_at, _id) и (role, created_at, _id).
+Курсор — позиция последнего пользователя страницы в выбранном порядке.
+"""
+
+from datetime import datetime, timedelta
+from typing import Tuple, Union
+from user_service.app.domain.models.user import UserFilter
+
+USERNAME_ORDER = "username"
+CREATED_ORDER = "created_at"
+
+EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+# Позиция в порядке CREATED_ORDER: (created_at в миллисекундах, id); в USERNAME_ORDER — username
+UserPosition = Union[Tuple[int, str], str]
+
+def to_millis(moment: datetime) -> int:
+    return (moment - EPOCH) // _MILLISECOND
+
+def from_millis(millis: int) -> datetime:
+    """
+    Обратное to_millis; значение вне диапазона datetime — ValueError.
+    """
+    try:
+        return EPOCH + millis * _MILLISECOND
+    except OverflowError as e:
+        raise ValueError(f"Timestamp out of range: {millis}") from e
+
+def list_order(user_filter: UserFilter) -> str:
+    return USERNAME_ORDER if user_filter.username_prefix else CREATED_ORDER
+
+def encode_user_cursor(view: dict, order: str) -> str:
+    """
+    Курсор после пользователя view. Миллисекунды — точность хранения datetime в MongoDB.
+    """
+    if order == USERNAME_ORDER:
+        return view["username"]
+    return f"{to_millis(view['created_at'])}_{view['id']}"
+
+def decode_user_cursor(cursor: str, order: str) -> UserPosition:
+    if order == USERNAME_ORDER:
+        return cursor
+    millis, _, user_id = cursor.partition("_")
+    if not millis.isdigit() or not user_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    try:
+        from_millis(int(millis))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return int(millis), user_id
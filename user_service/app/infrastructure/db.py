@@ -1,25 +1,102 @@
-from typing import Optional, List
+import re
+from typing import AsyncIterator, Awaitable, Callable, Optional, List, Sequence, Tuple
 from bson.objectid import ObjectId, InvalidId
 from datetime import datetime
-from user_service.app.domain.models.user import User
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import SecondaryPreferred
+from user_service.app.domain.models.outbox import OutboxMessage
+from user_service.app.domain.models.user import User, UserFilter, USER_VIEW_FIELDS
+from user_service.app.domain.user_list import USERNAME_ORDER, decode_user_cursor, from_millis, list_order
 from user_service.app.domain.interfaces import UserRepository
+from user_service.app.infrastructure.indexes import IndexSpec, QueryShape, ensure_indexes, verify_query_plans
+from user_service.app.infrastructure.mongo import CausalSessionTracker, no_session
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Код ошибки MongoDB для транзакций на standalone-сервере (не реплика-сет)
+ILLEGAL_OPERATION = 20
+
+# Список пользователей общий для всех администраторов, поэтому read-your-writes
+# отслеживается одним ключом: после любой записи список читается не раньше неё
+USER_LIST_KEY = "users"
+
+# Проекция списка: только поля UserView, password_hash не читается
+VIEW_PROJECTION = {field: 1 for field in USER_VIEW_FIELDS if field != "id"}
+
+def to_view_document(document: dict) -> dict:
+    """
+    Приводит документ MongoDB к формату UserView без pydantic-валидации.
+    """
+    document["id"] = str(document.pop("_id"))
+    return document
+
 class MongoUserRepository(UserRepository):
-    def __init__(self, db) -> None:
+    INDEXES = (
+        # Логин и список с префиксом username (диапазон по индексу)
+        IndexSpec([("username", 1)], unique=True),
+        IndexSpec([("role", 1), ("username", 1)]),
+        # Список по умолчанию: keyset по (created_at, _id), фильтр по диапазону created_at
+        IndexSpec([("created_at", 1), ("_id", 1)]),
+        IndexSpec([("role", 1), ("created_at", 1), ("_id", 1)]),
+    )
+
+    def __init__(
+        self,
+        db,
+        use_transactions: bool = True,
+        max_time_ms: Optional[int] = None,
+        replica_read_preference: Optional[SecondaryPreferred] = None,
+        causal_tracker: Optional[CausalSessionTracker] = None,
+    ) -> None:
+        self.client = db.client
         self.collection = db.get_collection("users")
+        # Список пользователей можно читать с вторичных узлов; get_user и логин — только с primary
+        self.replica_collection = (
+            self.collection.with_options(read_preference=replica_read_preference)
+            if replica_read_preference else self.collection
+        )
+        self.causal_tracker = causal_tracker
+        self.write_session = causal_tracker.write_session if causal_tracker else no_session
+        self.read_session = causal_tracker.read_session if causal_tracker else no_session
+        self.outbox = db.get_collection("outbox")
+        self.use_transactions = use_transactions
+        # Серверный лимит времени (maxTimeMS) для запросов чтения
+        self.max_time_ms = max_time_ms
+        self.command_options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
 
     async def init_indexes(self) -> None:
-        await self.collection.create_index("username", unique=True)
+        await ensure_indexes(self.collection, self.INDEXES)
         logger.info("User indexes initialized")
 
-    async def create_user(self, user: User) -> User:
+    async def check_query_plans(self, mode: str) -> None:
+        moment = datetime(2024, 1, 1)
+        created_sort = [("created_at", 1), ("_id", 1)]
+        await verify_query_plans(self.collection, [
+            QueryShape("get_user", {"_id": ObjectId("000000000000000000000000")}),
+            QueryShape("get_user_by_username", {"username": "user"}),
+            QueryShape("list_users", {}, created_sort, VIEW_PROJECTION),
+            QueryShape("list_users_by_role", {"role": "admin", "created_at": {"$gte": moment}}, created_sort, VIEW_PROJECTION),
+            QueryShape("list_users_by_prefix", {"username": {"$regex": "^us"}}, [("username", 1)], VIEW_PROJECTION),
+            QueryShape(
+                "list_users_by_role_and_prefix",
+                {"role": "admin", "username": {"$regex": "^us"}},
+                [("username", 1)],
+                VIEW_PROJECTION,
+            ),
+        ], mode)
+
+    async def create_user(self, user: User, outbox: Sequence[OutboxMessage] = ()) -> User:
         user_dict = user.dict(exclude={"id"})
-        result = await self.collection.insert_one(user_dict)
-        user.id = str(result.inserted_id)
-        return user
+        user_dict["_id"] = ObjectId()
+        user_id = str(user_dict["_id"])
+
+        async def write(session) -> Tuple[User, bool]:
+            await self.collection.insert_one(user_dict, session=session)
+            user.id = user_id
+            return user, True
+
+        return await self._write_with_outbox(write, outbox, user_id)
 
     async def get_user(self, user_id: str) -> Optional[User]:
         logger.debug(f"Fetching user with id: {user_id}")
@@ -27,46 +104,154 @@ class MongoUserRepository(UserRepository):
             object_id = ObjectId(user_id)
         except (InvalidId, TypeError):
             return None
-        document = await self.collection.find_one({"_id": object_id})
+        document = await self.collection.find_one({"_id": object_id}, max_time_ms=self.max_time_ms)
         if document:
             document["_id"] = str(document["_id"])
             return User.parse_obj(document)
         return None
 
-    async def update_user(self, user_id: str, user_data: dict) -> Optional[User]:
+    async def update_user(
+        self, user_id: str, user_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[User]:
         try:
             object_id = ObjectId(user_id)
         except (InvalidId, TypeError):
             return None
         update_command = {"$set": {**user_data, "updated_at": datetime.utcnow()}}
-        document = await self.collection.find_one_and_update(
-            {"_id": object_id},
-            update_command,
-            return_document=True
-        )
+        query: dict = {"_id": object_id}
+        if versions is not None:
+            # If-Match проверяется в том же запросе: несовпадение версии не найдёт документ
+            query["updated_at"] = {"$in": list(versions)}
+        async with self.write_session(USER_LIST_KEY) as session:
+            document = await self.collection.find_one_and_update(
+                query,
+                update_command,
+                return_document=True,
+                session=session,
+                **self.command_options
+            )
         if document:
             document["_id"] = str(document["_id"])
             return User.parse_obj(document)
         return None
 
-    async def delete_user(self, user_id: str) -> bool:
+    async def delete_user(self, user_id: str, outbox: Sequence[OutboxMessage] = ()) -> bool:
         try:
             object_id = ObjectId(user_id)
         except (InvalidId, TypeError):
             return False
-        result = await self.collection.delete_one({"_id": object_id})
-        return result.deleted_count > 0
+
+        async def write(session) -> Tuple[bool, bool]:
+            result = await self.collection.delete_one({"_id": object_id}, session=session)
+            return result.deleted_count > 0, result.deleted_count > 0
+
+        return await self._write_with_outbox(write, outbox, user_id)
 
     async def get_user_by_username(self, username: str) -> Optional[User]:
-        document = await self.collection.find_one({"username": username})
+        document = await self.collection.find_one({"username": username}, max_time_ms=self.max_time_ms)
         if document:
             document["_id"] = str(document["_id"])
             return User.parse_obj(document)
         return None
 
-    async def list_users(self) -> List[User]:
-        users = []
-        async for document in self.collection.find():
-            document["_id"] = str(document["_id"])
-            users.append(User.parse_obj(document))
-        return users
\ No newline at end of file
+    async def get_user_views_page(self, user_filter: UserFilter, limit: int, after: Optional[str] = None) -> List[dict]:
+        """
+        Страница пользователей keyset-курсором; лишние поля отсекаются проекцией MongoDB.
+        """
+        query, sort = self._list_query(user_filter, after)
+        async with self.read_session(USER_LIST_KEY) as session:
+            cursor = self.replica_collection.find(query, VIEW_PROJECTION, session=session).sort(sort).limit(
+                limit
+            ).max_time_ms(self.max_time_ms)
+            return [to_view_document(document) async for document in cursor]
+
+    def stream_user_views(self, user_filter: UserFilter) -> AsyncIterator[dict]:
+        """
+        Асинхронный итератор поверх курсора motor для выгрузки NDJSON.
+        Фильтр проверяется сразу, до начала итерации.
+        """
+        query, sort = self._list_query(user_filter, None)
+        return self._iterate_views(query, sort)
+
+    async def _iterate_views(self, query: dict, sort: List[Tuple[str, int]]) -> AsyncIterator[dict]:
+        # Без maxTimeMS: лимит суммируется по всем getMore и оборвал бы длинную выгрузку
+        async with self.read_session(USER_LIST_KEY) as session:
+            async for document in self.replica_collection.find(query, VIEW_PROJECTION, session=session).sort(sort):
+                yield to_view_document(document)
+
+    @staticmethod
+    def _list_query(user_filter: UserFilter, after: Optional[str]) -> Tuple[dict, List[Tuple[str, int]]]:
+        """
+        Фильтр и сортировка списка. Префикс — якорное регулярное выражение с учётом регистра:
+        MongoDB превращает его в диапазон уникального индекса username.
+        """
+        query: dict = {}
+        if user_filter.role is not None:
+            query["role"] = user_filter.role.value
+        created: dict = {}
+        if user_filter.created_from is not None:
+            created["$gte"] = user_filter.created_from
+        if user_filter.created_to is not None:
+            created["$lt"] = user_filter.created_to
+        if created:
+            query["created_at"] = created
+        order = list_order(user_filter)
+        position = decode_user_cursor(after, order) if after is not None else None
+        if order == USERNAME_ORDER:
+            query["username"] = {"$regex": f"^{re.escape(user_filter.username_prefix)}"}
+            if position is not None:
+                query["username"]["$gt"] = position
+            return query, [("username", 1)]
+        if position is not None:
+            millis, user_id = position
+            try:
+                object_id = ObjectId(user_id)
+            except (InvalidId, TypeError) as e:
+                raise ValueError(f"Invalid cursor: {after}") from e
+            moment = from_millis(millis)
+            query["$or"] = [{"created_at": {"$gt": moment}}, {"created_at": moment, "_id": {"$gt": object_id}}]
+        return query, [("created_at", 1), ("_id", 1)]
+
+    async def _write_with_outbox(
+        self, write: Callable[..., Awaitable[Tuple[object, bool]]], outbox: Sequence[OutboxMessage], user_id: str
+    ):
+        """
+        Выполняет write(session) и запись событий outbox в одной транзакции.
+        write возвращает (результат, нужно ли записать события).
+        На standalone-сервере транзакции недоступны: записи выполняются последовательно.
+        """
+        if not outbox:
+            async with self.write_session(USER_LIST_KEY) as session:
+                result, _ = await write(session)
+            return result
+        documents = [self._outbox_document(message, user_id) for message in outbox]
+        if self.use_transactions:
+            try:
+                async with await self.client.start_session(causal_consistency=True) as session:
+                    try:
+                        async with session.start_transaction():
+                            result, emit = await write(session)
+                            if emit:
+                                await self.outbox.insert_many(documents, session=session)
+                            return result
+                    finally:
+                        if self.causal_tracker is not None:
+                            self.causal_tracker.record(session, USER_LIST_KEY)
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                self.use_transactions = False
+                logger.warning("MongoDB transactions are not supported, outbox writes are not atomic")
+        async with self.write_session(USER_LIST_KEY) as session:
+            result, emit = await write(session)
+        if emit:
+            await self.outbox.insert_many(documents)
+        return result
+
+    @staticmethod
+    def _outbox_document(message: OutboxMessage, user_id: str) -> dict:
+        document = message.dict(exclude={"id"})
+        document["payload"] = {**message.payload, "user_id": message.payload.get("user_id", user_id)}
+        document["locked_until"] = None
+        document["attempts"] = 0
+        return document
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Реализации репозиториев пользователей и outbox в памяти процесса.
+Повторяют семантику MongoUserRepository и MongoOutboxRepository (уникальный username,
+атомарная запись события outbox вместе с изменением, аренда событий relay)
+и используются в тестах, бенчмарках и при STORAGE_BACKEND=memory.
+"""
+
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from user_service.app.domain.interfaces import OutboxRepository, UserRepository
+from user_service.app.domain.models.outbox import OutboxMessage
+from user_service.app.domain.models.user import User, UserFilter, USER_VIEW_FIELDS
+from user_service.app.domain.user_list import USERNAME_ORDER, decode_user_cursor, list_order, to_millis
+
+def _to_view(user_id: str, document: dict) -> dict:
+    view = {field: document[field] for field in USER_VIEW_FIELDS if field != "id"}
+    view["id"] = user_id
+    return view
+
+class InMemoryOutboxRepository(OutboxRepository):
+    """
+    Outbox в словаре в порядке добавления (порядок _id, как у claim_batch в MongoDB).
+    """
+    def __init__(self) -> None:
+        self.documents: Dict[str, dict] = {}
+
+    async def init_indexes(self) -> None:
+        pass
+
+    async def check_query_plans(self, mode: str) -> None:
+        pass
+
+    def add(self, messages: Sequence[OutboxMessage], user_id: str) -> None:
+        for message in messages:
+            document = message.dict(exclude={"id"})
+            document["_id"] = str(ObjectId())
+            document["payload"] = {**message.payload, "user_id": message.payload.get("user_id", user_id)}
+            document["locked_until"] = None
+            document["attempts"] = 0
+            self.documents[document["_id"]] = document
+
+    async def claim_batch(self, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+        now = datetime.utcnow()
+        locked_until = now + timedelta(seconds=lease_seconds)
+        messages = []
+        for document in self.documents.values():
+            if len(messages) >= limit:
+                break
+            if document["locked_until"] is not None and document["locked_until"] >= now:
+                continue
+            document["locked_until"] = locked_until
+            document["attempts"] += 1
+            messages.append(OutboxMessage.parse_obj(document))
+        return messages
+
+    async def mark_published(self, message_ids: List[str]) -> None:
+        for message_id in message_ids:
+            self.documents.pop(message_id, None)
+
+class InMemoryUserRepository(UserRepository):
+    """
+    Хранит пользователей в словаре документов того же вида, что и в MongoDB.
+    Вторичный индекс username -> id заменяет уникальный индекс по username:
+    поиск при логине — одно обращение к словарю, дубликат даёт DuplicateKeyError.
+    Операции не содержат await, поэтому изменение пользователя и запись outbox атомарны.
+    """
+    def __init__(self, outbox: Optional[InMemoryOutboxRepository] = None) -> None:
+        self.documents: Dict[str, dict] = {}
+        self._by_username: Dict[str, str] = {}
+        self.outbox = outbox
+
+    async def init_indexes(self) -> None:
+        pass
+
+    async def check_query_plans(self, mode: str) -> None:
+        pass
+
+    async def create_user(self, user: User, outbox: Sequence[OutboxMessage] = ()) -> User:
+        if user.username in self._by_username:
+            raise DuplicateKeyError(f"Duplicate username: {user.username}")
+        document = user.dict(exclude={"id"})
+        user_id = str(ObjectId())
+        self.documents[user_id] = document
+        self._by_username[user.username] = user_id
+        self._emit(outbox, user_id)
+        user.id = user_id
+        return user
+
+    async def get_user(self, user_id: str) -> Optional[User]:
+        document = self.documents.get(user_id)
+        return self._to_user(user_id, document) if document else None
+
+    async def update_user(
+        self, user_id: str, user_data: dict, versions: Optional[Sequence[datetime]] = None
+    ) -> Optional[User]:
+        document = self.documents.get(user_id)
+        if document is None:
+            return None
+        # Как в MongoDB, версия сравнивается с точностью до миллисекунд
+        if versions is not None and to_millis(document["updated_at"]) not in map(to_millis, versions):
+            return None
+        username = user_data.get("username", document["username"])
+        if username != document["username"]:
+            if username in self._by_username:
+                raise DuplicateKeyError(f"Duplicate username: {username}")
+            del self._by_username[document["username"]]
+            self._by_username[username] = user_id
+        document.update(user_data, updated_at=datetime.utcnow())
+        return self._to_user(user_id, document)
+
+    async def delete_user(self, user_id: str, outbox: Sequence[OutboxMessage] = ()) -> bool:
+        document = self.documents.pop(user_id, None)
+        if document is None:
+            return False
+        del self._by_username[document["username"]]
+        self._emit(outbox, user_id)
+        return True
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        user_id = self._by_username.get(username)
+        return self._to_user(user_id, self.documents[user_id]) if user_id else None
+
+    async def get_user_views_page(self, user_filter: UserFilter, limit: int, after: Optional[str] = None) -> List[dict]:
+        views = []
+        for view in self._filtered_views(user_filter, after):
+            if len(views) >= limit:
+                break
+            views.append(view)
+        return views
+
+    def stream_user_views(self, user_filter: UserFilter) -> AsyncIterator[dict]:
+        return self._iterate_views(self._filtered_views(user_filter, None))
+
+    @staticmethod
+    async def _iterate_views(views: Iterator[dict]) -> AsyncIterator[dict]:
+        for view in views:
+            yield view
+
+    def _filtered_views(self, user_filter: UserFilter, after: Optional[str]) -> Iterator[dict]:
+        """
+        Пользователи по фильтру в порядке и после курсора, как в MongoUserRepository.
+        Курсор разбирается сразу (ValueError), просмотр словаря — лениво.
+        """
+        order = list_order(user_filter)
+        position = decode_user_cursor(after, order) if after is not None else None
+        if order == USERNAME_ORDER:
+            key = lambda user_id, document: document["username"]
+        else:
+            # Как в MongoDB, время сравнивается с точностью до миллисекунд
+            key = lambda user_id, document: (to_millis(document["created_at"]), user_id)
+        matched = sorted(
+            (key(user_id, document), user_id, document)
+            for user_id, document in self.documents.items()
+            if self._matches(document, user_filter)
+        )
+        return (
+            _to_view(user_id, document)
+            for position_key, user_id, document in matched
+            if position is None or position_key > position
+        )
+
+    @staticmethod
+    def _matches(document: dict, user_filter: UserFilter) -> bool:
+        if user_filter.role is not None and document["role"] != user_filter.role:
+            return False
+        if user_filter.created_from is not None and document["created_at"] < user_filter.created_from:
+            return False
+        if user_filter.created_to is not None and document["created_at"] >= user_filter.created_to:
+            return False
+        return user_filter.username_prefix is None or document["username"].startswith(user_filter.username_prefix)
+
+    def _emit(self, outbox: Sequence[OutboxMessage], user_id: str) -> None:
+        if outbox and self.outbox is not None:
+            self.outbox.add(outbox, user_id)
+
+    @staticmethod
+    def _to_user(user_id: str, document: dict) -> User:
+        return User.parse_obj({**document, "_id": user_id})
@@ -0,0 +1,50 @@
+"""
+Брокер сообщений на очередях asyncio в пределах процесса.
+Сообщения кодируются тем же кодеком, что и для RabbitMQ, и разбираются через
+decode_message, поэтому стоимость сериализации сохраняется, а сеть — нет.
+Используется при BROKER_BACKEND=memory для тестов и профилирования;
+сообщения не переживают перезапуск процесса.
+"""
+
+import asyncio
+import logging
+from typing import Dict
+from user_service.app.domain.interfaces import MessageBroker
+from user_service.app.infrastructure.codecs import SCHEMA_VERSION, SCHEMA_VERSION_HEADER, decode_message, get_codec
+
+logger = logging.getLogger(__name__)
+
+class InMemoryBroker(MessageBroker):
+    def __init__(self, codec: str = "json", queue_size: int = 10000) -> None:
+        self.codec = get_codec(codec)
+        # Ограниченные очереди: при переполнении publish ждёт, как при backpressure брокера
+        self.queue_size = queue_size
+        self._queues: Dict[str, asyncio.Queue] = {}
+
+    async def connect(self) -> None:
+        pass
+
+    async def publish(self, queue: str, message: dict) -> None:
+        await self._queue(queue).put((self.codec.encode(message), self.codec.content_type))
+        logger.debug(f"Published message to {queue}: {message}")
+
+    async def consume(self, queue: str, callback) -> None:
+        source = self._queue(queue)
+        headers = {SCHEMA_VERSION_HEADER: SCHEMA_VERSION}
+        while True:
+            body, content_type = await source.get()
+            try:
+                await callback(decode_message(body, content_type, headers))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to process message from {queue}: {e}")
+
+    async def close(self) -> None:
+        self._queues.clear()
+
+    def _queue(self, name: str) -> asyncio.Queue:
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = self._queues[name] = asyncio.Queue(maxsize=self.queue_size)
+        return queue
@@ -0,0 +1,166 @@
+"""
+Создание клиента MongoDB с настройками пула из Settings и метриками пула соединений,
+а также маршрутизация чтений на вторичные узлы с read-your-writes.
+"""
+
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import Any, AsyncIterator, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+from user_service.app.core.config import Settings
+from user_service.app.core.metrics import (
+    MONGO_POOL_CHECKOUT_FAILED, MONGO_POOL_CHECKOUT_WAIT, MONGO_POOL_CONNECTIONS, MONGO_POOL_IN_USE
+)
+
+logger = logging.getLogger(__name__)
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Публикует состояние пула соединений в Prometheus: открытые и занятые соединения,
+    время ожидания свободного соединения и отказы при выдаче.
+    События приходят из потоков драйвера, поэтому обработчики должны быть быстрыми.
+    """
+    def connection_created(self, event) -> None:
+        MONGO_POOL_CONNECTIONS.labels(address=_address(event)).inc()
+
+    def connection_closed(self, event) -> None:
+        MONGO_POOL_CONNECTIONS.labels(address=_address(event)).dec()
+
+    def connection_checked_out(self, event) -> None:
+        address = _address(event)
+        MONGO_POOL_IN_USE.labels(address=address).inc()
+        # duration есть в событиях начиная с pymongo 4.7
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            MONGO_POOL_CHECKOUT_WAIT.labels(address=address).observe(duration)
+
+    def connection_checked_in(self, event) -> None:
+        MONGO_POOL_IN_USE.labels(address=_address(event)).dec()
+
+    def connection_check_out_failed(self, event) -> None:
+        MONGO_POOL_CHECKOUT_FAILED.labels(address=_address(event), reason=str(event.reason)).inc()
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        logger.warning(f"MongoDB connection pool cleared: {_address(event)}")
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+def create_mongo_client(settings: Settings) -> AsyncIOMotorClient:
+    """
+    Создаёт AsyncIOMotorClient. Параметры, не заданные в Settings, берутся из mongo_url или драйвера.
+    Пул создаётся на процесс, поэтому размер задаётся в расчёте на один воркер uvicorn.
+    """
+    # Заданные здесь параметры перекрывают одноимённые из mongo_url, поэтому передаются только явно заданные
+    options = {"event_listeners": [PoolMetricsListener()]}
+    if settings.mongo_max_pool_size is not None:
+        options["maxPoolSize"] = settings.mongo_max_pool_size
+    if settings.mongo_min_pool_size is not None:
+        options["minPoolSize"] = settings.mongo_min_pool_size
+    if settings.mongo_max_idle_time_ms is not None:
+        options["maxIdleTimeMS"] = settings.mongo_max_idle_time_ms
+    if settings.mongo_wait_queue_timeout_ms is not None:
+        options["waitQueueTimeoutMS"] = settings.mongo_wait_queue_timeout_ms
+    if settings.mongo_compressors:
+        options["compressors"] = settings.mongo_compressors
+    if settings.mongo_read_preference:
+        options["readPreference"] = settings.mongo_read_preference
+    if settings.mongo_write_concern:
+        write_concern = settings.mongo_write_concern
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    return AsyncIOMotorClient(settings.mongo_url, **options)
+
+class CausalSessionTracker:
+    """
+    Read-your-writes для чтений с вторичных узлов.
+    Запись пользователя выполняется в причинно согласованной сессии, её clusterTime и
+    operationTime запоминаются на window секунд. Чтение этого пользователя в окне идёт в
+    сессии, продвинутой до этих значений: вторичный узел ответит только после того,
+    как догонит запись (afterClusterTime). Чтения остальных пользователей идут без сессии.
+    """
+    def __init__(self, client: AsyncIOMotorClient, window: float, max_users: int) -> None:
+        self.client = client
+        self.window = window
+        self.max_users = max_users
+        self._writes: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def write_session(self, *user_ids: str) -> AsyncIterator[Any]:
+        async with await self.client.start_session(causal_consistency=True) as session:
+            try:
+                yield session
+            finally:
+                # И при ошибке: неупорядоченная пачка или оборванный ответ могли успеть записать часть
+                self.record(session, *user_ids)
+
+    def record(self, session, *user_ids: str) -> None:
+        """
+        Запоминает время записи в сессии session для чтений пользователей user_ids.
+        """
+        if session.cluster_time is None and session.operation_time is None:
+            return
+        expires_at = monotonic() + self.window
+        for user_id in user_ids:
+            cluster_time, operation_time = session.cluster_time, session.operation_time
+            previous = self._writes.get(user_id)
+            # Параллельные записи завершаются в любом порядке: остаётся более позднее время
+            if previous is not None and _later(previous[2], operation_time):
+                cluster_time, operation_time = previous[1], previous[2]
+            self._writes[user_id] = (expires_at, cluster_time, operation_time)
+            self._writes.move_to_end(user_id)
+        while len(self._writes) > self.max_users:
+            self._writes.popitem(last=False)
+
+    @asynccontextmanager
+    async def read_session(self, user_id: str) -> AsyncIterator[Any]:
+        entry = self._writes.get(user_id)
+        if entry is not None and entry[0] < monotonic():
+            del self._writes[user_id]
+            entry = None
+        if entry is None:
+            yield None
+            return
+        _, cluster_time, operation_time = entry
+        async with await self.client.start_session(causal_consistency=True) as session:
+            if cluster_time is not None:
+                session.advance_cluster_time(cluster_time)
+            if operation_time is not None:
+                session.advance_operation_time(operation_time)
+            yield session
+
+@asynccontextmanager
+async def no_session(*_: str) -> AsyncIterator[None]:
+    yield None
+
+def replica_read_preference(settings: Settings) -> Optional[SecondaryPreferred]:
+    """
+    Read preference для списков и поиска: вторичные узлы с ограничением отставания.
+    None — все чтения идут по настройке клиента (по умолчанию на primary).
+    """
+    if not settings.mongo_replica_reads:
+        return None
+    # MongoDB принимает maxStalenessSeconds не меньше 90; -1 отключает ограничение
+    return SecondaryPreferred(max_staleness=settings.mongo_max_staleness_seconds)
+
+def _later(first: Any, second: Any) -> bool:
+    return first is not None and (second is None or first > second)
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
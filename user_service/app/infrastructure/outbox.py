@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from typing import List
+from bson.objectid import ObjectId
+from user_service.app.domain.interfaces import OutboxRepository
+from user_service.app.domain.models.outbox import OutboxMessage
+from user_service.app.infrastructure.indexes import IndexSpec, QueryShape, ensure_indexes, verify_query_plans
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MongoOutboxRepository(OutboxRepository):
+    INDEXES = (
+        IndexSpec([("locked_until", 1), ("_id", 1)]),
+    )
+
+    def __init__(self, db) -> None:
+        self.collection = db.get_collection("outbox")
+
+    async def init_indexes(self) -> None:
+        await ensure_indexes(self.collection, self.INDEXES)
+        logger.info("Outbox indexes initialized")
+
+    async def check_query_plans(self, mode: str) -> None:
+        available = {"$or": [{"locked_until": None}, {"locked_until": {"$lt": datetime.utcnow()}}]}
+        await verify_query_plans(self.collection, [
+            QueryShape("claim_batch", available, sort=[("_id", 1)], projection={"_id": 1}),
+        ], mode)
+
+    async def claim_batch(self, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+        now = datetime.utcnow()
+        available = {"$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}]}
+        cursor = self.collection.find(available, {"_id": 1}).sort("_id", 1).limit(limit)
+        candidate_ids = [document["_id"] async for document in cursor]
+        if not candidate_ids:
+            return []
+        # Захват через уникальный токен: параллельный relay получит только не захваченные события
+        lock = ObjectId()
+        await self.collection.update_many(
+            {"_id": {"$in": candidate_ids}, **available},
+            {"$set": {"locked_until": now + timedelta(seconds=lease_seconds), "lock": lock}, "$inc": {"attempts": 1}}
+        )
+        messages = []
+        async for document in self.collection.find({"_id": {"$in": candidate_ids}, "lock": lock}).sort("_id", 1):
+            document["_id"] = str(document["_id"])
+            messages.append(OutboxMessage.parse_obj(document))
+        return messages
+
+    async def mark_published(self, message_ids: List[str]) -> None:
+        if message_ids:
+            await self.collection.delete_many({"_id": {"$in": [ObjectId(message_id) for message_id in message_ids]}})
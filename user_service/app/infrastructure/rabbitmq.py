@@ -1,40 +1,154 @@
-import json
+import asyncio
+import zlib
 import logging
-from aio_pika import connect_robust, Message
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence
+from aio_pika import connect_robust, DeliveryMode, Message
+from aio_pika.abc import AbstractChannel, AbstractConnection
+from user_service.app.infrastructure.codecs import SCHEMA_VERSION, SCHEMA_VERSION_HEADER, decode_message, get_codec
 from user_service.app.domain.interfaces import MessageBroker
+from user_service.app.domain.models.outbox import OutboxMessage
 from user_service.app.core.config import settings
+from user_service.app.core.metrics import PUBLISH_CONFIRMS_IN_FLIGHT, PUBLISH_FAILED, PUBLISH_LATENCY
 
 logger = logging.getLogger(__name__)
 
+class PublisherChannelPool:
+    """
+    Постоянные каналы для публикации с publisher confirms.
+    Каналы выдаются без эксклюзивного захвата: aio-pika конвейеризует публикации
+    в одном канале, а подтверждения ожидаются асинхронно, не блокируя других издателей.
+    RabbitMQ сохраняет порядок только внутри канала, поэтому события одного пользователя
+    всегда идут через канал, выбранный по crc32(user_id); события без ключа — по кругу.
+    Объявления очередей кэшируются и выполняются один раз на соединение.
+    """
+    def __init__(self, size: int) -> None:
+        self.size = max(1, size)
+        self._channels: List[AbstractChannel] = []
+        self._next = 0
+        self._declared: Dict[str, asyncio.Future] = {}
+
+    async def open(self, connection: AbstractConnection) -> None:
+        self._channels = [await connection.channel(publisher_confirms=True) for _ in range(self.size)]
+        self._declared.clear()
+
+    def channel_for(self, key: Optional[str] = None) -> AbstractChannel:
+        if key is None:
+            self._next = (self._next + 1) % len(self._channels)
+            return self._channels[self._next]
+        return self._channels[zlib.crc32(key.encode()) % len(self._channels)]
+
+    async def declare_queue(self, channel: AbstractChannel, queue: str) -> None:
+        # Одновременные первые публикации ждут одно и то же объявление
+        declaration = self._declared.get(queue)
+        if declaration is None:
+            declaration = self._declared[queue] = asyncio.ensure_future(channel.declare_queue(queue, durable=True))
+        try:
+            await asyncio.shield(declaration)
+        except Exception:
+            self._declared.pop(queue, None)
+            raise
+
+    async def close(self) -> None:
+        for channel in self._channels:
+            if not channel.is_closed:
+                await channel.close()
+        self._channels = []
+
 class RabbitMQBroker(MessageBroker):
     def __init__(self):
         self.connection = None
-        self.channel = None
+        self.channel = None  # Канал потребителя; публикация идёт через пул каналов
+        self.publishers = PublisherChannelPool(settings.rabbitmq_channel_pool_size)
+        self.publish_timeout = settings.rabbitmq_publish_timeout_seconds
+        self.codec = get_codec(settings.event_codec)
 
     async def connect(self):
         if not self.connection or self.connection.is_closed:
             self.connection = await connect_robust(settings.rabbitmq_url)
             self.channel = await self.connection.channel()
+            await self.publishers.open(self.connection)
             logger.info("Connected to RabbitMQ")
 
     async def publish(self, queue: str, message: dict) -> None:
         await self.connect()
-        queue_obj = await self.channel.declare_queue(queue, durable=True)
-        await self.channel.default_exchange.publish(
-            Message(json.dumps(message).encode()),
-            routing_key=queue
-        )
+        await self._publish(queue, self._message(message), message.get("user_id"))
         logger.info(f"Published message to {queue}: {message}")
 
+    async def publish_many(self, messages: Sequence[OutboxMessage]) -> List[bool]:
+        """
+        Публикует пачку сообщений конвейером по каналам пула.
+        События одного пользователя публикуются по порядку через один канал, каждое — после
+        подтверждения предыдущего; цепочки разных пользователей идут параллельно.
+        После ошибки остальные события пользователя в пачке не публикуются: они останутся
+        в outbox и будут выданы повторно вместе с неудавшимся, не обгоняя его.
+        """
+        await self.connect()
+        chains: Dict[Optional[str], List[int]] = {}
+        for index, message in enumerate(messages):
+            chains.setdefault(message.payload.get("user_id"), []).append(index)
+        results: List[bool] = [False] * len(messages)
+
+        async def publish_chain(key: Optional[str], indexes: List[int]) -> None:
+            for index in indexes:
+                message = messages[index]
+                try:
+                    await self._publish(
+                        message.queue,
+                        self._message(message.payload, delivery_mode=DeliveryMode.PERSISTENT, message_id=message.id),
+                        key,
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to publish message {message.id} to {message.queue}: {e}")
+                    if key is not None:
+                        return
+                    continue
+                results[index] = True
+
+        await asyncio.gather(*(publish_chain(key, indexes) for key, indexes in chains.items()))
+        logger.info(f"Published {sum(results)} of {len(messages)} messages")
+        return results
+
     async def consume(self, queue: str, callback) -> None:
         await self.connect()
         queue_obj = await self.channel.declare_queue(queue, durable=True)
         async with queue_obj.iterator() as queue_iter:
             async for message in queue_iter:
                 async with message.process():
-                    await callback(message.body.decode())
+                    await callback(decode_message(message.body, message.content_type, message.headers))
+
+    def _message(self, payload: dict, **properties) -> Message:
+        """
+        Кодирует событие выбранным кодеком; формат и версия схемы передаются в свойствах сообщения.
+        """
+        return Message(
+            self.codec.encode(payload),
+            content_type=self.codec.content_type,
+            headers={SCHEMA_VERSION_HEADER: SCHEMA_VERSION},
+            timestamp=datetime.now(timezone.utc),
+            **properties,
+        )
+
+    async def _publish(self, queue: str, message: Message, key: Optional[str] = None) -> None:
+        """
+        Публикует сообщение через канал пула для key и ждёт подтверждения брокера.
+        """
+        channel = self.publishers.channel_for(key)
+        await self.publishers.declare_queue(channel, queue)
+        start_time = perf_counter()
+        PUBLISH_CONFIRMS_IN_FLIGHT.inc()
+        try:
+            await channel.default_exchange.publish(message, routing_key=queue, timeout=self.publish_timeout)
+        except Exception:
+            PUBLISH_FAILED.labels(queue=queue).inc()
+            raise
+        finally:
+            PUBLISH_CONFIRMS_IN_FLIGHT.dec()
+        PUBLISH_LATENCY.labels(queue=queue).observe(perf_counter() - start_time)
 
     async def close(self):
+        await self.publishers.close()
         if self.channel and not self.channel.is_closed:
             await self.channel.close()
         if self.connection and not self.connection.is_closed:
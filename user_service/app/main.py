@@ -1,12 +1,16 @@
 import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 from user_service.app.core.container import Container
 from user_service.app.core.config import settings
+from user_service.app.core.timing import configure_timing
 from user_service.app.presentation.api.users import router as users_router
 from user_service.app.presentation.api.auth import router as auth_router
+from user_service.app.presentation.api.metrics import router as metrics_router
+from user_service.app.presentation.compression import CompressionMiddleware, parse_encodings
+from user_service.app.presentation.middleware import MetricsMiddleware
 
 from user_service import __version__
 
@@ -16,11 +20,15 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
+configure_timing(
+    settings.request_stages_enabled or settings.server_timing_enabled, settings.otel_enabled, settings.service_name
+)
 
 app = FastAPI(
     title="User Service",
     version=__version__,
-    description="A user management and authentication microservice."
+    description="A user management and authentication microservice.",
+    default_response_class=ORJSONResponse,
 )
 # Добавляем middleware для CORS
 app.add_middleware(
@@ -45,6 +53,24 @@ async def log_requests(request: Request, call_next):
     response = await call_next(request)
     return response
 
+if settings.compression_enabled:
+    # Добавляется раньше метрик, чтобы MetricsMiddleware оставался внешним и видел размер после сжатия
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=parse_encodings(settings.compression_encodings),
+        levels={
+            "gzip": settings.compression_gzip_level,
+            "br": settings.compression_brotli_quality,
+            "zstd": settings.compression_zstd_level,
+        },
+        minimum_size=settings.compression_min_size,
+        threadpool_size=settings.compression_threadpool_size,
+    )
+# Добавлен последним, поэтому внешний: учитывает время всех остальных middleware
+app.add_middleware(
+    MetricsMiddleware, stages=settings.request_stages_enabled, server_timing=settings.server_timing_enabled
+)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -52,7 +78,7 @@ async def lifespan(app: FastAPI):
     container = Container(settings)
     app.state.container = container
     app.state.user_manager = await container.get_user_manager()
-    await app.state.user_manager.repository.init_indexes()
+    await container.prepare_indexes(app.state.user_manager.repository, container.outbox)
     logger.info("Application initialized", extra={"context": "lifespan=ready"})
     yield
     await container.close()
@@ -61,6 +87,7 @@ async def lifespan(app: FastAPI):
 app.router.lifespan_context = lifespan
 app.include_router(auth_router)
 app.include_router(users_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
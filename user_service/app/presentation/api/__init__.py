@@ -1,3 +1,4 @@
 from .users import router as user_router
 from .auth import router as auth_router
-__all__ = ["auth_router", "user_router"]
\ No newline at end of file
+from .metrics import router as metrics_router
+__all__ = ["auth_router", "user_router", "metrics_router"]
\ No newline at end of file
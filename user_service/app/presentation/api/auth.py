@@ -3,25 +3,20 @@ from fastapi.security import OAuth2PasswordRequestForm
 from user_service.app.application.user_manager import UserManager
 from user_service.app.core.dependencies import get_user_manager, get_current_user
 from user_service.app.domain.models.user import UserView, UserCreate, UserUpdate, User, UserRole
-from user_service.app.core.auth import create_access_token
-from user_service.app.core.metrics import REQUEST_COUNT, REQUEST_LATENCY
+from user_service.app.core.auth import create_access_token, principal_claims
+from user_service.app.core.config import settings
+from user_service.app.presentation.routing import TimedRoute
 from datetime import timedelta
-from time import time
 
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], route_class=TimedRoute)
 
 @router.post("/register", response_model=UserView)
 async def register_user(
     user: UserCreate,
     manager: UserManager = Depends(get_user_manager)
 ) -> UserView:
-    start_time = time()
-    REQUEST_COUNT.labels(method="POST", endpoint="/api/auth/register").inc()
-    try:
-        created_user = await manager.register_user(user)  # Роль уже фиксирована внутри register_user как USER
-        return created_user
-    finally:
-        REQUEST_LATENCY.labels(endpoint="/api/auth/register").observe(time() - start_time)
+    created_user = await manager.register_user(user)  # Роль уже фиксирована внутри register_user как USER
+    return created_user
 
 
 @router.post("/login", response_model=dict)
@@ -29,8 +24,6 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     manager: UserManager = Depends(get_user_manager)
 ) -> dict:
-    start_time = time()
-    REQUEST_COUNT.labels(method="POST", endpoint="/api/auth/login").inc()
     user = await manager.authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -38,10 +31,10 @@ async def login(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=30)
+    # Срок токена совпадает с revocation_ttl PrincipalCache: инвалидация живёт не меньше токена
+    access_token_expires = timedelta(minutes=settings.jwt_access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.id, "role": user.role},  # Добавляем роль в токен
+        data=principal_claims(user),  # Claims позволяют собрать пользователя без запроса к БД
         expires_delta=access_token_expires
     )
-    REQUEST_LATENCY.labels(endpoint="/api/auth/login").observe(time() - start_time)
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
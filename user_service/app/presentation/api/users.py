@@ -1,24 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+import orjson
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from user_service.app.application.user_manager import UserManager
+from user_service.app.core.config import settings
 from user_service.app.core.dependencies import get_user_manager, get_current_user, get_admin_user
-from user_service.app.domain.models.user import UserView, UserCreate, UserUpdate, User, UserRole
+from user_service.app.core.timing import SERIALIZE, stage
+from user_service.app.domain.models.user import UserView, UserCreate, UserFilter, UserUpdate, User, UserRole
+from user_service.app.presentation.conditional import (
+    CACHE_CONTROL, if_match_versions, not_modified, not_modified_response, version_etag
+)
+from user_service.app.presentation.routing import TimedRoute
 
-router = APIRouter(prefix="/api/users", tags=["users"])
+router = APIRouter(prefix="/api/users", tags=["users"], route_class=TimedRoute)
 
 
-# Новый эндпоинт: список всех пользователей (только для админов)
+# Список пользователей (только для админов)
 @router.get("/", response_model=list[UserView])
 async def list_users(
-    admin_user: User = Depends(get_admin_user),  # Заменяем current_user
+    role: Optional[UserRole] = Query(None),
+    created_from: Optional[datetime] = Query(None, description="Созданные не раньше (включительно)"),
+    created_to: Optional[datetime] = Query(None, description="Созданные раньше (не включительно)"),
+    username_prefix: Optional[str] = Query(None, min_length=1, description="Начало username (с учётом регистра)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.users_page_size_max, description="Размер страницы"),
+    after: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    stream: bool = Query(False, description="Выгрузить всех подходящих пользователей потоком в формате NDJSON"),
+    admin_user: User = Depends(get_admin_user),
     manager: UserManager = Depends(get_user_manager)
-) -> list[UserView]:
-    users = await manager.list_users()
-    return users
+) -> Response:
+    """
+    Возвращает страницу пользователей; курсор следующей страницы — в заголовке X-Next-Cursor.
+    С username_prefix список упорядочен по username, иначе — по времени создания.
+    Документы читаются с проекцией полей UserView (без password_hash) и сериализуются
+    сразу в JSON, минуя pydantic-валидацию.
+    """
+    user_filter = UserFilter(
+        role=role,
+        created_from=_naive_utc(created_from),
+        created_to=_naive_utc(created_to),
+        username_prefix=username_prefix,
+    )
+    if stream:
+        return StreamingResponse(_ndjson(manager.stream_users(user_filter)), media_type="application/x-ndjson")
+    views, next_cursor = await manager.list_users(user_filter, limit or settings.users_page_size, after)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    with stage(SERIALIZE):
+        return ORJSONResponse(views, headers=headers)
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """
+    Даты в хранилище — наивные UTC (datetime.utcnow); дата с часовым поясом приводится к ним.
+    """
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+async def _ndjson(views: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """
+    Сериализует пользователей построчно в NDJSON.
+    """
+    async for view in views:
+        yield orjson.dumps(view) + b"\n"
 
 @router.get("/me", response_model=UserView)
 async def get_current_user_info(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ) -> UserView:
+    # ETag — версия пользователя; при совпадении If-None-Match — 304 без сериализации
+    etag = version_etag(current_user.updated_at)
+    if not_modified(if_none_match, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
     return current_user
 
 # Новый эндпоинт: обновление пароля
@@ -53,6 +109,8 @@ async def get_user(
 async def update_user(
     user_id: str,
     user_update: UserUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     manager: UserManager = Depends(get_user_manager)
 ) -> UserView:
@@ -61,7 +119,10 @@ async def update_user(
     # Ограничиваем изменение роли только для админов
     if user_update.role and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can change roles")
-    return await manager.update_user(user_id, user_update)
+    # If-Match проверяется в фильтре обновления; устаревшая версия даёт 412
+    user = await manager.update_user(user_id, user_update, if_match_versions(if_match))
+    response.headers["ETag"] = version_etag(user.updated_at)
+    return user
 
 
 # Удаление пользователя (себя или для админа)
@@ -0,0 +1,51 @@
+"""
+Условные HTTP-запросы: ETag, If-None-Match (304) и If-Match (412).
+Версия пользователя — его updated_at в миллисекундах (точность хранения MongoDB), поэтому
+If-Match проверяется условием на updated_at прямо в фильтре обновления, без
+дополнительного чтения.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from fastapi import Response
+from user_service.app.domain.user_list import from_millis, to_millis
+
+# Ответ зависит от пользователя; no-cache — кэшировать можно, но только с перепроверкой ETag
+CACHE_CONTROL = "private, no-cache"
+
+def version_etag(updated_at: datetime) -> str:
+    return f'"{to_millis(updated_at)}"'
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Слабое сравнение If-None-Match с ETag (RFC 9110, 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def if_match_versions(if_match: Optional[str]) -> Optional[List[datetime]]:
+    """
+    Версии из If-Match для фильтра обновления; None — условия нет (заголовка нет или "*").
+    Версионный ETag ослабляется только при сжатии ответа (CompressionMiddleware), версия
+    в нём та же, поэтому W/"<ms>" принимается наравне с "<ms>". Чужие ETag не совпадают
+    ни с одной версией, и пустой список всегда даёт 412.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions: List[datetime] = []
+    for candidate in if_match.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if len(candidate) > 2 and candidate[0] == candidate[-1] == '"' and candidate[1:-1].isdigit():
+            try:
+                versions.append(from_millis(int(candidate[1:-1])))
+            except (OverflowError, ValueError):
+                # Версия вне диапазона дат не совпадает ни с одной — 412
+                continue
+    return versions
@@ -0,0 +1,71 @@
+"""
+ASGI-middleware HTTP-метрик.
+Работает на уровне ASGI (без BaseHTTPMiddleware), поэтому не буферизует ответ и не
+создаёт лишних задач. Метрики накапливаются в RequestMetrics без блокировок:
+на запрос приходятся несколько вызовов perf_counter и операций со словарями.
+Здесь же при stages=True создаётся разбивка времени запроса по стадиям (core/timing.py).
+"""
+
+from time import perf_counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from user_service.app.core.metrics import REQUEST_METRICS, RequestMetrics
+from user_service.app.core.timing import STAGE_TIMINGS, StageTimings
+
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+# Метка для запросов, не совпавших ни с одним маршрутом (404, сканеры)
+UNMATCHED = "unmatched"
+
+class MetricsMiddleware:
+    """
+    Считает запросы по статусам, задержку, размер ответа и запросы в обработке.
+    Метка endpoint — шаблон совпавшего маршрута (scope["route"], его выставляет
+    маршрутизатор FastAPI), поэтому число рядов ограничено числом маршрутов.
+    stages=True пишет время стадий запроса; server_timing=True (включает и stages)
+    добавляет в ответ заголовок Server-Timing с временем стадий.
+    """
+    def __init__(
+        self, app: ASGIApp, metrics: RequestMetrics = REQUEST_METRICS, stages: bool = False, server_timing: bool = False
+    ) -> None:
+        self.app = app
+        self.metrics = metrics
+        self.stages = stages or server_timing
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        status = 500
+        size = 0
+        timings = StageTimings() if self.stages else None
+        stages = None
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status, size, stages
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings is not None:
+                    stages = timings.finish(start_time, perf_counter())
+                    if self.server_timing:
+                        message["headers"] = [*message.get("headers", ()), (b"server-timing", timings.server_timing())]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = self.metrics.in_flight
+        in_flight[method] = in_flight.get(method, 0) + 1
+        token = STAGE_TIMINGS.set(timings) if timings is not None else None
+        start_time = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = perf_counter() - start_time
+            if token is not None:
+                STAGE_TIMINGS.reset(token)
+            in_flight[method] -= 1
+            route = scope.get("route")
+            endpoint = getattr(route, "path", UNMATCHED) if route is not None else UNMATCHED
+            self.metrics.observe(method, endpoint, status, elapsed, size)
+            if timings is not None:
+                self.metrics.observe_stages(method, endpoint, stages or timings.finish(start_time, start_time + elapsed))
@@ -0,0 +1,31 @@
+"""
+Класс маршрута, отмечающий момент возврата из эндпоинта.
+Время от него до начала ответа (валидация response_model, jsonable_encoder,
+рендеринг) учитывается как стадия serialize.
+"""
+
+import functools
+import inspect
+from typing import Any, Callable
+from fastapi.routing import APIRoute
+from user_service.app.core.timing import mark_endpoint_done
+
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # include_router пересоздаёт маршруты с уже обёрнутым эндпоинтом;
+    # синхронные эндпоинты FastAPI выполняет в пуле потоков, их не оборачиваем
+    if getattr(endpoint, "__marks_endpoint_done__", False) or not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def timed_endpoint(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            mark_endpoint_done()
+
+    timed_endpoint.__marks_endpoint_done__ = True
+    return timed_endpoint